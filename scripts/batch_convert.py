@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Batch-convert directories of LimeSurvey exports (.lss XML or .tsv) to Resonant Survey JSON
+Each file is sniffed as XML or TSV, conversions fan out over a process pool,
+and a manifest with per-file timings and errors is written next to the outputs.
+One bad file never stops the batch.
+
+Usage:
+    python batch_convert.py exports/ 'archive/**/*.lss' -o converted/ --workers 8
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from conversion_cache import DEFAULT_MAX_BYTES, ConversionCache, add_cache_arguments
+from survey_writer import OUTPUT_FORMATS, dump_survey_output
+
+EXPORT_SUFFIXES = ('.lss', '.xml', '.tsv', '.txt')
+MANIFEST_NAME = 'manifest.json'
+# Sharded outputs are directories (groups.jsonl + manifest.json)
+OUTPUT_SUFFIXES = {'ndjson': '.ndjson', 'sharded': '.shards'}
+
+
+def detect_format(path: str) -> str:
+    """Return 'xml' or 'tsv' by sniffing the first non-blank bytes of the file"""
+    with open(path, 'rb') as f:
+        head = f.read(512)
+    head = head.lstrip(b'\xef\xbb\xbf').lstrip()
+    return 'xml' if head.startswith(b'<') else 'tsv'
+
+
+def collect_inputs(sources: List[str]) -> List[Path]:
+    """Expand directories (recursively) and glob patterns into a sorted, de-duplicated file list"""
+    found = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for path in Path(source).rglob('*'):
+                if path.is_file() and path.suffix.lower() in EXPORT_SUFFIXES:
+                    found.add(path.resolve())
+        else:
+            for match in glob.glob(source, recursive=True):
+                if os.path.isfile(match):
+                    found.add(Path(match).resolve())
+    return sorted(found)
+
+
+def assign_outputs(inputs: List[Path], output_dir: Path, suffix: str = '.json') -> Dict[Path, Path]:
+    """One <stem>.json per input, suffixing duplicates so surveys never overwrite each other
+
+    The batch manifest's name is reserved, and names are compared
+    case-insensitively so they stay distinct on case-insensitive filesystems.
+    """
+    used = {MANIFEST_NAME.lower()}
+    outputs = {}
+    for path in inputs:
+        name = f"{path.stem}{suffix}"
+        n = 2
+        while name.lower() in used:
+            name = f"{path.stem}_{n}{suffix}"
+            n += 1
+        used.add(name.lower())
+        outputs[path] = output_dir / name
+    return outputs
+
+
+def convert_file(input_path: str, output_path: str, xml_converter: str, output_format: str = 'pretty',
+                 cache_dir: Optional[str] = None, cache_max_bytes: int = DEFAULT_MAX_BYTES) -> dict:
+    """Convert a single export; runs inside a worker process and never raises"""
+    result = {
+        'input': input_path,
+        'output': output_path,
+        'format': None,
+        'seconds': 0.0,
+        'groups': 0,
+        'questions': 0,
+        'cache': None,
+        'error': None,
+    }
+    start = time.perf_counter()
+    try:
+        result['format'] = detect_format(input_path)
+        if result['format'] == 'xml':
+            if xml_converter == 'basic':
+                import parse_lss_xml_to_json as module
+            else:
+                import lss_to_resonant_json as module
+            converter = module.parse_lss_to_json
+        else:
+            import convert_limesurvey_to_json as module
+            converter = module.parse_limesurvey_tsv
+
+        if cache_dir:
+            cache = ConversionCache(cache_dir, cache_max_bytes)
+            survey = cache.convert(converter, input_path)
+            result['cache'] = 'hit' if cache.last_hit else 'miss'
+        else:
+            survey = converter(input_path)
+
+        # Byte-for-byte what the converter's own CLI writes
+        dump_survey_output(survey, output_path, output_format, ensure_ascii=module.ENSURE_ASCII)
+
+        result['groups'] = len(survey['question_groups'])
+        result['questions'] = sum(len(g['questions']) for g in survey['question_groups'])
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def run_batch(inputs: List[Path], output_dir: Path, workers: int, xml_converter: str = 'resonant',
+              output_format: str = 'pretty', cache_dir: Optional[str] = None, cache_max_bytes: int = DEFAULT_MAX_BYTES) -> dict:
+    """Convert every input over a process pool and return the manifest dict"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = assign_outputs(inputs, output_dir, OUTPUT_SUFFIXES.get(output_format, '.json'))
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    start = time.perf_counter()
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(convert_file, str(path), str(outputs[path]), xml_converter,
+                        output_format, cache_dir, cache_max_bytes): path
+            for path in inputs
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed by the OOM killer)
+                result = {'input': str(path), 'output': str(outputs[path]), 'format': None,
+                          'seconds': 0.0, 'groups': 0, 'questions': 0, 'cache': None,
+                          'error': f"{type(e).__name__}: {e}"}
+            status = "❌" if result['error'] else "✅"
+            print(f"{status} {result['input']} ({result['seconds']:.2f}s)"
+                  + (f" - {result['error']}" if result['error'] else ""))
+            results.append(result)
+
+    results.sort(key=lambda r: r['input'])
+    failed = sum(1 for r in results if r['error'])
+    manifest = {
+        'started_at': started_at,
+        'total_seconds': round(time.perf_counter() - start, 4),
+        'workers': workers,
+        'xml_converter': xml_converter,
+        'format': output_format,
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'files': results,
+    }
+    if cache_dir:
+        manifest['cache'] = ConversionCache(cache_dir, cache_max_bytes).stats()
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-convert LimeSurvey exports to Resonant Survey JSON")
+    parser.add_argument('sources', nargs='+', help="directories and/or glob patterns of .lss/.tsv exports")
+    parser.add_argument('-o', '--output-dir', required=True, help="directory for converted JSON and the manifest")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument('--xml-converter', choices=['resonant', 'basic'], default='resonant',
+                        help="lss_to_resonant_json (resonant) or parse_lss_xml_to_json (basic) for XML inputs")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='pretty',
+                        help="pretty (indented), compact, ndjson (one question per line), "
+                             "or sharded (each output is a directory: one line per group plus a manifest)")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
+    inputs = collect_inputs(args.sources)
+    if not inputs:
+        print("No input files found")
+        sys.exit(1)
+
+    output_dir = Path(args.output_dir)
+    print(f"Converting {len(inputs)} files with {args.workers} workers...")
+    manifest = run_batch(inputs, output_dir, args.workers, args.xml_converter,
+                         args.format, args.cache_dir, args.cache_max_mb * 1024 * 1024)
+
+    manifest_path = output_dir / MANIFEST_NAME
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    print(f"\nConverted {manifest['succeeded']}/{len(inputs)} files in {manifest['total_seconds']:.2f}s")
+    if args.cache_dir:
+        cache = manifest['cache']
+        print(f"Cache: {cache['hits']} hits, {cache['misses']} misses, "
+              f"{cache['bytes_saved'] / (1024 * 1024):.1f} MB of parsing saved")
+    print(f"Manifest: {manifest_path}")
+    if manifest['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
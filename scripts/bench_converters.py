@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Converter benchmark: wall time, throughput and peak RSS at growing survey sizes
+Generates synthetic LSS and TSV exports (synthetic_survey.py) for each size and
+runs every converter on them, each run in a fresh interpreter so peak RSS
+belongs to that conversion alone. Results go to a JSON report; pass an earlier
+report as --baseline to fail on regressions.
+
+Converters:
+    tsv            convert_limesurvey_to_json.parse_limesurvey_tsv
+    lss            lss_to_resonant_json.parse_lss_to_json
+    lss-basic      parse_lss_xml_to_json.parse_lss_to_json
+
+Usage:
+    python bench_converters.py -o bench_report.json
+    python bench_converters.py --sizes 50x1000,200x10000 --responses 5000 --baseline old_report.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from synthetic_survey import SyntheticSpec, write_lss, write_tsv
+
+CONVERTERS = {
+    'tsv': ('convert_limesurvey_to_json', 'parse_limesurvey_tsv', '.tsv'),
+    'lss': ('lss_to_resonant_json', 'parse_lss_to_json', '.lss'),
+    'lss-basic': ('parse_lss_xml_to_json', 'parse_lss_to_json', '.lss'),
+}
+
+DEFAULT_SIZES = '10x200,50x2000,200x10000'
+REPORT_FORMAT = 'resonant-converter-bench'
+
+
+def parse_sizes(text: str) -> List[Tuple[int, int]]:
+    """"10x200,50x2000" -> [(10, 200), (50, 2000)] (groups x questions)"""
+    sizes = []
+    for part in text.split(','):
+        groups, questions = part.lower().split('x')
+        sizes.append((int(groups), int(questions)))
+    return sizes
+
+
+def run_converter(name: str, path: str) -> dict:
+    """Convert once in this process; called in the worker interpreter"""
+    module_name, function_name, _ = CONVERTERS[name]
+    module = __import__(module_name)
+    start = time.perf_counter()
+    survey = getattr(module, function_name)(path)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_bytes = peak if sys.platform == 'darwin' else peak * 1024
+    return {
+        'seconds': seconds,
+        'peak_rss_bytes': peak_bytes,
+        'converted_groups': len(survey['question_groups']),
+        'converted_questions': sum(len(group['questions']) for group in survey['question_groups']),
+    }
+
+
+def measure(name: str, path: str, repeats: int) -> dict:
+    """Best wall time and the largest peak RSS over several fresh-process runs"""
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', name, path],
+                                check=True, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    best = min(runs, key=lambda run: run['seconds'])
+    return {**best, 'peak_rss_bytes': max(run['peak_rss_bytes'] for run in runs)}
+
+
+def compare(report: dict, baseline: dict, max_slowdown: float, max_memory_growth: float) -> List[str]:
+    """Regressions of report against baseline, for entries present in both"""
+    key = lambda result: (result['converter'], result['groups'], result['questions'], result['responses'])
+    previous = {key(result): result for result in baseline.get('results', [])}
+    problems = []
+    for result in report['results']:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        label = f"{result['converter']} {result['groups']}x{result['questions']}"
+        if result['seconds'] > before['seconds'] * max_slowdown:
+            problems.append(f"{label}: {result['seconds']:.3f}s vs {before['seconds']:.3f}s")
+        if result['peak_rss_bytes'] > before['peak_rss_bytes'] * max_memory_growth:
+            problems.append(f"{label}: peak RSS {result['peak_rss_bytes'] / 2**20:.1f} MiB "
+                            f"vs {before['peak_rss_bytes'] / 2**20:.1f} MiB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-o', '--output', default='bench_report.json', help="JSON report to write")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma-separated GROUPSxQUESTIONS")
+    parser.add_argument('--converters', default=','.join(CONVERTERS), help="comma-separated converter names")
+    parser.add_argument('--subquestions', type=int, default=5)
+    parser.add_argument('--answers', type=int, default=5)
+    parser.add_argument('--attributes', type=int, default=2)
+    parser.add_argument('--languages', type=int, default=2)
+    parser.add_argument('--responses', type=int, default=0, help="response rows in the LSS files")
+    parser.add_argument('--repeats', type=int, default=3, help="runs per measurement (best time is kept)")
+    parser.add_argument('--baseline', help="earlier report to compare against")
+    parser.add_argument('--max-slowdown', type=float, default=1.5, help="fail if wall time grows by more than this")
+    parser.add_argument('--max-memory-growth', type=float, default=1.5, help="fail if peak RSS grows by more than this")
+    parser.add_argument('--worker', nargs=2, metavar=('CONVERTER', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_converter(*args.worker)))
+        return
+
+    converters = args.converters.split(',')
+    report = {
+        'format': REPORT_FORMAT,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeats': args.repeats,
+        'results': [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix='bench_converters_') as tmp:
+        for n_groups, n_questions in parse_sizes(args.sizes):
+            spec = SyntheticSpec(n_groups, n_questions, args.subquestions, args.answers, args.attributes,
+                                 args.languages, args.responses)
+            inputs: Dict[str, Tuple[str, int]] = {}
+            for suffix, write in (('.lss', write_lss), ('.tsv', write_tsv)):
+                path = os.path.join(tmp, f"survey_{n_groups}x{n_questions}{suffix}")
+                with open(path, 'w', encoding='utf-8', newline='') as f:
+                    inputs[suffix] = (path, sum(write(f, spec).values()))
+
+            for name in converters:
+                path, rows = inputs[CONVERTERS[name][2]]
+                result = measure(name, path, args.repeats)
+                result.update({
+                    'converter': name,
+                    'groups': n_groups,
+                    'questions': n_questions,
+                    'responses': args.responses if path.endswith('.lss') else 0,
+                    'input_bytes': os.path.getsize(path),
+                    'input_rows': rows,
+                    'rows_per_second': rows / result['seconds'] if result['seconds'] else None,
+                })
+                result['seconds'] = round(result['seconds'], 6)
+                report['results'].append(result)
+                print(f"{name:>10} {n_groups:>5}x{n_questions:<6} {result['seconds']:8.3f}s "
+                      f"{result['rows_per_second']:>12,.0f} rows/s "
+                      f"{result['peak_rss_bytes'] / 2**20:8.1f} MiB peak RSS")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Created {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            problems = compare(report, json.load(f), args.max_slowdown, args.max_memory_growth)
+        for problem in problems:
+            print(f"❌ Regression: {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
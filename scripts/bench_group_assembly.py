@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Regression benchmark for convert_to_resonant_format group assembly
+Builds synthetic LSS surveys at growing sizes (up to 1k groups x 20k
+questions) and checks that the per-question cost stays flat, i.e. that group
+assembly is linear rather than O(groups x questions)
+
+Usage:
+    python bench_group_assembly.py [--max-ratio 3.0]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from lss_to_resonant_json import LssSurveyReader, convert_to_resonant_format
+
+SIZES = [(125, 2500), (250, 5000), (500, 10000), (1000, 20000)]
+
+
+def synthetic_lss_rows(n_groups: int, n_questions: int, seed: int = 0):
+    """Synthetic decoded LSS rows as (table, fields), in the order read_lss_survey yields them"""
+    rng = random.Random(seed)
+
+    for g in range(n_groups):
+        gid = str(g + 1)
+        yield 'groups', {'gid': gid, 'group_order': str(g), 'grelevance': "1"}
+        yield 'group_l10ns', {'gid': gid, 'group_name': f"Group {gid}", 'language': "en"}
+
+    next_id = n_questions + 1
+    for q in range(n_questions):
+        qid = str(q + 1)
+        yield 'questions', {
+            'qid': qid,
+            'gid': str(rng.randint(1, n_groups)),
+            'type': "F",
+            'title': f"Q{qid}",
+            'question_order': str(rng.randint(0, 50)),
+            'relevance': "1",
+            'mandatory': "N",
+            'other': "N"
+        }
+        yield 'question_l10ns', {'qid': qid, 'question': f"Question {qid}", 'help': "", 'language': "en"}
+        yield 'question_attributes', {'qid': qid, 'attribute': "random_order", 'value': "1"}
+        for i in range(3):
+            sub_id = str(next_id)
+            yield 'subquestions', {'qid': sub_id, 'parent_qid': qid, 'title': f"SQ00{i + 1}",
+                                   'question_order': str(2 - i)}
+            yield 'question_l10ns', {'qid': sub_id, 'question': f"Sub {i}", 'help': "", 'language': "en"}
+            yield 'answers', {'aid': sub_id, 'qid': qid, 'code': f"A{i + 1}", 'sortorder': str(2 - i)}
+            yield 'answer_l10ns', {'aid': sub_id, 'answer': f"Answer {i}", 'language': "en"}
+            next_id += 1
+
+
+def build_lss_reader(n_groups: int, n_questions: int, seed: int = 0) -> LssSurveyReader:
+    """Synthetic LSS rows fed through LssSurveyReader.add_row, as read_lss_survey does"""
+    reader = LssSurveyReader()
+    for table, fields in synthetic_lss_rows(n_groups, n_questions, seed):
+        reader.add_row(table, fields)
+    return reader
+
+
+def time_convert(reader: LssSurveyReader, repeats: int = 3) -> float:
+    """Best-of-N wall time for joining the model and one convert_to_resonant_format call"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        convert_to_resonant_format(reader.build())
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-ratio', type=float, default=3.0,
+                        help="fail if per-question cost at the largest size exceeds the smallest by this factor")
+    args = parser.parse_args()
+
+    per_question = []
+    for n_groups, n_questions in SIZES:
+        elapsed = time_convert(build_lss_reader(n_groups, n_questions))
+        per_question.append(elapsed / n_questions)
+        print(f"{n_groups:>5} groups x {n_questions:>6} questions: {elapsed * 1000:8.1f} ms "
+              f"({per_question[-1] * 1e6:.2f} µs/question)")
+
+    ratio = per_question[-1] / per_question[0]
+    print(f"Per-question cost ratio (largest / smallest): {ratio:.2f}")
+    if ratio > args.max_ratio:
+        print(f"❌ Group assembly no longer scales linearly (ratio > {args.max_ratio})")
+        sys.exit(1)
+    print("✅ Group assembly scales linearly")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: shared survey model vs the baseline converters' intermediates
+Builds synthetic surveys at growing sizes and measures, with tracemalloc, how
+many bytes stay allocated after reading. The LSS reader's whole retained state
+(model objects, id indexes and per-language text) is compared with the
+`survey_data` dict-of-dicts the original parse_lss_to_json built from the same
+rows; the TSV converter built its JSON-ready question dicts directly, so the
+model objects alone are compared with the `tsv` dialect of survey_to_json.
+
+Usage:
+    python bench_survey_model.py [--min-saving 1.5]
+"""
+
+import argparse
+import copy
+import gc
+import sys
+import tracemalloc
+
+from bench_group_assembly import build_lss_reader, synthetic_lss_rows
+from lss_to_resonant_json import LssSurveyReader
+from survey_model import survey_to_json
+
+SIZES = [(50, 1000), (250, 5000), (1000, 20000)]
+
+
+def retained_bytes(build) -> tuple:
+    """(bytes still allocated after build() returns, the built object)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def build_model(n_groups: int, n_questions: int) -> LssSurveyReader:
+    reader = build_lss_reader(n_groups, n_questions)
+    reader.build()
+    return reader
+
+
+def baseline_survey_data(rows) -> dict:
+    """The `survey_data` dicts the original parse_lss_to_json kept, built from decoded rows"""
+    survey_data = {
+        'groups': {},
+        'questions': {},
+        'subquestions': {},
+        'answers': {},
+        'answer_l10ns': {},
+        'question_l10ns': {},
+        'group_l10ns': {},
+        'question_attributes': {},
+    }
+    for table, fields in rows:
+        if table == 'groups':
+            survey_data['groups'][fields['gid']] = {
+                'order': int(fields.get('group_order') or 0),
+                'relevance': fields.get('grelevance') or "1",
+                'randomization_group': fields.get('randomization_group') or ""
+            }
+        elif table == 'group_l10ns':
+            survey_data['group_l10ns'][fields['gid']] = fields.get('group_name') or ""
+        elif table == 'question_attributes':
+            attributes = survey_data['question_attributes'].setdefault(fields['qid'], {})
+            attributes[fields['attribute']] = fields.get('value') or None
+        elif table == 'questions':
+            survey_data['questions'][fields['qid']] = {
+                'gid': fields.get('gid') or "",
+                'type': fields.get('type') or "",
+                'title': fields.get('title') or "",
+                'order': int(fields.get('question_order') or 0),
+                'relevance': fields.get('relevance') or "1",
+                'mandatory': fields.get('mandatory') or "N",
+                'other': fields.get('other') or "N"
+            }
+        elif table == 'question_l10ns':
+            survey_data['question_l10ns'][fields['qid']] = {
+                'question': fields.get('question') or "",
+                'help': fields.get('help') or ""
+            }
+        elif table == 'subquestions':
+            survey_data['subquestions'].setdefault(fields['parent_qid'], []).append({
+                'qid': fields['qid'],
+                'title': fields.get('title') or "",
+                'order': int(fields.get('question_order') or 0)
+            })
+        elif table == 'answers':
+            survey_data['answers'].setdefault(fields['qid'], []).append({
+                'aid': fields['aid'],
+                'code': fields.get('code') or "",
+                'order': int(fields.get('sortorder') or 0)
+            })
+        elif table == 'answer_l10ns':
+            survey_data['answer_l10ns'][fields['aid']] = fields.get('answer') or ""
+    return survey_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--min-saving', type=float, default=1.5,
+                        help="fail if a baseline intermediate is not at least this many times larger")
+    args = parser.parse_args()
+
+    worst = float('inf')
+    for n_groups, n_questions in SIZES:
+        # Both sides decode fresh rows, so the field strings count on each
+        reader_bytes, reader = retained_bytes(lambda: build_model(n_groups, n_questions))
+        lss_bytes, _ = retained_bytes(lambda: baseline_survey_data(synthetic_lss_rows(n_groups, n_questions)))
+        # The model objects alone; strings are shared, as they are with the TSV dicts
+        model_bytes, survey = retained_bytes(lambda: copy.deepcopy(reader.survey))
+        tsv_bytes, _ = retained_bytes(lambda: survey_to_json(survey, 'tsv'))
+
+        lss_saving, tsv_saving = lss_bytes / reader_bytes, tsv_bytes / model_bytes
+        worst = min(worst, lss_saving, tsv_saving)
+        print(f"{n_groups:>5} groups x {n_questions:>6} questions:")
+        print(f"    LSS reader {reader_bytes / n_questions:7.0f} B/question vs "
+              f"baseline survey_data {lss_bytes / n_questions:7.0f} B/question ({lss_saving:.1f}x)")
+        print(f"    model      {model_bytes / n_questions:7.0f} B/question vs "
+              f"baseline TSV dicts   {tsv_bytes / n_questions:7.0f} B/question ({tsv_saving:.1f}x)")
+
+    if worst < args.min_saving:
+        print(f"❌ Survey model saves only {worst:.1f}x over the baseline (expected >= {args.min_saving}x)")
+        sys.exit(1)
+    print(f"✅ Survey model is at least {worst:.1f}x smaller than the baseline intermediates")
+
+
+if __name__ == "__main__":
+    main()
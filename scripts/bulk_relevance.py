@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Vectorized relevance / array_filter evaluation over a whole response matrix
+For every respondent, works out which questions and subquestions were actually
+shown, by evaluating the compiled relevance expressions of a converted survey
+(in any converter dialect) as NumPy column operations instead of looping over
+responses in Python.
+
+Columns are held factorized (integer codes + the distinct values they stand
+for). Each operator is evaluated once per distinct combination of operand
+values with the same scalar rules as expression_compiler.ExpressionEvaluator,
+then broadcast back over all rows, so results match the reference evaluator
+exactly while the per-row work is pure NumPy.
+
+Usage:
+    python bulk_relevance.py survey.json responses.csv -o shown.npz
+"""
+
+import argparse
+import csv
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from expression_compiler import (
+    COMPARISONS, FUNCTIONS, ExpressionCompiler, apply_arithmetic, compare_values, to_bool, to_number,
+)
+from label_sets import LABEL_SETS_KEY, question_items
+from survey_model import relevance_node
+
+# Above this many operand-value combinations, pairs are deduplicated with
+# np.unique instead of a dense lookup table
+DENSE_PAIR_LIMIT = 1 << 16
+
+# Value a multiple-choice subquestion holds when it was ticked
+SELECTED = 'Y'
+
+
+class Factor:
+    """A column as integer codes into a list of distinct (Python) values"""
+
+    __slots__ = ('codes', 'values')
+
+    def __init__(self, codes: np.ndarray, values: list):
+        self.codes = codes
+        self.values = values
+
+    @classmethod
+    def constant(cls, value, n_rows: int) -> 'Factor':
+        return cls(np.broadcast_to(np.intp(0), (n_rows,)), [value])
+
+    @classmethod
+    def from_strings(cls, column: np.ndarray) -> 'Factor':
+        """Factorize a str column; empty strings are unanswered (None)"""
+        uniques, codes = np.unique(column.astype(str), return_inverse=True)
+        return cls(codes.astype(np.intp), [str(u) if u != '' else None for u in uniques])
+
+    def map(self, function) -> 'Factor':
+        """Apply a scalar function once per distinct value"""
+        return _dedupe(self.codes, [function(value) for value in self.values])
+
+    def to_mask(self) -> np.ndarray:
+        lut = np.fromiter((to_bool(value) for value in self.values), dtype=bool, count=len(self.values))
+        return lut[self.codes]
+
+
+def _value_key(value):
+    # 1, 1.0 and True must stay distinct categories
+    return (type(value).__name__, value if value == value else 'nan')
+
+
+def _dedupe(codes: np.ndarray, results: list) -> Factor:
+    """Collapse equal results so categories stay few as operators are chained"""
+    index = {}
+    values = []
+    remap = np.empty(len(results), dtype=np.intp)
+    for i, result in enumerate(results):
+        key = _value_key(result)
+        if key not in index:
+            index[key] = len(values)
+            values.append(result)
+        remap[i] = index[key]
+    return Factor(remap[codes], values)
+
+
+def combine(factors: List[Factor], function) -> Factor:
+    """Evaluate function(*values) once per distinct combination of operand values"""
+    if len(factors) == 1:
+        return factors[0].map(lambda value: function(value))
+
+    sizes = [len(f.values) for f in factors]
+    dense = 1
+    for size in sizes:
+        dense *= size
+
+    if dense <= DENSE_PAIR_LIMIT:
+        # Mixed-radix code over every combination, evaluated densely
+        combined = np.zeros(len(factors[0].codes), dtype=np.intp)
+        for factor, size in zip(factors, sizes):
+            combined = combined * size + factor.codes
+        results = []
+        for flat in range(dense):
+            args = []
+            for factor, size in zip(reversed(factors), reversed(sizes)):
+                flat, digit = divmod(flat, size)
+                args.append(factor.values[digit])
+            results.append(function(*reversed(args)))
+        return _dedupe(combined, results)
+
+    # Too many combinations for a table: only evaluate the ones that occur
+    stacked = np.stack([np.asarray(f.codes) for f in factors], axis=1)
+    uniques, inverse = np.unique(stacked, axis=0, return_inverse=True)
+    results = [function(*(f.values[c] for f, c in zip(factors, row))) for row in uniques]
+    return _dedupe(inverse.reshape(-1), results)
+
+
+class ResponseMatrix:
+    """Factorized response columns keyed by variable name (Q1, Q1_SQ001, ...)"""
+
+    def __init__(self, columns: Dict[str, Factor], n_rows: int):
+        self.columns = columns
+        self.n_rows = n_rows
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'ResponseMatrix':
+        n_rows = len(next(iter(arrays.values()))) if arrays else 0
+        return cls({normalize_column(name): Factor.from_strings(np.asarray(column))
+                    for name, column in arrays.items()}, n_rows)
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'ResponseMatrix':
+        """Load a response export whose header row holds variable names"""
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = list(reader)
+        columns = list(zip(*rows)) if rows else [()] * len(header)
+        return cls.from_arrays({name: np.array(column, dtype=str) for name, column in zip(header, columns)})
+
+    def lookup(self, name: str) -> Optional[Factor]:
+        """Column lookup with the runtime's Q1_SQ001 / Q1.SQ001 fallbacks"""
+        for candidate in (name, name.replace('_', '.'), name.replace('.', '_')):
+            if candidate in self.columns:
+                return self.columns[candidate]
+        return None
+
+
+def normalize_column(name: str) -> str:
+    """LimeSurvey's Q1[SQ001] export headings -> Q1_SQ001"""
+    return name.strip().replace('[', '_').replace(']', '')
+
+
+class VectorEvaluator:
+    """Evaluates compiled expressions for every row of a ResponseMatrix at once"""
+
+    def __init__(self, matrix: ResponseMatrix, compiler: Optional[ExpressionCompiler] = None):
+        self.matrix = matrix
+        self.compiler = compiler or ExpressionCompiler()
+        self._memo: Dict[int, tuple] = {}
+
+    def mask(self, node) -> np.ndarray:
+        """Boolean row mask for a compiled expression (None means always true)"""
+        if node is None:
+            return np.ones(self.matrix.n_rows, dtype=bool)
+        return self.evaluate(node).to_mask()
+
+    def evaluate(self, node) -> Factor:
+        key = id(node)
+        if key not in self._memo:
+            self._memo[key] = (node, self._evaluate(node))
+        return self._memo[key][1]
+
+    def _evaluate(self, node) -> Factor:
+        op = node[0]
+        n_rows = self.matrix.n_rows
+        if op == 'const':
+            return Factor.constant(node[1], n_rows)
+        if op == 'var':
+            column = self.matrix.lookup(node[1])
+            if column is None:
+                suffix = node[2] if len(node) > 2 else ''
+                return Factor.constant(False if suffix.upper() == 'NAOK' else None, n_rows)
+            return column
+        if op in ('or', 'and'):
+            masks = [self.evaluate(child).to_mask() for child in node[1:]]
+            combined = np.logical_or.reduce(masks) if op == 'or' else np.logical_and.reduce(masks)
+            return Factor(combined.astype(np.intp), [False, True])
+        if op == 'not':
+            return Factor((~self.evaluate(node[1]).to_mask()).astype(np.intp), [False, True])
+        if op == 'neg':
+            return self.evaluate(node[1]).map(lambda value: -to_number(value))
+        if op in COMPARISONS:
+            return combine([self.evaluate(node[1]), self.evaluate(node[2])],
+                           lambda left, right: compare_values(op, left, right))
+        if op == 'call':
+            function = FUNCTIONS.get(node[1])
+            if function is None:
+                return Factor.constant(None, n_rows)
+            args = [self.evaluate(arg) for arg in node[2:]]
+            if not args:
+                return Factor.constant(function([]), n_rows)
+            return combine(args, lambda *values: function(list(values)))
+        return combine([self.evaluate(node[1]), self.evaluate(node[2])],
+                       lambda left, right: apply_arithmetic(op, left, right))
+
+
+def _selected(matrix: ResponseMatrix, source: str, sub_code: str) -> np.ndarray:
+    column = matrix.lookup(f"{source}_{sub_code}")
+    if column is None:
+        return np.zeros(matrix.n_rows, dtype=bool)
+    if sub_code == 'other':
+        return column.map(lambda value: value is not None).to_mask()
+    return column.map(lambda value: value == SELECTED).to_mask()
+
+
+def shown_masks(survey: dict, matrix: ResponseMatrix, compiler: Optional[ExpressionCompiler] = None) -> Dict[str, np.ndarray]:
+    """Boolean "shown" mask per question code and per Q_SQ subquestion variable"""
+    evaluator = VectorEvaluator(matrix, compiler)
+    compiler = evaluator.compiler
+    label_sets = survey.get(LABEL_SETS_KEY)
+    masks = {}
+
+    for group in survey.get('question_groups', []):
+        group_mask = evaluator.mask(relevance_node(group, compiler))
+
+        for question in group.get('questions', []):
+            settings = question.get('settings', {})
+            question_mask = group_mask & evaluator.mask(relevance_node(question, compiler))
+            masks[question['code']] = question_mask
+
+            include = [s.strip() for s in (settings.get('array_filter') or '').split(';') if s.strip()]
+            exclude = [s.strip() for s in (settings.get('array_filter_exclude') or '').split(';') if s.strip()]
+            for sub in question_items(question, 'subquestions', label_sets):
+                sub_mask = question_mask.copy()
+                # Shown only if ticked in every array_filter source...
+                for source in include:
+                    sub_mask &= _selected(matrix, source, sub['code'])
+                # ...and in none of the array_filter_exclude sources
+                for source in exclude:
+                    sub_mask &= ~_selected(matrix, source, sub['code'])
+                masks[f"{question['code']}_{sub['code']}"] = sub_mask
+
+    return masks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute which questions every respondent was shown")
+    parser.add_argument('survey', help="converted Resonant survey JSON")
+    parser.add_argument('responses', help="response CSV with one column per variable (Q1, Q1_SQ001 or Q1[SQ001])")
+    parser.add_argument('-o', '--output', help="write the masks to this .npz file")
+    args = parser.parse_args()
+
+    with open(args.survey, 'r', encoding='utf-8') as f:
+        survey = json.load(f)
+
+    print(f"Loading {args.responses}...")
+    matrix = ResponseMatrix.from_csv(args.responses)
+    print(f"   {matrix.n_rows} responses x {len(matrix.columns)} columns")
+
+    masks = shown_masks(survey, matrix)
+    print(f"✅ Evaluated {len(masks)} question/subquestion masks")
+
+    if args.output:
+        np.savez_compressed(args.output, **masks)
+        print(f"   Saved to {args.output}")
+
+    for group in survey.get('question_groups', []):
+        for question in group.get('questions', []):
+            print(f"   {question['code']}: shown to {masks[question['code']].mean() * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
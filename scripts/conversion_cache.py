@@ -0,0 +1,226 @@
+"""
+Content-addressed on-disk cache for LimeSurvey -> Resonant JSON conversions
+Entries are keyed by a hash of the input bytes plus the converter name,
+converter version and options, so a hit skips parsing entirely. The version
+combines the converter's CONVERTER_VERSION with a hash of the source of every
+local module it imports (survey_model, expression_compiler, ...), so editing
+any of them invalidates old entries. The cache is bounded in size and evicts
+least-recently-used entries first.
+
+Usage:
+    from conversion_cache import ConversionCache
+    from lss_to_resonant_json import parse_lss_to_json
+
+    cache = ConversionCache('.conversion-cache', max_bytes=256 * 1024 * 1024)
+    survey = cache.convert(parse_lss_to_json, 'survey.lss')
+    print(cache.stats())
+
+The converter CLIs and batch_convert.py take --cache-dir / --cache-max-mb.
+"""
+
+import argparse
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import sys
+import types
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, List, Optional
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+ENTRY_SUFFIX = '.json'
+STATS_NAME = 'stats.json'
+LOCK_NAME = '.lock'
+
+
+def converter_name(converter: Callable) -> str:
+    """Stable name for a converter: its script's file stem plus the function name
+
+    Both XML converters export parse_lss_to_json, and either may run as __main__,
+    so the module's file name is what tells them apart.
+    """
+    module = sys.modules.get(converter.__module__)
+    stem = Path(module.__file__).stem if getattr(module, '__file__', None) else converter.__module__
+    return f"{stem}.{converter.__name__}"
+
+
+def converter_version(converter: Callable) -> str:
+    """CONVERTER_VERSION of the converter's module plus a hash of its local module sources"""
+    module = sys.modules.get(converter.__module__)
+    return f"{getattr(module, 'CONVERTER_VERSION', '0')}+{_source_digest(converter.__module__)}"
+
+
+def local_modules(module: types.ModuleType) -> List[types.ModuleType]:
+    """module and every module it imports, directly or not, from its own directory"""
+    root = Path(module.__file__).resolve().parent
+    found = {}
+    pending = [module]
+    while pending:
+        current = pending.pop()
+        found[current.__name__] = current
+        for value in vars(current).values():
+            imported = value if isinstance(value, types.ModuleType) else sys.modules.get(getattr(value, '__module__', None) or '')
+            path = getattr(imported, '__file__', None)
+            if path and imported.__name__ not in found and Path(path).resolve().parent == root:
+                pending.append(imported)
+    return sorted(found.values(), key=lambda m: Path(m.__file__).name)
+
+
+@functools.lru_cache(maxsize=None)
+def _source_digest(module_name: str) -> str:
+    # Computed once per process; sources don't change under a running batch
+    digest = hashlib.sha256()
+    for module in local_modules(sys.modules[module_name]):
+        digest.update(Path(module.__file__).name.encode('utf-8') + b'\0')
+        digest.update(Path(module.__file__).read_bytes() + b'\0')
+    return digest.hexdigest()[:16]
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--cache-dir', help="reuse conversions of unchanged inputs from this cache directory")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="evict least-recently-used cache entries beyond this size")
+
+
+def cache_from_args(args: argparse.Namespace) -> Optional['ConversionCache']:
+    """The ConversionCache selected by --cache-dir, or None when caching is off"""
+    if not args.cache_dir:
+        return None
+    return ConversionCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+
+
+class ConversionCache:
+    """Size-bounded LRU cache of converted surveys, shared safely between processes"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.last_hit = False
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, input_path: str, converter: str, version: str, options: Optional[dict] = None) -> str:
+        """sha256 over the input bytes, converter name, version and options"""
+        digest = hashlib.sha256()
+        with open(input_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        digest.update(b'\0' + converter.encode('utf-8'))
+        digest.update(b'\0' + version.encode('utf-8'))
+        digest.update(b'\0' + json.dumps(options or {}, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str, input_size: int = 0) -> Optional[dict]:
+        """Return the cached survey for key, or None; refreshes the entry's LRU position"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                survey = json.load(f)
+            # Another process may evict the entry between the read and the LRU refresh
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._record(misses=1)
+            return None
+
+        self._record(hits=1, bytes_saved=input_size)
+        return survey
+
+    def put(self, key: str, survey: dict):
+        """Store a converted survey and evict old entries if the cache is over budget"""
+        path = self._entry_path(key)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(survey, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def convert(self, converter: Callable, input_path: str, **options) -> dict:
+        """Run converter(input_path, **options) through the cache"""
+        key = self.key(input_path, converter_name(converter), converter_version(converter), options)
+        survey = self.get(key, input_size=os.path.getsize(input_path))
+        self.last_hit = survey is not None
+        if survey is None:
+            survey = converter(input_path, **options)
+            self.put(key, survey)
+        return survey
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits in max_bytes"""
+        with self._locked():
+            entries = []
+            total = 0
+            for path in self.cache_dir.glob(f'*{ENTRY_SUFFIX}'):
+                if path.name == STATS_NAME:
+                    continue
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+            entries.sort()
+            evicted = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                evicted += 1
+
+        if evicted:
+            self._record(evictions=evicted)
+
+    def stats(self) -> dict:
+        """Lifetime hit/miss/eviction counters plus current entry count and size"""
+        with self._locked():
+            stats = self._read_stats()
+        sizes = []
+        for path in self.cache_dir.glob(f'*{ENTRY_SUFFIX}'):
+            if path.name == STATS_NAME:
+                continue
+            try:
+                sizes.append(path.stat().st_size)
+            except FileNotFoundError:
+                continue
+        stats['entries'] = len(sizes)
+        stats['size_bytes'] = sum(sizes)
+        stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}{ENTRY_SUFFIX}'
+
+    def _read_stats(self) -> dict:
+        stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0, 'evictions': 0}
+        try:
+            with open(self.cache_dir / STATS_NAME, 'r', encoding='utf-8') as f:
+                stats.update(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return stats
+
+    def _record(self, **deltas):
+        """Add deltas to the persisted counters (several workers may share one cache)"""
+        with self._locked():
+            stats = self._read_stats()
+            for name, delta in deltas.items():
+                stats[name] += delta
+            tmp_path = self.cache_dir / f'{STATS_NAME}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(stats, f)
+            os.replace(tmp_path, self.cache_dir / STATS_NAME)
+
+    @contextmanager
+    def _locked(self):
+        with open(self.cache_dir / LOCK_NAME, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,203 @@
+"""
+Per-phase profiling for the survey converters (their --profile option)
+A ConversionProfile records, for each named phase, wall time and memory
+allocated (tracemalloc), plus counters such as rows seen per LSS table and
+question types that fell back to "text". Phases nest: a phase's self time
+excludes the phases run inside it, which is how lazily generated groups are
+split from the json writing that pulls them. The report is plain JSON; the
+same run can also be saved as cProfile/pstats data for snakeviz or pstats.
+
+Usage:
+    from conversion_profile import ConversionProfile
+
+    profile = ConversionProfile(cprofile=True)
+    profile.start()
+    with profile.phase('parse'):
+        ...
+    profile.stop()
+    profile.write_report('profile.json')
+    profile.dump_stats('profile.pstats')
+"""
+
+import cProfile
+import json
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+
+from survey_model import TYPE_MAP, Group
+
+REPORT_FORMAT = 'resonant-conversion-profile'
+
+
+class ConversionProfile:
+    """Phase timings, allocations and counters of one conversion"""
+
+    def __init__(self, enabled: bool = True, trace_allocations: bool = True, cprofile: bool = False):
+        self.enabled = enabled
+        self.trace_allocations = enabled and trace_allocations
+        self.phases: Dict[str, dict] = {}
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self._stack = []
+        self._profiler = cProfile.Profile() if enabled and cprofile else None
+        self._started = None
+        self._seconds = 0.0
+        self._peak = 0
+
+    def start(self):
+        if not self.enabled:
+            return
+        if self.trace_allocations:
+            tracemalloc.start()
+        if self._profiler is not None:
+            self._profiler.enable()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        if not self.enabled or self._started is None:
+            return
+        self._seconds = time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self.trace_allocations:
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self._started = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block; repeated phases with the same name accumulate"""
+        if not self.enabled:
+            yield
+            return
+        frame = {'child_seconds': 0.0, 'peak': 0}
+        if self.trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            self._peak = max(self._peak, peak)
+            tracemalloc.reset_peak()
+            frame['memory'] = current
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+            entry = self.phases.setdefault(name, {'calls': 0, 'seconds': 0.0, 'self_seconds': 0.0,
+                                                  'allocated_bytes': 0, 'peak_bytes': 0})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['self_seconds'] += seconds - frame['child_seconds']
+            if self._stack:
+                self._stack[-1]['child_seconds'] += seconds
+            if self.trace_allocations:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame['peak'])
+                entry['allocated_bytes'] += current - frame['memory']
+                entry['peak_bytes'] = max(entry['peak_bytes'], peak)
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+                self._peak = max(self._peak, peak)
+
+    def iter_phase(self, name: str, items: Iterable) -> Iterator:
+        """Yield from items, charging the time spent producing each one to a phase"""
+        if not self.enabled:
+            yield from items
+            return
+        iterator = iter(items)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, counter: str, key: str, n: int = 1):
+        if self.enabled:
+            counts = self.counters.setdefault(counter, {})
+            counts[key] = counts.get(key, 0) + n
+
+    def count_unknown_types(self, groups: Iterable[Group]):
+        """Count questions whose LimeSurvey type has no mapping and became "text" """
+        if not self.enabled:
+            return
+        for group in groups:
+            for question in group.questions:
+                if question.limesurvey_type not in TYPE_MAP:
+                    self.count('unknown_question_types', question.limesurvey_type)
+
+    def report(self) -> dict:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            'format': REPORT_FORMAT,
+            'seconds': round(self._seconds, 6),
+            'peak_traced_bytes': self._peak if self.trace_allocations else None,
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            'peak_rss_bytes': peak_rss if sys.platform == 'darwin' else peak_rss * 1024,
+            'phases': {name: {**entry, 'seconds': round(entry['seconds'], 6),
+                              'self_seconds': round(entry['self_seconds'], 6)}
+                       for name, entry in self.phases.items()},
+            'counters': self.counters,
+        }
+
+    def write_report(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def dump_stats(self, path: str):
+        """Save the cProfile data (pstats format); needs cprofile=True"""
+        if self._profiler is None:
+            raise ValueError("cProfile was not enabled for this profile")
+        self._profiler.dump_stats(path)
+
+    def summary_lines(self) -> Iterator[str]:
+        """Human-readable phase table for the CLI"""
+        for name, entry in sorted(self.phases.items(), key=lambda item: -item[1]['self_seconds']):
+            line = f"   {name:<16} {entry['self_seconds'] * 1000:9.1f} ms"
+            if self.trace_allocations:
+                line += f"  {entry['allocated_bytes'] / 2**20:+8.1f} MiB  peak {entry['peak_bytes'] / 2**20:7.1f} MiB"
+            yield line
+        for counter, counts in self.counters.items():
+            yield f"   {counter}: " + ", ".join(f"{key}={count}" for key, count in counts.items())
+
+
+# Shared disabled profile, so converters can always call profile.phase(...)
+NULL_PROFILE = ConversionProfile(enabled=False)
+
+
+def add_profile_arguments(parser):
+    """--profile / --profile-stats options shared by the converter CLIs"""
+    parser.add_argument('--profile', metavar='REPORT_JSON',
+                        help="write per-phase timings, allocations and counters to this JSON file")
+    parser.add_argument('--profile-stats', metavar='PSTATS',
+                        help="also run cProfile and save pstats data to this file")
+
+
+def profile_from_args(args) -> ConversionProfile:
+    if not (args.profile or args.profile_stats):
+        return NULL_PROFILE
+    profile = ConversionProfile(cprofile=bool(args.profile_stats))
+    profile.start()
+    return profile
+
+
+def finish_profile(profile: ConversionProfile, args):
+    """Stop profiling and write whatever outputs were requested"""
+    if not profile.enabled:
+        return
+    profile.stop()
+    print(f"Profile ({profile.report()['seconds']:.3f}s):")
+    for line in profile.summary_lines():
+        print(line)
+    if args.profile:
+        profile.write_report(args.profile)
+        print(f"✅ Created {args.profile}")
+    if args.profile_stats:
+        profile.dump_stats(args.profile_stats)
+        print(f"✅ Created {args.profile_stats}")
@@ -3,32 +3,87 @@
 Convert LimeSurvey TSV to Resonant Survey JSON
 
 Usage:
-    python convert_limesurvey_to_json.py input.tsv output.json
+    python convert_limesurvey_to_json.py input.tsv output.json [--format compact|ndjson|sharded]
 """
 
-import sys
-import json
+import argparse
 import csv
-from typing import Dict, List, Any
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from conversion_cache import add_cache_arguments, cache_from_args
+from conversion_profile import NULL_PROFILE, ConversionProfile, add_profile_arguments, finish_profile, profile_from_args
+from expression_compiler import ExpressionCompiler
+from survey_model import (
+    AnswerOption, Group, Question, SubQuestion, Survey, group_to_json, map_type, survey_header, survey_to_json,
+)
+from survey_writer import OUTPUT_FORMATS, dump_survey_output, write_survey_output
+
+# Bump whenever the output format changes so cached conversions are invalidated
+CONVERTER_VERSION = "2"
+# Whether the CLI escapes non-ASCII text in its JSON output (batch_convert follows it)
+ENSURE_ASCII = False
 
 def parse_limesurvey_tsv(filename: str) -> Dict[str, Any]:
-    """Parse LimeSurvey TSV file into Resonant JSON format"""
+    """Parse LimeSurvey TSV file into Resonant JSON format (relevance_logic compiled alongside)"""
     
-    survey = {
-        "title": "Imported Survey",
-        "description": "",
-        "status": "draft",
-        "settings": {
-            "format": "group_by_group",
-            "theme": "editorial_academic",
-            "show_progress_bar": True,
-            "allow_backward_navigation": False
-        },
-        "question_groups": []
-    }
+    return survey_to_json(read_tsv_model(filename), 'tsv', ExpressionCompiler())
+
+def read_tsv_model(filename: str) -> Survey:
+    """Parse LimeSurvey TSV file into the shared survey model"""
+    
+    survey, groups = stream_tsv(filename)
+    survey.groups = list(groups)
+    
+    return survey
+
+@dataclass(slots=True)
+class SurveySettingEvent:
+    name: str
+    value: str
+
+@dataclass(slots=True)
+class GroupEvent:
+    """A G row; the group's questions are attached as they are read"""
+    group_id: str
+    group: Group
+
+@dataclass(slots=True)
+class QuestionEvent:
+    question_id: str
+    group_id: str
+    question: Question
+
+@dataclass(slots=True)
+class SubQuestionEvent:
+    question_id: str
+    subquestion: SubQuestion
+
+@dataclass(slots=True)
+class AnswerEvent:
+    question_id: str
+    answer_option: AnswerOption
+
+@dataclass(slots=True)
+class GroupEndEvent:
+    """The group is complete: the next G row started or the file ended"""
+    group_id: str
+    group: Group
+
+TSVEvent = Union[SurveySettingEvent, GroupEvent, QuestionEvent, SubQuestionEvent, AnswerEvent, GroupEndEvent]
+
+def iter_tsv_events(filename: str) -> Iterator[TSVEvent]:
+    """Yield one typed event per TSV row, plus a GroupEndEvent as each group completes
     
-    groups: Dict[str, Any] = {}
-    questions: Dict[str, Any] = {}
+    Only the current group is held in memory. LimeSurvey writes questions
+    right after their group and subquestions / answers right after their
+    question, so rows that point back into an already completed group are
+    dropped, just like rows that point to an id that never appeared.
+    """
+    
+    group_id, group = None, None
+    questions: Dict[str, Question] = {}
+    group_count = question_count = 0
     
     with open(filename, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f, delimiter='\t')
@@ -38,112 +93,194 @@ def parse_limesurvey_tsv(filename: str) -> Dict[str, Any]:
             
             # Survey settings
             if row_class == 'S':
-                if row['name'] == 'surveyls_title':
-                    survey['title'] = row['text']
-                elif row['name'] == 'surveyls_description':
-                    survey['description'] = row['text']
+                yield SurveySettingEvent(row['name'], row['text'])
             
-            # Question groups
+            # Question groups: flush the previous one first
             elif row_class == 'G':
+                if group is not None:
+                    yield GroupEndEvent(group_id, group)
                 group_id = row['id']
-                groups[group_id] = {
-                    "title": row['text'],
-                    "description": row.get('help', ''),
-                    "order_index": len(groups),
-                    "relevance_logic": row.get('relevance', ''),
-                    "questions": []
-                }
+                group = Group(
+                    title=row['text'],
+                    description=row.get('help', ''),
+                    order_index=group_count,
+                    relevance=row.get('relevance', '')
+                )
+                group_count += 1
+                questions = {}
+                yield GroupEvent(group_id, group)
             
             # Questions
             elif row_class == 'Q':
                 question_id = row['id']
                 related_id = row.get('related_id', '')
                 
-                question = {
-                    "code": row['name'],
-                    "question_text": row['text'],
-                    "help_text": row.get('help', ''),
-                    "question_type": map_question_type(row['type']),
-                    "settings": {
-                        "mandatory": row.get('mandatory', 'N') == 'Y',
-                        "other_option": row.get('other', 'N') == 'Y'
-                    },
-                    "relevance_logic": row.get('relevance', ''),
-                    "order_index": len(questions),
-                    "subquestions": [],
-                    "answer_options": []
-                }
-                
+                question = Question(
+                    code=row['name'],
+                    text=row['text'],
+                    help_text=row.get('help', ''),
+                    limesurvey_type=row['type'],
+                    mandatory=row.get('mandatory', 'N') == 'Y',
+                    other=row.get('other', 'N') == 'Y',
+                    relevance=row.get('relevance', ''),
+                    order_index=question_count
+                )
+                question_count += 1
                 questions[question_id] = question
                 
-                # Add to appropriate group
-                if related_id in groups:
-                    groups[related_id]['questions'].append(question)
+                # Add to the current group
+                if group is not None and related_id == group_id:
+                    group.questions.append(question)
+                    yield QuestionEvent(question_id, related_id, question)
             
             # Subquestions
             elif row_class == 'SQ':
                 related_id = row.get('related_id', '')
                 if related_id in questions:
-                    questions[related_id]['subquestions'].append({
-                        "code": row['name'],
-                        "label": row['text'],
-                        "order_index": len(questions[related_id]['subquestions'])
-                    })
+                    subquestions = questions[related_id].subquestions
+                    subquestion = SubQuestion(
+                        code=row['name'],
+                        label=row['text'],
+                        order_index=len(subquestions)
+                    )
+                    subquestions.append(subquestion)
+                    yield SubQuestionEvent(related_id, subquestion)
             
             # Answer options
             elif row_class == 'A':
                 related_id = row.get('related_id', '')
                 if related_id in questions:
-                    questions[related_id]['answer_options'].append({
-                        "code": row['name'],
-                        "label": row['text'],
-                        "order_index": len(questions[related_id]['answer_options']),
-                        "scale_id": int(row.get('scale_id', 0))
-                    })
+                    answer_options = questions[related_id].answer_options
+                    answer_option = AnswerOption(
+                        code=row['name'],
+                        label=row['text'],
+                        order_index=len(answer_options),
+                        scale_id=int(row.get('scale_id', 0))
+                    )
+                    answer_options.append(answer_option)
+                    yield AnswerEvent(related_id, answer_option)
     
-    # Convert groups dict to list
-    survey['question_groups'] = list(groups.values())
+    if group is not None:
+        yield GroupEndEvent(group_id, group)
+
+def new_tsv_survey() -> Survey:
+    """Survey header defaults for TSV imports, before any S rows are applied"""
     
-    return survey
+    return Survey(
+        title="Imported Survey",
+        description="",
+        status="draft",
+        settings={
+            "format": "group_by_group",
+            "theme": "editorial_academic",
+            "show_progress_bar": True,
+            "allow_backward_navigation": False
+        }
+    )
+
+def apply_survey_setting(survey: Survey, event: SurveySettingEvent):
+    if event.name == 'surveyls_title':
+        survey.title = event.value
+    elif event.name == 'surveyls_description':
+        survey.description = event.value
+
+def stream_tsv(filename: str, profile: Optional[ConversionProfile] = None) -> Tuple[Survey, Iterator[Group]]:
+    """(survey header, generator of completed groups) for streaming writers
+    
+    S rows may appear anywhere in a TSV export, so the header is filled by a
+    cheap pre-pass over the settings rows and is complete before the first
+    group is yielded. With a profile, rows are counted per event type.
+    """
+    
+    profile = profile or NULL_PROFILE
+    survey = new_tsv_survey()
+    for event in iter_survey_settings(filename):
+        apply_survey_setting(survey, event)
+    events = iter_tsv_events(filename)
+    if profile.enabled:
+        events = _counted(events, profile)
+    
+    def groups() -> Iterator[Group]:
+        for event in events:
+            if isinstance(event, GroupEndEvent):
+                yield event.group
+    
+    return survey, groups()
+
+def iter_survey_settings(filename: str) -> Iterator[SurveySettingEvent]:
+    """Only the S rows of a TSV export; every other row is skipped without building anything"""
+    
+    with open(filename, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f, delimiter='\t'):
+            if row.get('class', '') == 'S':
+                yield SurveySettingEvent(row['name'], row['text'])
+
+def _counted(events: Iterator[TSVEvent], profile: ConversionProfile) -> Iterator[TSVEvent]:
+    for event in events:
+        profile.count('tsv_events', type(event).__name__)
+        yield event
 
 def map_question_type(limesurvey_type: str) -> str:
     """Map LimeSurvey question type to Resonant type"""
-    type_map = {
-        'T': 'long_text',
-        'S': 'text',
-        'L': 'multiple_choice_single',
-        'M': 'multiple_choice_multiple',
-        'F': 'array',
-        'R': 'ranking',
-        '5': 'multiple_choice_single',  # 5-point choice
-        'D': 'date',
-        'Y': 'yes_no',
-        'X': 'text_display',
-        '*': 'equation',
-        '!': 'dropdown'
-    }
-    return type_map.get(limesurvey_type, 'text')
+    return map_type(limesurvey_type)
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python convert_limesurvey_to_json.py input.tsv output.json")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Convert LimeSurvey TSV to Resonant Survey JSON")
+    parser.add_argument('input', help="LimeSurvey .tsv export")
+    parser.add_argument('output', help="Resonant survey JSON to write")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='pretty',
+                        help="pretty (indented), compact, ndjson (one question per line), "
+                             "or sharded (output is a directory: one line per group plus a manifest)")
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    input_file = args.input
+    output_file = args.output
     
     print(f"Converting {input_file} to Resonant Survey JSON...")
     
-    survey = parse_limesurvey_tsv(input_file)
+    profile = profile_from_args(args)
+    cache = cache_from_args(args)
+    if cache is not None:
+        with profile.phase('cache'):
+            survey_json = cache.convert(parse_limesurvey_tsv, input_file)
+        with profile.phase('json_dump'):
+            counts = dump_survey_output(survey_json, output_file, args.format, ensure_ascii=ENSURE_ASCII)
+        print(f"✅ Converted successfully to {output_file} "
+              f"({'reused cached' if cache.last_hit else 'cached new'} conversion)")
+        print(f"   Title: {survey_json['title']}")
+        print(f"   Groups: {counts['groups']}")
+        print(f"   Questions: {counts['questions']}")
+        finish_profile(profile, args)
+        return
+    
+    # Each group is written as soon as the next G row starts
+    with profile.phase('parse'):
+        survey, groups = stream_tsv(input_file, profile)
+    groups = profile.iter_phase('parse', groups)
+    
+    compiler = ExpressionCompiler()
+    
+    def serialized_groups():
+        for group in groups:
+            profile.count_unknown_types([group])
+            with profile.phase('serialize'):
+                group_json = group_to_json(group, 'tsv', compiler)
+            yield group_json
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(survey, f, indent=2, ensure_ascii=False)
+    with profile.phase('json_dump'):
+        counts = write_survey_output(output_file, survey_header(survey), serialized_groups(), args.format,
+                                     ensure_ascii=ENSURE_ASCII)
     
     print(f"✅ Converted successfully to {output_file}")
-    print(f"   Title: {survey['title']}")
-    print(f"   Groups: {len(survey['question_groups'])}")
-    total_questions = sum(len(g['questions']) for g in survey['question_groups'])
-    print(f"   Questions: {total_questions}")
+    print(f"   Title: {survey.title}")
+    print(f"   Groups: {counts['groups']}")
+    print(f"   Questions: {counts['questions']}")
+    print(f"   Compiled {compiler.stats()['expressions']} distinct expressions")
+    for error in compiler.errors:
+        print(f"⚠️  {error['code']} {error['field']}: {error['error']}")
+    finish_profile(profile, args)
 
 if __name__ == '__main__':
     main()
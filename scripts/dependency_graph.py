@@ -0,0 +1,199 @@
+"""
+Question dependency graph for incremental relevance re-evaluation
+Records which question codes each relevance, array_filter(_exclude) and
+validation setting reads, orders the questions topologically and reports
+cycles. The graph is embedded in converted surveys as a reverse index
+(question code -> dependent question codes), so the runtime only re-evaluates
+conditions that a changed answer can affect.
+"""
+
+import heapq
+from typing import Dict, Iterable, List, Optional
+
+from expression_compiler import COMPILED_SUFFIX, ExpressionCompiler, variable_references
+from label_sets import LABEL_SETS_KEY, question_items
+from survey_model import relevance_node
+
+# Question settings whose filters are read at runtime (relevance and em_validation_q are expressions)
+FILTER_SETTINGS = ('array_filter', 'array_filter_exclude')
+
+# ExpressionScript names that refer to the current question, not another one
+SELF_REFERENCES = {'self', 'that', 'this'}
+
+
+class DependencyGraph:
+    """Questions in survey order plus the variables each one reads"""
+
+    def __init__(self):
+        self.codes: List[str] = []
+        self._position: Dict[str, int] = {}
+        self._variables: Dict[str, str] = {}
+        self._reads: Dict[str, List[str]] = {}
+
+    def add_question(self, code: str, subquestion_codes: Iterable[str] = ()):
+        """Register a question and the SGQ-style variables (Q1_SQ001) that belong to it"""
+        if code in self._position:
+            return
+        self._position[code] = len(self.codes)
+        self.codes.append(code)
+        self._reads[code] = []
+        self._variables.setdefault(code, code)
+        for sub_code in subquestion_codes:
+            self._variables.setdefault(f"{code}_{sub_code}", code)
+
+    def add_expression(self, code: str, node):
+        """Record every variable a compiled expression reads as a dependency of code"""
+        for var in variable_references(node):
+            self._reads[code].append(var[1])
+
+    def add_filter(self, code: str, value: Optional[str]):
+        """array_filter settings name source questions directly, ';'-separated"""
+        if value:
+            self._reads[code].extend(part.strip() for part in str(value).split(';') if part.strip())
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Question code a variable name belongs to (Q1_SQ006 -> Q1), or None"""
+        if name in self._variables:
+            return self._variables[name]
+        # Longest known prefix, for codes that themselves contain underscores
+        parts = name.split('_')
+        for i in range(len(parts) - 1, 0, -1):
+            prefix = '_'.join(parts[:i])
+            if prefix in self._variables:
+                return self._variables[prefix]
+        return None
+
+    def build(self) -> dict:
+        """Reverse index, evaluation order, cycles and unresolved names as plain JSON"""
+        dependents: Dict[str, set] = {code: set() for code in self.codes}
+        depends_on: Dict[str, set] = {code: set() for code in self.codes}
+        unresolved: Dict[str, List[str]] = {}
+
+        for code in self.codes:
+            for name in self._reads[code]:
+                if name.lower() in SELF_REFERENCES:
+                    source = code
+                else:
+                    source = self.resolve(name)
+                if source is None:
+                    if name not in unresolved.setdefault(code, []):
+                        unresolved[code].append(name)
+                    continue
+                dependents[source].add(code)
+                if source != code:
+                    depends_on[code].add(source)
+
+        order, cycles = self._order(dependents, depends_on)
+        by_position = lambda codes: sorted(codes, key=self._position.__getitem__)
+        return {
+            'dependents': {code: by_position(deps) for code, deps in dependents.items() if deps},
+            'evaluation_order': order,
+            'cycles': cycles,
+            'unresolved': unresolved,
+        }
+
+    def _order(self, dependents: Dict[str, set], depends_on: Dict[str, set]):
+        """Kahn's algorithm with survey order as the tie-break; leftovers are cyclic"""
+        remaining = {code: len(sources) for code, sources in depends_on.items()}
+        ready = [self._position[code] for code, count in remaining.items() if count == 0]
+        heapq.heapify(ready)
+        order = []
+
+        while ready:
+            code = self.codes[heapq.heappop(ready)]
+            order.append(code)
+            for dependent in dependents[code]:
+                if dependent == code:
+                    continue
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    heapq.heappush(ready, self._position[dependent])
+
+        stuck = [code for code in self.codes if remaining[code] > 0]
+        cycles = self._strongly_connected(stuck, depends_on) if stuck else []
+        # Cyclic questions (and anything downstream of them) keep survey order
+        return order + stuck, cycles
+
+    def _strongly_connected(self, codes: List[str], depends_on: Dict[str, set]) -> List[List[str]]:
+        """Iterative Tarjan over the questions Kahn could not order"""
+        members = set(codes)
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        on_stack = set()
+        stack: List[str] = []
+        cycles = []
+
+        for root in codes:
+            if root in index:
+                continue
+            work = [(root, iter(sorted(depends_on[root] & members, key=self._position.__getitem__)))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                advanced = False
+                for child in children:
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(sorted(depends_on[child] & members,
+                                                        key=self._position.__getitem__))))
+                        advanced = True
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        cycles.append(sorted(component, key=self._position.__getitem__))
+
+        return sorted(cycles, key=lambda cycle: self._position[cycle[0]])
+
+
+def _compiled_or_compile(settings: dict, field: str, compiler: ExpressionCompiler):
+    compiled = settings.get(field + COMPILED_SUFFIX)
+    if compiled is not None:
+        return compiler.nodes.load(compiled)
+    return compiler.try_compile(settings.get(field))
+
+
+def build_survey_dependency_graph(survey: dict, compiler: Optional[ExpressionCompiler] = None) -> dict:
+    """Dependency graph of a converted survey (any dialect)
+
+    question_groups is read once, one group at a time, so converters can pass
+    a generator of serialized groups and put the graph in the document header
+    ahead of the streamed groups. Variable names are only resolved in build(),
+    after every question has been registered.
+    """
+    compiler = compiler or ExpressionCompiler()
+    graph = DependencyGraph()
+    label_sets = survey.get(LABEL_SETS_KEY)
+
+    for group in survey.get('question_groups', []):
+        group_node = relevance_node(group, compiler)
+        for question in group.get('questions', []):
+            code = question['code']
+            settings = question.get('settings', {})
+            graph.add_question(code, (sq['code'] for sq in question_items(question, 'subquestions', label_sets)))
+            for node in (group_node, relevance_node(question, compiler),
+                         _compiled_or_compile(settings, 'em_validation_q', compiler)):
+                if node is not None:
+                    graph.add_expression(code, node)
+            for field in FILTER_SETTINGS:
+                graph.add_filter(code, settings.get(field))
+
+    return graph.build()
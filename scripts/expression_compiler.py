@@ -0,0 +1,508 @@
+"""
+Compile LimeSurvey ExpressionScript (relevance / validation) into a compact AST
+Expressions are parsed once at conversion time and written next to the raw
+string, so the runtime never has to re-parse them per page render. The grammar
+and evaluation rules mirror src/lib/survey/expression-engine.ts.
+
+Compiled form (JSON arrays; the first element is the opcode):
+    ["const", value]                      literal number / string / bool / null
+    ["var", "Q1_SQ006", "NAOK"]           variable, optional .suffix
+    ["or", a, b, ...], ["and", a, b, ...] short-circuit, flattened
+    ["not", a], ["neg", a]
+    ["==", a, b], ["!=", ...], ["<", ...], ["<=", ...], [">", ...], [">=", ...]
+    ["+", a, b], ["-", ...], ["*", ...], ["/", ...], ["%", ...]
+    ["call", "is_empty", arg, ...]
+"""
+
+import math
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Node = Tuple[Any, ...]
+
+TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<num>\d+(?:\.\d*)?|\.\d+)
+  | (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op>==|!=|<=|>=|&&|\|\||[-+*/%<>!(),])
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)?)
+''', re.VERBOSE)
+
+WORD_OPERATORS = {
+    'and': '&&', 'or': '||', 'not': '!',
+    'eq': '==', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>=',
+}
+LITERALS = {'true': True, 'false': False, 'null': None}
+COMPARISONS = ('==', '!=', '<', '<=', '>', '>=')
+
+# Settings that hold ExpressionScript, per level of the converted survey
+GROUP_EXPRESSION_FIELDS = ('relevance',)
+QUESTION_EXPRESSION_FIELDS = ('relevance', 'em_validation_q')
+# Expressions kept on the group / question itself rather than in its settings
+# (lss dialect group relevance, tsv dialect relevance_logic)
+INLINE_EXPRESSION_FIELDS = ('relevance', 'relevance_logic')
+COMPILED_SUFFIX = '_compiled'
+
+
+class ExpressionSyntaxError(ValueError):
+    """Raised for expressions that are not valid ExpressionScript"""
+
+    def __init__(self, message: str, expression: str, position: int):
+        super().__init__(f"{message} at position {position} in {expression!r}")
+        self.expression = expression
+        self.position = position
+
+
+def tokenize(expression: str) -> List[Tuple[str, Any, int]]:
+    """Split an expression into (kind, value, position) tokens"""
+    tokens = []
+    pos = 0
+    while pos < len(expression):
+        match = TOKEN_RE.match(expression, pos)
+        if not match:
+            raise ExpressionSyntaxError(f"Unexpected character {expression[pos]!r}", expression, pos)
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'num':
+            tokens.append(('const', float(text) if '.' in text else int(text), pos))
+        elif kind == 'str':
+            tokens.append(('const', re.sub(r'\\(.)', r'\1', text[1:-1]), pos))
+        elif kind == 'op':
+            tokens.append(('op', text, pos))
+        elif kind == 'name':
+            lowered = text.lower()
+            if lowered in WORD_OPERATORS:
+                tokens.append(('op', WORD_OPERATORS[lowered], pos))
+            elif lowered in LITERALS:
+                tokens.append(('const', LITERALS[lowered], pos))
+            else:
+                tokens.append(('name', text, pos))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the token list: or < and < not < comparison < +- < */% < unary"""
+
+    def __init__(self, expression: str, intern):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.pos = 0
+        self.intern = intern
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise ExpressionSyntaxError("Empty expression", self.expression, 0)
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            self.error(f"Unexpected token {self.tokens[self.pos][1]!r}")
+        return node
+
+    def error(self, message: str):
+        position = self.tokens[self.pos][2] if self.pos < len(self.tokens) else len(self.expression)
+        raise ExpressionSyntaxError(message, self.expression, position)
+
+    def peek_op(self, *ops) -> Optional[str]:
+        if self.pos < len(self.tokens):
+            kind, value, _ = self.tokens[self.pos]
+            if kind == 'op' and value in ops:
+                return value
+        return None
+
+    def expect_op(self, op: str):
+        if not self.peek_op(op):
+            self.error(f"Expected {op!r}")
+        self.pos += 1
+
+    def parse_or(self) -> Node:
+        operands = [self.parse_and()]
+        while self.peek_op('||'):
+            self.pos += 1
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else self.intern(('or', *operands))
+
+    def parse_and(self) -> Node:
+        operands = [self.parse_not()]
+        while self.peek_op('&&'):
+            self.pos += 1
+            operands.append(self.parse_not())
+        return operands[0] if len(operands) == 1 else self.intern(('and', *operands))
+
+    def parse_not(self) -> Node:
+        if self.peek_op('!'):
+            self.pos += 1
+            return self.intern(('not', self.parse_not()))
+        return self.parse_comparison()
+
+    def parse_comparison(self) -> Node:
+        left = self.parse_additive()
+        op = self.peek_op(*COMPARISONS)
+        if op:
+            self.pos += 1
+            left = self.intern((op, left, self.parse_additive()))
+        return left
+
+    def parse_additive(self) -> Node:
+        left = self.parse_multiplicative()
+        while True:
+            op = self.peek_op('+', '-')
+            if not op:
+                return left
+            self.pos += 1
+            left = self.intern((op, left, self.parse_multiplicative()))
+
+    def parse_multiplicative(self) -> Node:
+        left = self.parse_unary()
+        while True:
+            op = self.peek_op('*', '/', '%')
+            if not op:
+                return left
+            self.pos += 1
+            left = self.intern((op, left, self.parse_unary()))
+
+    def parse_unary(self) -> Node:
+        if self.peek_op('-'):
+            self.pos += 1
+            operand = self.parse_unary()
+            if operand[0] == 'const' and isinstance(operand[1], (int, float)):
+                return self.intern(('const', -operand[1]))
+            return self.intern(('neg', operand))
+        if self.peek_op('+'):
+            self.pos += 1
+            return self.parse_unary()
+        if self.peek_op('!'):
+            self.pos += 1
+            return self.intern(('not', self.parse_unary()))
+        return self.parse_primary()
+
+    def parse_primary(self) -> Node:
+        if self.pos >= len(self.tokens):
+            self.error("Unexpected end of expression")
+        kind, value, _ = self.tokens[self.pos]
+
+        if kind == 'op' and value == '(':
+            self.pos += 1
+            node = self.parse_or()
+            self.expect_op(')')
+            return node
+
+        if kind == 'const':
+            self.pos += 1
+            return self.intern(('const', value))
+
+        if kind == 'name':
+            self.pos += 1
+            if self.peek_op('('):
+                self.pos += 1
+                args = []
+                if not self.peek_op(')'):
+                    args.append(self.parse_or())
+                    while self.peek_op(','):
+                        self.pos += 1
+                        args.append(self.parse_or())
+                self.expect_op(')')
+                return self.intern(('call', value.lower(), *args))
+            name, _, suffix = value.partition('.')
+            return self.intern(('var', name, suffix) if suffix else ('var', name))
+
+        self.error(f"Unexpected token {value!r}")
+
+
+def strip_braces(expression: str) -> str:
+    """Drop one pair of outer {...} as the runtime engine does"""
+    cleaned = expression.strip()
+    if cleaned.startswith('{') and cleaned.endswith('}'):
+        cleaned = cleaned[1:-1].strip()
+    return cleaned
+
+
+def variable_references(node: Node) -> Iterator[Node]:
+    """Yield every ("var", name[, suffix]) node in a compiled expression"""
+    op = node[0]
+    if op == 'var':
+        yield node
+    elif op != 'const':
+        for child in node[2:] if op == 'call' else node[1:]:
+            yield from variable_references(child)
+
+
+def _intern_key(node: Node) -> tuple:
+    """Identity key for hash-consing: children by id (they are already canonical),
+    literals by type and value so 1, 1.0 and True stay distinct"""
+    return (node[0],) + tuple(
+        id(item) if isinstance(item, tuple) else (type(item).__name__, item)
+        for item in node[1:]
+    )
+
+
+class NodeTable:
+    """Hash-consing table: equal subtrees map to one shared node instance"""
+
+    def __init__(self):
+        self._nodes: Dict[tuple, Node] = {}
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def intern(self, node: Node) -> Node:
+        """Return the canonical instance of a node (its children must already be canonical)"""
+        return self._nodes.setdefault(_intern_key(node), node)
+
+    def load(self, compiled: Any) -> Node:
+        """Intern a compiled expression loaded back from JSON (nested lists)"""
+        if not isinstance(compiled, list):
+            return compiled
+        if compiled and compiled[0] == 'const':
+            return self.intern(('const', compiled[1]))
+        return self.intern(tuple(self.load(item) for item in compiled))
+
+
+class ExpressionCompiler:
+    """Compiles expressions once, sharing identical sub-expressions across the whole survey"""
+
+    def __init__(self, nodes: Optional[NodeTable] = None):
+        self.nodes = nodes or NodeTable()
+        self._compiled: Dict[str, Node] = {}
+        self.errors: List[dict] = []
+
+    def intern(self, node: Node) -> Node:
+        return self.nodes.intern(node)
+
+    def compile(self, expression: str) -> Node:
+        """Compile one expression; raises ExpressionSyntaxError"""
+        if expression in self._compiled:
+            return self._compiled[expression]
+        node = _Parser(strip_braces(expression), self.intern).parse()
+        self._compiled[expression] = node
+        return node
+
+    def try_compile(self, expression: Optional[str]) -> Optional[Node]:
+        """Compile if possible; None for empty or invalid expressions (nothing is recorded)"""
+        if expression is None or not str(expression).strip():
+            return None
+        try:
+            return self.compile(str(expression))
+        except ExpressionSyntaxError:
+            return None
+
+    def compile_field(self, expression: Optional[str], code: str, field: str) -> Optional[Node]:
+        """Compile a setting value, recording (rather than raising) syntax errors"""
+        if expression is None or not str(expression).strip():
+            return None
+        try:
+            return self.compile(str(expression))
+        except ExpressionSyntaxError as e:
+            self.errors.append({
+                'code': code,
+                'field': field,
+                'expression': expression,
+                'error': str(e),
+            })
+            return None
+
+    def compile_group(self, group: dict) -> dict:
+        """Add <field>_compiled next to every non-empty expression of a converted group
+
+        Works for every converter dialect: expressions in settings are compiled
+        in place, inline ones get their compiled form right after the source.
+        """
+        title = group.get('title', '')
+        self._compile_settings(group.get('settings', {}), GROUP_EXPRESSION_FIELDS, title)
+        for question in group.get('questions', []):
+            self._compile_settings(question.get('settings', {}), QUESTION_EXPRESSION_FIELDS, question.get('code', ''))
+        if 'questions' in group:
+            group['questions'] = [self._compile_inline(question, question.get('code', ''))
+                                  for question in group['questions']]
+        return self._compile_inline(group, title)
+
+    def _compile_settings(self, settings: dict, fields: Tuple[str, ...], code: str):
+        for field in fields:
+            if _has_expression(settings.get(field)):
+                settings[field + COMPILED_SUFFIX] = self.compile_field(settings[field], code, field)
+
+    def _compile_inline(self, item: dict, code: str) -> dict:
+        if not any(_has_expression(item.get(field)) for field in INLINE_EXPRESSION_FIELDS):
+            return item
+        compiled = {}
+        for key, value in item.items():
+            compiled[key] = value
+            if key in INLINE_EXPRESSION_FIELDS and _has_expression(value):
+                compiled[key + COMPILED_SUFFIX] = self.compile_field(value, code, key)
+        return compiled
+
+    def stats(self) -> dict:
+        return {
+            'expressions': len(self._compiled),
+            'unique_nodes': len(self.nodes),
+            'errors': len(self.errors),
+        }
+
+
+def _has_expression(value) -> bool:
+    return value is not None and bool(str(value).strip())
+
+
+def to_number(value) -> float:
+    """Numeric value with the runtime's coercions; NaN when not numeric"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _is_numeric(value) -> bool:
+    return not isinstance(value, str) or not math.isnan(to_number(value))
+
+
+def to_bool(value) -> bool:
+    """Truthiness rules of the runtime engine"""
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return value not in ('', 'false', '0')
+    if isinstance(value, float) and math.isnan(value):
+        return False
+    return bool(value)
+
+
+def loose_equals(left, right) -> bool:
+    """JavaScript-style == as used by the runtime: numeric when both sides look numeric"""
+    if left is None or right is None:
+        return left is right
+    if isinstance(left, str) and isinstance(right, str):
+        return left == right
+    if _is_numeric(left) and _is_numeric(right):
+        return to_number(left) == to_number(right)
+    return str(left) == str(right)
+
+
+def compare_values(op: str, left, right) -> bool:
+    """Evaluate one comparison operator on two scalar values"""
+    if op == '==':
+        return loose_equals(left, right)
+    if op == '!=':
+        return not loose_equals(left, right)
+    if left is None or right is None:
+        return False
+    a, b = to_number(left), to_number(right)
+    if op == '<':
+        return a < b
+    if op == '<=':
+        return a <= b
+    if op == '>':
+        return a > b
+    return a >= b
+
+
+def apply_arithmetic(op: str, left, right):
+    """Evaluate one arithmetic operator; '+' concatenates when either side is a string"""
+    if op == '+':
+        if isinstance(left, str) or isinstance(right, str):
+            return f"{'' if left is None else left}{'' if right is None else right}"
+        return to_number(left) + to_number(right)
+    a, b = to_number(left), to_number(right)
+    if op == '-':
+        return a - b
+    if op == '*':
+        return a * b
+    if b == 0:
+        return math.nan
+    return a / b if op == '/' else math.fmod(a, b)
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == ''
+
+
+FUNCTIONS = {
+    'is_empty': lambda args: _is_empty(args[0] if args else None),
+    'is_null': lambda args: (args[0] if args else None) is None,
+    'is_numeric': lambda args: bool(args) and args[0] is not None and _is_numeric(args[0])
+                               and not math.isnan(to_number(args[0])),
+    'intval': lambda args: int(to_number(args[0])) if not math.isnan(to_number(args[0])) else 0,
+    'floatval': lambda args: 0.0 if math.isnan(to_number(args[0])) else to_number(args[0]),
+    'abs': lambda args: abs(to_number(args[0])),
+    'min': lambda args: min(to_number(a) for a in args),
+    'max': lambda args: max(to_number(a) for a in args),
+    'strlen': lambda args: len('' if args[0] is None else str(args[0])),
+    'count': lambda args: sum(1 for a in args if not _is_empty(a)),
+    'sum': lambda args: sum(n for n in (to_number(a) for a in args) if not math.isnan(n)),
+    'if': lambda args: args[1] if to_bool(args[0]) else (args[2] if len(args) > 2 else None),
+    'iif': lambda args: args[1] if to_bool(args[0]) else (args[2] if len(args) > 2 else None),
+    'regexmatch': lambda args: re.search(str(args[0]).strip('/'), '' if args[1] is None else str(args[1])) is not None,
+}
+
+
+class ExpressionEvaluator:
+    """Reference evaluator for compiled expressions
+
+    Results are memoized per node. Nodes are shared across questions (by the
+    compiler, or by load() for expressions read back from converted JSON), so a
+    sub-expression that appears in many relevance conditions is evaluated once
+    per answer state. Changing an answer clears the memo.
+    """
+
+    def __init__(self, answers: Optional[Dict[str, Any]] = None, nodes: Optional[NodeTable] = None):
+        self.answers: Dict[str, Any] = dict(answers or {})
+        self.nodes = nodes or NodeTable()
+        self._memo: Dict[int, Any] = {}
+
+    def load(self, compiled: Any) -> Node:
+        """Prepare a *_compiled value from converted JSON for evaluation"""
+        return self.nodes.load(compiled)
+
+    def set_answer(self, name: str, value):
+        self.answers[name] = value
+        self._memo.clear()
+
+    def update(self, answers: Dict[str, Any]):
+        self.answers.update(answers)
+        self._memo.clear()
+
+    def lookup(self, name: str, suffix: str = ''):
+        """Variable lookup with the runtime's Q1_SQ001 / Q1.SQ001 fallbacks"""
+        for candidate in (name, name.replace('_', '.'), name.replace('.', '_')):
+            if candidate in self.answers:
+                return self.answers[candidate]
+        # Missing .NAOK variables read as false rather than undefined
+        return False if suffix.upper() == 'NAOK' else None
+
+    def is_true(self, node: Node) -> bool:
+        return to_bool(self.evaluate(node))
+
+    def evaluate(self, node: Node):
+        # Canonical nodes are shared, so identity is the memo key
+        key = id(node)
+        if key in self._memo:
+            return self._memo[key][1]
+        value = self._evaluate(node)
+        # Keep the node alive alongside its result so its id can't be reused
+        self._memo[key] = (node, value)
+        return value
+
+    def _evaluate(self, node: Node):
+        op = node[0]
+        if op == 'const':
+            return node[1]
+        if op == 'var':
+            return self.lookup(node[1], node[2] if len(node) > 2 else '')
+        if op == 'or':
+            return any(self.is_true(child) for child in node[1:])
+        if op == 'and':
+            return all(self.is_true(child) for child in node[1:])
+        if op == 'not':
+            return not self.is_true(node[1])
+        if op == 'neg':
+            return -to_number(self.evaluate(node[1]))
+        if op in COMPARISONS:
+            return compare_values(op, self.evaluate(node[1]), self.evaluate(node[2]))
+        if op == 'call':
+            function = FUNCTIONS.get(node[1])
+            if function is None:
+                return None
+            return function([self.evaluate(arg) for arg in node[2:]])
+        return apply_arithmetic(op, self.evaluate(node[1]), self.evaluate(node[2]))
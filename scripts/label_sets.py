@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Extract repeated answer scales of a converted survey into shared label sets
+Questions that carry an identical ordered answer_options list (or subquestions
+list) have it interned once under survey["label_sets"] and point to it with
+answer_options_label_set / subquestions_label_set instead of repeating it.
+Label set ids are content hashes, so the same scale gets the same id in every
+survey. Each set's labels use the label-sets API shape ({code, label, ...}).
+
+Usage:
+    python label_sets.py survey.json -o deduped.json [--subquestions] [--min-uses 2]
+    python label_sets.py deduped.json -o expanded.json --expand
+"""
+
+import argparse
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+LABEL_SETS_KEY = 'label_sets'
+REF_SUFFIX = '_label_set'
+KINDS = ('answer_options', 'subquestions')
+
+# The label-sets API requires at least two labels per set
+MIN_LABELS = 2
+NAME_MAX_LENGTH = 80
+
+
+def label_key(items: List[dict]) -> str:
+    """Canonical JSON of an ordered list; equal lists give equal keys"""
+    return json.dumps(items, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def label_set_id(kind: str, key: str) -> str:
+    return 'ls_' + hashlib.sha256(f"{kind}\0{key}".encode('utf-8')).hexdigest()[:16]
+
+
+def label_set_name(items: List[dict]) -> str:
+    """Readable name from the first and last labels, e.g. "Very likely…Not at all likely" """
+    first = str(items[0].get('label', items[0].get('code', '')))
+    last = str(items[-1].get('label', items[-1].get('code', '')))
+    name = f"{first}…{last}"
+    return name if len(name) <= NAME_MAX_LENGTH else name[:NAME_MAX_LENGTH - 1] + '…'
+
+
+def question_items(question: dict, kind: str, label_sets: Optional[dict] = None) -> List[dict]:
+    """A question's answer_options / subquestions, following a label set reference if it has one"""
+    ref = question.get(kind + REF_SUFFIX)
+    if ref is not None and label_sets:
+        return label_sets[ref]['labels']
+    return question.get(kind) or []
+
+
+def find_label_sets(groups: Iterable[dict], kinds: Sequence[str] = ('answer_options',),
+                    min_uses: int = 2, language: str = 'en') -> Dict[str, dict]:
+    """Label sets for every list that at least min_uses questions share
+
+    Groups are only read, one at a time, so a generator of serialized groups
+    can be passed in without building the whole survey.
+    """
+    uses: Dict[Tuple[str, str], int] = {}
+    first_seen: Dict[Tuple[str, str], List[dict]] = {}
+    for group in groups:
+        for question in group.get('questions', []):
+            for kind in kinds:
+                items = question.get(kind) or []
+                if len(items) < MIN_LABELS:
+                    continue
+                key = (kind, label_key(items))
+                uses[key] = uses.get(key, 0) + 1
+                first_seen.setdefault(key, items)
+
+    label_sets = {}
+    for (kind, key), count in uses.items():
+        if count < min_uses:
+            continue
+        items = first_seen[(kind, key)]
+        label_sets[label_set_id(kind, key)] = {
+            'name': label_set_name(items),
+            'language': language,
+            'kind': kind,
+            'uses': count,
+            'labels': items,
+        }
+    return label_sets
+
+
+def apply_label_sets(group: dict, label_sets: Dict[str, dict], kinds: Sequence[str] = ('answer_options',)) -> dict:
+    """Replace every list of a group that has a label set with a reference, in place"""
+    for question in group.get('questions', []):
+        for kind in kinds:
+            items = question.get(kind) or []
+            if len(items) < MIN_LABELS:
+                continue
+            set_id = label_set_id(kind, label_key(items))
+            if set_id in label_sets:
+                del question[kind]
+                question[kind + REF_SUFFIX] = set_id
+    return group
+
+
+def extract_label_sets(survey: dict, kinds: Sequence[str] = ('answer_options',), min_uses: int = 2) -> dict:
+    """Intern shared lists of a whole survey in place; returns the survey"""
+    label_sets = find_label_sets(survey.get('question_groups', []), kinds, min_uses)
+    for group in survey.get('question_groups', []):
+        apply_label_sets(group, label_sets, kinds)
+    if label_sets:
+        survey[LABEL_SETS_KEY] = {**survey.get(LABEL_SETS_KEY, {}), **label_sets}
+    return survey
+
+
+def expand_label_sets(survey: dict) -> dict:
+    """Inverse of extract_label_sets: copy every referenced list back into its question"""
+    label_sets = survey.pop(LABEL_SETS_KEY, {})
+    for group in survey.get('question_groups', []):
+        for question in group.get('questions', []):
+            for kind in KINDS:
+                ref = question.pop(kind + REF_SUFFIX, None)
+                if ref is not None:
+                    question[kind] = [dict(item) for item in label_sets[ref]['labels']]
+    return survey
+
+
+def savings_report(before: dict, after: dict) -> dict:
+    """Label sets, referencing questions, list rows and compact JSON bytes saved"""
+    label_sets = after.get(LABEL_SETS_KEY, {})
+    references = sum(entry['uses'] for entry in label_sets.values())
+    rows_referenced = sum(entry['uses'] * len(entry['labels']) for entry in label_sets.values())
+    rows_stored = sum(len(entry['labels']) for entry in label_sets.values())
+    size = lambda survey: len(json.dumps(survey, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+    bytes_before, bytes_after = size(before), size(after)
+    return {
+        'label_sets': len(label_sets),
+        'references': references,
+        'rows_before': rows_referenced,
+        'rows_after': rows_stored,
+        'rows_saved': rows_referenced - rows_stored,
+        'bytes_before': bytes_before,
+        'bytes_after': bytes_after,
+        'bytes_saved': bytes_before - bytes_after,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate repeated answer scales into shared label sets")
+    parser.add_argument('input', help="converted Resonant survey JSON")
+    parser.add_argument('-o', '--output', required=True, help="survey JSON to write")
+    parser.add_argument('--subquestions', action='store_true', help="also intern repeated subquestion lists")
+    parser.add_argument('--min-uses', type=int, default=2, help="questions that must share a list before it is interned")
+    parser.add_argument('--expand', action='store_true', help="undo: copy label sets back into every question")
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        survey = json.load(f)
+
+    if args.expand:
+        expand_label_sets(survey)
+        print("✅ Expanded label set references")
+    else:
+        before = json.loads(json.dumps(survey))
+        kinds = KINDS if args.subquestions else ('answer_options',)
+        extract_label_sets(survey, kinds, args.min_uses)
+        report = savings_report(before, survey)
+        print(f"Found {report['label_sets']} shared label sets used by {report['references']} questions")
+        print(f"   Rows: {report['rows_before']} -> {report['rows_after']} ({report['rows_saved']} saved)")
+        print(f"   Bytes (compact JSON): {report['bytes_before']} -> {report['bytes_after']} "
+              f"({report['bytes_saved']} saved)")
+        for set_id, entry in sorted(survey.get(LABEL_SETS_KEY, {}).items(), key=lambda item: -item[1]['uses']):
+            print(f"   {set_id}  x{entry['uses']:<4} {entry['kind']}: {entry['name']}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(survey, f, indent=2, ensure_ascii=False)
+    print(f"✅ Created {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Stream the responses table of a LimeSurvey export into a chunked columnar store
+LimeSurvey names response columns by SGQA code ({sid}X{gid}X{qid}{suffix}).
+These are mapped to the converted question / subquestion codes (Q1, Q1_SQ001,
+Q1_other, ...) and written as one .npy file per column per chunk of rows, plus
+a codebook.json describing every column. Only one chunk of rows is ever held
+in memory, however many responses the export contains.
+
+Column kinds:
+    categorical  int16 codes into the column's levels (answer codes), -1 = no answer
+    numeric      float64, NaN = no answer
+    text         fixed-width unicode, '' = no answer
+
+Usage:
+    python lss_responses.py survey.lss -o responses_store/
+    python lss_responses.py survey.lss --responses export.lsr -o responses_store/
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from lss_to_resonant_json import LSS_TABLES, LssSurveyReader
+from lss_xml import decode_row, iter_table_rows
+
+CODEBOOK_NAME = 'codebook.json'
+COLUMNS_DIR = 'columns'
+DEFAULT_CHUNK_ROWS = 10000
+
+# SGQA column: survey id, group id, then the qid digits run straight into the
+# subquestion / "other" / "comment" suffix. XML tags can't start with a digit,
+# so exports prefix these columns with an underscore.
+SGQA_RE = re.compile(r'^_?(\d+)X(\d+)X(\d+.*)$')
+
+# Fixed answer scales of question types that have no answers table rows
+TYPE_LEVELS = {
+    "Y": ["Y", "N"],
+    "G": ["F", "M"],
+    "5": ["1", "2", "3", "4", "5"],
+    "A": ["1", "2", "3", "4", "5"],
+    "B": ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10"],
+    "C": ["Y", "N", "U"],
+    "E": ["I", "S", "D"],
+    "M": ["Y"],
+    "P": ["Y"],
+}
+
+NUMERIC_TYPES = {"N", "K"}
+
+# Response metadata columns that are numeric; all others are kept as text
+NUMERIC_META = {"id", "lastpage"}
+
+
+class ColumnResolver:
+    """Maps LimeSurvey response column names to codebook entries"""
+
+    def __init__(self, reader: LssSurveyReader):
+        self.questions = reader.questions
+        self.question_gids = reader.question_gids
+        self.subquestions = {qid: {sub.code for sub in subs}
+                             for qid, subs in reader.subquestions.items()}
+        self.answers = {qid: [option.code for option in sorted(answers, key=lambda a: a.order_index)]
+                        for qid, answers in reader.answers.items()}
+
+    def resolve(self, column: str) -> dict:
+        """Codebook entry (variable name, question, kind, levels) for one response column"""
+        match = SGQA_RE.match(column)
+        if not match:
+            kind = 'numeric' if column in NUMERIC_META else 'text'
+            return {'variable': column, 'source': column, 'question': None, 'subquestion': None,
+                    'kind': kind, 'levels': None}
+
+        source = column.lstrip('_')
+        qid, suffix = self._split_qid(match.group(2), match.group(3))
+        if qid is None:
+            # Column of a question that is no longer in the survey structure
+            return {'variable': source, 'source': source, 'question': None, 'subquestion': None,
+                    'kind': 'text', 'levels': None}
+
+        question = self.questions[qid]
+        code = question.code
+        variable = f"{code}_{suffix}" if suffix else code
+        entry = {'variable': variable, 'source': source, 'question': code,
+                 'subquestion': suffix or None, 'kind': 'text', 'levels': None}
+
+        # "other", comment and upload columns are always free text
+        if suffix in ('other', '_filecount') or suffix.endswith('comment'):
+            return entry
+
+        q_type = question.limesurvey_type
+        if q_type in NUMERIC_TYPES:
+            entry['kind'] = 'numeric'
+        elif qid in self.answers:
+            entry['kind'] = 'categorical'
+            entry['levels'] = list(self.answers[qid])
+        elif q_type in TYPE_LEVELS:
+            entry['kind'] = 'categorical'
+            entry['levels'] = list(TYPE_LEVELS[q_type])
+        return entry
+
+    def _split_qid(self, gid: str, rest: str):
+        """Longest leading digit run that is a qid of this group with a valid suffix"""
+        digits = len(rest) - len(rest.lstrip('0123456789'))
+        for end in range(digits, 0, -1):
+            qid = rest[:end]
+            if qid in self.questions and self.question_gids[qid] == gid \
+                    and self._valid_suffix(qid, rest[end:]):
+                return qid, rest[end:]
+        return None, rest
+
+    def _valid_suffix(self, qid: str, suffix: str) -> bool:
+        if not suffix or suffix in ('other', '_filecount') or suffix.endswith('comment'):
+            return True
+        # Dual-scale arrays add "#0" / "#1" after the subquestion code
+        if suffix.split('#')[0] in self.subquestions.get(qid, ()):
+            return True
+        # Ranking columns are numbered by rank position
+        return self.questions[qid].limesurvey_type == 'R' and suffix.isdigit()
+
+
+class ColumnStoreWriter:
+    """Buffers up to chunk_rows rows, then writes each column of the chunk as .npy"""
+
+    def __init__(self, out_dir: str, resolver: ColumnResolver, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        self.out_dir = out_dir
+        self.resolver = resolver
+        self.chunk_rows = chunk_rows
+        self.columns: Dict[str, dict] = {}
+        self.chunks: List[dict] = []
+        self.n_rows = 0
+        self._buffer: Dict[str, list] = {}
+        self._buffered = 0
+        self._level_index: Dict[str, Dict[str, int]] = {}
+        os.makedirs(os.path.join(out_dir, COLUMNS_DIR), exist_ok=True)
+
+    def add_row(self, fields: dict):
+        for column, value in fields.items():
+            if column not in self._buffer:
+                self._add_column(column)
+            self._buffer[column].append(value.strip() if value else None)
+        self._buffered += 1
+        # Columns this row didn't have are missing for it
+        for values in self._buffer.values():
+            if len(values) < self._buffered:
+                values.append(None)
+        if self._buffered >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffered:
+            return
+        chunk = len(self.chunks)
+        for column, values in self._buffer.items():
+            entry = self.columns[column]
+            np.save(self._chunk_path(entry['variable'], chunk), self._encode(column, entry, values))
+            entry['chunks'].append(chunk)
+            values.clear()
+        self.chunks.append({'start': self.n_rows, 'rows': self._buffered})
+        self.n_rows += self._buffered
+        self._buffered = 0
+
+    def close(self) -> dict:
+        """Flush the last partial chunk and write codebook.json"""
+        self.flush()
+        codebook = {
+            'n_rows': self.n_rows,
+            'chunk_rows': self.chunk_rows,
+            'chunks': self.chunks,
+            'columns': {entry['variable']: {key: value for key, value in entry.items() if key != 'variable'}
+                        for entry in self.columns.values()},
+        }
+        with open(os.path.join(self.out_dir, CODEBOOK_NAME), 'w', encoding='utf-8') as f:
+            json.dump(codebook, f, indent=2, ensure_ascii=False)
+        return codebook
+
+    def _add_column(self, column: str):
+        entry = self.resolver.resolve(column)
+        entry['chunks'] = []
+        entry['dtype'] = {'categorical': 'int16', 'numeric': 'float64', 'text': 'str'}[entry['kind']]
+        if entry['kind'] == 'categorical':
+            entry['unexpected_levels'] = []
+            self._level_index[column] = {level: i for i, level in enumerate(entry['levels'])}
+        self.columns[column] = entry
+        self._buffer[column] = [None] * self._buffered
+
+    def _encode(self, column: str, entry: dict, values: list) -> np.ndarray:
+        if entry['kind'] == 'categorical':
+            index = self._level_index[column]
+            codes = np.empty(len(values), dtype=np.int16)
+            for i, value in enumerate(values):
+                if value is None:
+                    codes[i] = -1
+                    continue
+                if value not in index:
+                    # Answer code the survey structure doesn't know; keep it as an extra level
+                    index[value] = len(entry['levels'])
+                    entry['levels'].append(value)
+                    entry['unexpected_levels'].append(value)
+                codes[i] = index[value]
+            return codes
+        if entry['kind'] == 'numeric':
+            return np.array([_to_float(value) for value in values], dtype=np.float64)
+        return np.array([value or '' for value in values], dtype=str)
+
+    def _chunk_path(self, variable: str, chunk: int) -> str:
+        return os.path.join(self.out_dir, COLUMNS_DIR, f"{variable}.{chunk:05d}.npy")
+
+
+def _to_float(value: Optional[str]) -> float:
+    try:
+        return float(value) if value is not None else math.nan
+    except ValueError:
+        return math.nan
+
+
+def import_responses(lss_path: str, out_dir: str, responses_path: Optional[str] = None,
+                     chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict:
+    """Stream the responses of an export into out_dir and return the codebook
+
+    With responses_path (an .lsr export) the structure is read from lss_path
+    and the rows from responses_path. Otherwise both come from lss_path in a
+    single pass: LimeSurvey writes the structure tables before the responses.
+    """
+    reader = LssSurveyReader()
+    writer = None
+
+    if responses_path is None:
+        rows = iter_table_rows(lss_path, LSS_TABLES + ('responses',))
+    else:
+        for table, row in iter_table_rows(lss_path, LSS_TABLES):
+            reader.add_row(table, decode_row(row))
+        rows = iter_table_rows(responses_path, ('responses',))
+
+    for table, row in rows:
+        if table != 'responses':
+            reader.add_row(table, decode_row(row))
+            continue
+        if writer is None:
+            writer = ColumnStoreWriter(out_dir, ColumnResolver(reader), chunk_rows)
+        writer.add_row(decode_row(row))
+
+    if writer is None:
+        writer = ColumnStoreWriter(out_dir, ColumnResolver(reader), chunk_rows)
+    return writer.close()
+
+
+def load_codebook(store_dir: str) -> dict:
+    with open(os.path.join(store_dir, CODEBOOK_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_column(store_dir: str, variable: str, codebook: Optional[dict] = None) -> np.ndarray:
+    """Concatenate a column's chunks; chunks written before it first appeared read as missing"""
+    codebook = codebook or load_codebook(store_dir)
+    entry = codebook['columns'][variable]
+    present = set(entry['chunks'])
+    parts = []
+    for chunk, info in enumerate(codebook['chunks']):
+        if chunk in present:
+            parts.append(np.load(os.path.join(store_dir, COLUMNS_DIR, f"{variable}.{chunk:05d}.npy")))
+        elif entry['kind'] == 'categorical':
+            parts.append(np.full(info['rows'], -1, dtype=np.int16))
+        elif entry['kind'] == 'numeric':
+            parts.append(np.full(info['rows'], np.nan))
+        else:
+            parts.append(np.full(info['rows'], '', dtype=str))
+    if not parts:
+        return np.empty(0, dtype={'categorical': np.int16, 'numeric': np.float64}.get(entry['kind'], str))
+    return np.concatenate(parts)
+
+
+def decode_column(store_dir: str, variable: str, codebook: Optional[dict] = None) -> np.ndarray:
+    """A column as raw answer strings ('' = no answer), e.g. for bulk_relevance.ResponseMatrix"""
+    codebook = codebook or load_codebook(store_dir)
+    entry = codebook['columns'][variable]
+    values = read_column(store_dir, variable, codebook)
+    if entry['kind'] == 'categorical':
+        levels = np.array(entry['levels'] + [''], dtype=str)
+        return levels[values]
+    if entry['kind'] == 'numeric':
+        return np.array(['' if math.isnan(v) else format(v, 'g') for v in values], dtype=str)
+    return values
+
+
+def read_columns(store_dir: str, variables: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    codebook = load_codebook(store_dir)
+    names = list(variables) if variables is not None else list(codebook['columns'])
+    return {name: read_column(store_dir, name, codebook) for name in names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import LimeSurvey responses into a chunked columnar store")
+    parser.add_argument('input', help="LimeSurvey .lss export (survey structure, and responses unless --responses)")
+    parser.add_argument('-o', '--output-dir', required=True, help="directory for the .npy columns and codebook.json")
+    parser.add_argument('--responses', help="separate .lsr responses export")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="rows held in memory before a chunk is written")
+    args = parser.parse_args()
+
+    print(f"Importing responses from {args.responses or args.input}...")
+    codebook = import_responses(args.input, args.output_dir, args.responses, args.chunk_rows)
+
+    columns = codebook['columns']
+    mapped = sum(1 for entry in columns.values() if entry['question'])
+    print(f"Found {codebook['n_rows']} responses in {len(codebook['chunks'])} chunks")
+    print(f"Found {len(columns)} columns ({mapped} mapped to question codes)")
+    for variable, entry in columns.items():
+        if entry['question'] is None and SGQA_RE.match(entry['source']):
+            print(f"⚠️  {entry['source']}: no matching question in the survey structure")
+        if entry.get('unexpected_levels'):
+            print(f"⚠️  {variable}: answer codes not in the survey: {', '.join(entry['unexpected_levels'])}")
+
+    print(f"✅ Wrote {os.path.join(args.output_dir, CODEBOOK_NAME)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,333 +4,404 @@ Convert LimeSurvey LSS (XML) to Resonant Survey JSON format
 Preserves all conditional logic, randomization, and complex survey flow
 """
 
-import xml.etree.ElementTree as ET
-import json
-from pathlib import Path
+import argparse
+import os
+from collections import ChainMap
+from typing import Dict, Iterator, List, Optional
 
-def parse_lss_to_json(lss_path: str) -> dict:
+from conversion_cache import add_cache_arguments, cache_from_args
+from conversion_profile import NULL_PROFILE, ConversionProfile, add_profile_arguments, finish_profile, profile_from_args
+from dependency_graph import build_survey_dependency_graph
+from expression_compiler import ExpressionCompiler
+from label_sets import LABEL_SETS_KEY, apply_label_sets, find_label_sets
+from lss_xml import decode_row, field_code, field_int, field_text, iter_table_rows
+from survey_l10n import translation_shard, write_shards
+from survey_model import (
+    AnswerOption, Attribute, Group, Question, SubQuestion, Survey, iter_group_json, survey_header,
+)
+from survey_writer import OUTPUT_FORMATS, dump_survey_output, write_survey_output
+
+# Bump whenever the output format changes so cached conversions are invalidated
+CONVERTER_VERSION = "6"
+# Whether the CLI escapes non-ASCII text in its JSON output (batch_convert follows it)
+ENSURE_ASCII = True
+
+# Only these LSS tables are read; everything else (responses, tokens, ...) is
+# streamed past without being kept in memory
+LSS_TABLES = (
+    'surveys',
+    'groups',
+    'group_l10ns',
+    'question_attributes',
+    'questions',
+    'question_l10ns',
+    'subquestions',
+    'answers',
+    'answer_l10ns',
+)
+
+# Localized tables; every language is kept in LssSurveyReader.translations
+L10N_TABLES = ('group_l10ns', 'question_l10ns', 'answer_l10ns')
+
+def parse_lss_to_json(lss_path: str, label_sets: bool = False) -> dict:
     """Parse LSS XML and convert to Resonant JSON format with full logic preservation"""
     
-    tree = ET.parse(lss_path)
-    root = tree.getroot()
-    
-    survey_data = {
-        'groups': {},
-        'questions': {},
-        'subquestions': {},
-        'answers': {},
-        'answer_l10ns': {},
-        'question_l10ns': {},
-        'group_l10ns': {},
-        'question_attributes': {},
-    }
-    
-    # Parse groups
-    groups = root.find('.//groups')
-    if groups:
-        for row in groups.findall('.//row'):
-            gid = row.find('gid')
-            if gid is not None:
-                gid_val = gid.text.strip() if gid.text else ""
-                group_order = row.find('group_order')
-                relevance = row.find('grelevance')
-                randomization_group = row.find('randomization_group')
-                
-                survey_data['groups'][gid_val] = {
-                    'order': int(group_order.text.strip()) if group_order is not None and group_order.text else 0,
-                    'relevance': relevance.text.strip() if relevance is not None and relevance.text else "1",
-                    'randomization_group': randomization_group.text.strip() if randomization_group is not None and randomization_group.text else ""
-                }
-    
-    # Parse group localization
-    group_l10ns = root.find('.//group_l10ns')
-    if group_l10ns:
-        for row in group_l10ns.findall('.//row'):
-            gid = row.find('gid')
-            group_name = row.find('group_name')
-            if gid is not None and group_name is not None:
-                gid_val = gid.text.strip() if gid.text else ""
-                survey_data['group_l10ns'][gid_val] = group_name.text.strip() if group_name.text else ""
-    
-    # Parse question_attributes table
-    question_attributes_table = root.find('.//question_attributes')
-    if question_attributes_table:
-        for row in question_attributes_table.findall('.//row'):
-            qid = row.find('qid')
-            attribute = row.find('attribute')
-            value = row.find('value')
-            
-            if qid is not None and attribute is not None:
-                qid_val = qid.text.strip() if qid.text else ""
-                attr_name = attribute.text.strip() if attribute.text else ""
-                attr_value = value.text.strip() if value is not None and value.text else None
-                
-                if qid_val not in survey_data['question_attributes']:
-                    survey_data['question_attributes'][qid_val] = {}
-                
-                survey_data['question_attributes'][qid_val][attr_name] = attr_value
-    
-    # Parse questions
-    questions = root.find('.//questions')
-    if questions:
-        for row in questions.findall('.//row'):
-            qid = row.find('qid')
-            gid = row.find('gid')
-            qtype = row.find('type')
-            title = row.find('title')
-            question_order = row.find('question_order')
-            relevance = row.find('relevance')
-            mandatory = row.find('mandatory')
-            other = row.find('other')
-            
-            if qid is not None:
-                qid_val = qid.text.strip() if qid.text else ""
-                survey_data['questions'][qid_val] = {
-                    'gid': gid.text.strip() if gid is not None and gid.text else "",
-                    'type': qtype.text.strip() if qtype is not None and qtype.text else "",
-                    'title': title.text.strip() if title is not None and title.text else "",
-                    'order': int(question_order.text.strip()) if question_order is not None and question_order.text else 0,
-                    'relevance': relevance.text.strip() if relevance is not None and relevance.text else "1",
-                    'mandatory': mandatory.text.strip() if mandatory is not None and mandatory.text else "N",
-                    'other': other.text.strip() if other is not None and other.text else "N"
-                }
+    reader = read_lss_survey(lss_path)
+    return convert_to_resonant_format(reader.survey, label_sets=label_sets, language=reader.language or 'en')
+
+
+def read_lss_survey(lss_path: str, profile: Optional[ConversionProfile] = None) -> 'LssSurveyReader':
+    """Read the LSS tables straight into the shared survey model
     
-    # Parse question localization
-    question_l10ns = root.find('.//question_l10ns')
-    if question_l10ns:
-        for row in question_l10ns.findall('.//row'):
-            qid = row.find('qid')
-            question_text = row.find('question')
-            help_text = row.find('help')
-            
-            if qid is not None:
-                qid_val = qid.text.strip() if qid.text else ""
-                survey_data['question_l10ns'][qid_val] = {
-                    'question': question_text.text.strip() if question_text is not None and question_text.text else "",
-                    'help': help_text.text.strip() if help_text is not None and help_text.text else ""
-                }
+    The file is streamed row by row (see lss_xml.iter_table_rows), so only the
+    tables listed in LSS_TABLES are ever read, and each row becomes a model
+    object as soon as it is decoded.
+    """
     
-    # Parse subquestions
-    subquestions = root.find('.//subquestions')
-    if subquestions:
-        for row in subquestions.findall('.//row'):
-            qid = row.find('qid')
-            parent_qid = row.find('parent_qid')
-            title = row.find('title')
-            question_order = row.find('question_order')
-            
-            if qid is not None and parent_qid is not None:
-                qid_val = qid.text.strip() if qid.text else ""
-                parent_qid_val = parent_qid.text.strip() if parent_qid.text else ""
-                
-                if parent_qid_val not in survey_data['subquestions']:
-                    survey_data['subquestions'][parent_qid_val] = []
-                
-                survey_data['subquestions'][parent_qid_val].append({
-                    'qid': qid_val,
-                    'title': title.text.strip() if title is not None and title.text else "",
-                    'order': int(question_order.text.strip()) if question_order is not None and question_order.text else 0
-                })
+    profile = profile or NULL_PROFILE
+    reader = LssSurveyReader()
     
-    # Parse answers
-    answers = root.find('.//answers')
-    if answers:
-        for row in answers.findall('.//row'):
-            qid = row.find('qid')
-            aid = row.find('aid')
-            code = row.find('code')
-            sortorder = row.find('sortorder')
-            
-            if qid is not None and aid is not None:
-                qid_val = qid.text.strip() if qid.text else ""
-                aid_val = aid.text.strip() if aid.text else ""
-                
-                if qid_val not in survey_data['answers']:
-                    survey_data['answers'][qid_val] = []
-                
-                survey_data['answers'][qid_val].append({
-                    'aid': aid_val,
-                    'code': code.text.strip() if code is not None and code.text else "",
-                    'order': int(sortorder.text.strip()) if sortorder is not None and sortorder.text else 0
-                })
+    with profile.phase('parse'):
+        for table, row in iter_table_rows(lss_path, LSS_TABLES):
+            profile.count('lss_rows', table)
+            reader.add_row(table, decode_row(row))
     
-    # Parse answer localization
-    answer_l10ns = root.find('.//answer_l10ns')
-    if answer_l10ns:
-        for row in answer_l10ns.findall('.//row'):
-            aid = row.find('aid')
-            answer_text = row.find('answer')
-            
-            if aid is not None and answer_text is not None:
-                aid_val = aid.text.strip() if aid.text else ""
-                survey_data['answer_l10ns'][aid_val] = answer_text.text.strip() if answer_text.text else ""
+    reader.build(profile)
+    return reader
+
+
+def sort_with_ids(items: list, ids: list):
+    """Stable in-place sort of model objects by order_index, keeping their parallel id list aligned"""
     
-    # Convert to Resonant JSON format
-    return convert_to_resonant_format(survey_data)
+    order = sorted(range(len(items)), key=lambda index: items[index].order_index)
+    items[:] = [items[index] for index in order]
+    ids[:] = [ids[index] for index in order]
 
 
-def convert_to_resonant_format(survey_data: dict) -> dict:
-    """Convert parsed LimeSurvey data to Resonant JSON format"""
+class LssSurveyReader:
+    """Fills Group / Question / SubQuestion / AnswerOption objects from LSS rows
     
-    # Type mapping
-    type_map = {
-        "F": "array",
-        "R": "ranking",
-        "M": "multiple_choice_multiple",
-        "L": "multiple_choice_single",
-        "T": "long_text",
-        "S": "text",
-        "X": "text_display",
-        "*": "equation",
-        "5": "multiple_choice_single",
-        "!": "dropdown",
-        "Y": "yes_no",
-        "D": "date"
-    }
+    Tables arrive in export order, so subquestions, answers and attributes wait
+    under their parent qid until build() attaches them. Text stays in the
+    per-language l10n tables and select_language() copies one language onto
+    the model objects.
+    """
     
-    survey = {
-        "title": "AI Safety Messaging Survey (735545) - Complete from XML",
-        "description": "Full survey with all conditional logic and randomization preserved",
-        "status": "draft",
-        "settings": {
-            "format": "question_by_question",
-            "theme": "editorial_academic",
-            "show_progress_bar": True,
-            "allow_backward_navigation": False,
-            "prolific_integration": {
-                "enabled": True,
-                "completion_code": "CLLV7C0K",
-                "screenout_code": "SCREENOUT"
-            }
-        },
-        "question_groups": []
-    }
+    def __init__(self):
+        self.base_language: Optional[str] = None
+        # Language whose text is on the model objects (set by select_language)
+        self.language: Optional[str] = None
+        self.translations: Dict[str, dict] = {}
+        self.groups: Dict[str, Group] = {}
+        self.questions: Dict[str, Question] = {}
+        self.question_gids: Dict[str, str] = {}
+        # parent qid -> [SubQuestion], qid -> [AnswerOption]; the parallel id lists key the l10n text
+        self.subquestions: Dict[str, List[SubQuestion]] = {}
+        self.subquestion_ids: Dict[str, List[str]] = {}
+        self.answers: Dict[str, List[AnswerOption]] = {}
+        self.answer_ids: Dict[str, List[str]] = {}
+        self.attributes: Dict[str, List[Attribute]] = {}
+        self.survey: Optional[Survey] = None
     
-    # Sort groups by order
-    sorted_groups = sorted(survey_data['groups'].items(), key=lambda x: x[1]['order'])
+    def add_row(self, table: str, fields: dict):
+        """Add one decoded row of an LSS_TABLES table"""
+        
+        # Base language of the survey (the surveys table comes after the l10n tables)
+        if table == 'surveys':
+            self.base_language = field_text(fields, 'language', None)
+        
+        # Parse groups
+        elif table == 'groups':
+            if 'gid' in fields:
+                gid = field_text(fields, 'gid')
+                self.groups[gid] = Group(
+                    title=f"Group {gid}",
+                    order_index=field_int(fields, 'group_order'),
+                    relevance=field_text(fields, 'grelevance', "1"),
+                    randomization_group=field_code(fields, 'randomization_group')
+                )
+        
+        # Parse group localization
+        elif table == 'group_l10ns':
+            if 'gid' in fields and 'group_name' in fields:
+                self._l10ns(fields)['group_l10ns'][field_text(fields, 'gid')] = field_text(fields, 'group_name')
+        
+        # Parse question_attributes table; a repeated attribute keeps its first position
+        elif table == 'question_attributes':
+            if 'qid' in fields and 'attribute' in fields:
+                attributes = self.attributes.setdefault(field_text(fields, 'qid'), [])
+                name, value = field_code(fields, 'attribute'), field_code(fields, 'value', None)
+                for attribute in attributes:
+                    if attribute.name == name:
+                        attribute.value = value
+                        break
+                else:
+                    attributes.append(Attribute(name, value))
+        
+        # Parse questions
+        elif table == 'questions':
+            if 'qid' in fields:
+                qid = field_text(fields, 'qid')
+                self.questions[qid] = Question(
+                    code=field_text(fields, 'title'),
+                    text='(no text)',
+                    limesurvey_type=field_code(fields, 'type'),
+                    order_index=field_int(fields, 'question_order'),
+                    relevance=field_text(fields, 'relevance', "1"),
+                    mandatory=field_text(fields, 'mandatory', "N") == "Y",
+                    other=field_text(fields, 'other', "N") == "Y"
+                )
+                self.question_gids[qid] = field_code(fields, 'gid')
+        
+        # Parse question localization
+        elif table == 'question_l10ns':
+            if 'qid' in fields:
+                self._l10ns(fields)['question_l10ns'][field_text(fields, 'qid')] = (
+                    field_text(fields, 'question'), field_text(fields, 'help'))
+        
+        # Parse subquestions
+        elif table == 'subquestions':
+            if 'qid' in fields and 'parent_qid' in fields:
+                title, parent_qid = field_code(fields, 'title'), field_text(fields, 'parent_qid')
+                self.subquestions.setdefault(parent_qid, []).append(
+                    SubQuestion(title, title, field_int(fields, 'question_order')))
+                self.subquestion_ids.setdefault(parent_qid, []).append(field_text(fields, 'qid'))
+        
+        # Parse answers
+        elif table == 'answers':
+            if 'qid' in fields and 'aid' in fields:
+                code, qid = field_code(fields, 'code'), field_text(fields, 'qid')
+                self.answers.setdefault(qid, []).append(AnswerOption(code, code, field_int(fields, 'sortorder')))
+                self.answer_ids.setdefault(qid, []).append(field_text(fields, 'aid'))
+        
+        # Parse answer localization
+        elif table == 'answer_l10ns':
+            if 'aid' in fields and 'answer' in fields:
+                self._l10ns(fields)['answer_l10ns'][field_text(fields, 'aid')] = field_text(fields, 'answer')
     
-    for gid, group_info in sorted_groups:
-        group_name = survey_data['group_l10ns'].get(gid, f"Group {gid}")
+    def _l10ns(self, fields: dict) -> dict:
+        """The l10n tables of the language an l10n row belongs to, created on first use"""
         
-        group = {
-            "title": group_name,
-            "order_index": group_info['order'],
-            "settings": {
-                "relevance": group_info['relevance'],
-                "randomization_group": group_info.get('randomization_group', "")
-            },
-            "questions": []
-        }
+        language = field_text(fields, 'language')
+        l10ns = self.translations.get(language)
+        if l10ns is None:
+            l10ns = self.translations[language] = {table: {} for table in L10N_TABLES}
+        return l10ns
+    
+    def build(self, profile: Optional[ConversionProfile] = None) -> Survey:
+        """Attach children to their parents in survey order and apply the base language"""
+        
+        profile = profile or NULL_PROFILE
         
-        # Get questions for this group
-        group_questions = [
-            (qid, q) for qid, q in survey_data['questions'].items()
-            if q['gid'] == gid
-        ]
-        group_questions.sort(key=lambda x: x[1]['order'])
+        with profile.phase('sort'):
+            # Sorted in place (stable, so repeated builds see the same order)
+            for children, ids in ((self.subquestions, self.subquestion_ids), (self.answers, self.answer_ids)):
+                for qid, items in children.items():
+                    sort_with_ids(items, ids[qid])
+            group_questions: Dict[str, List[Question]] = {}
+            for qid, question in self.questions.items():
+                group_questions.setdefault(self.question_gids[qid], []).append(question)
+            for questions in group_questions.values():
+                questions.sort(key=lambda question: question.order_index)
+            sorted_groups = sorted(self.groups.items(), key=lambda item: item[1].order_index)
         
-        for qid, q_info in group_questions:
-            q_l10n = survey_data['question_l10ns'].get(qid, {})
-            question_text = q_l10n.get('question', '(no text)')
-            help_text = q_l10n.get('help', '')
-            
-            # Get question attributes for this question
-            q_attrs = survey_data['question_attributes'].get(qid, {})
-            
-            question = {
-                "code": q_info['title'],
-                "question_text": question_text,
-                "question_type": type_map.get(q_info['type'], "text"),
-                "order_index": q_info['order'],
-                "settings": {
-                    "mandatory": q_info['mandatory'] == "Y",
-                    "other": q_info.get('other', 'N') == "Y",
-                    "relevance": q_info['relevance'],
-                    "help_text": help_text,
-                    "limesurvey_type": q_info['type'],
-                    
-                    # Merge all question_attributes
-                    "array_filter": q_attrs.get('array_filter'),
-                    "array_filter_exclude": q_attrs.get('array_filter_exclude'),
-                    "array_filter_style": q_attrs.get('array_filter_style'),
-                    "display_columns": q_attrs.get('display_columns'),
-                    "max_answers": q_attrs.get('max_answers'),
-                    "min_answers": q_attrs.get('min_answers'),
-                    "random_order": q_attrs.get('random_order'),
-                    "other_replace_text": q_attrs.get('other_replace_text'),
-                    "em_validation_q": q_attrs.get('em_validation_q'),
-                    "em_validation_q_tip": q_attrs.get('em_validation_q_tip'),
-                    "cssclass": q_attrs.get('cssclass'),
-                    "exclude_all_others": q_attrs.get('exclude_all_others'),
-                    "exclude_all_others_auto": q_attrs.get('exclude_all_others_auto'),
-                    "hidden": q_attrs.get('hidden'),
-                    "time_limit": q_attrs.get('time_limit'),
-                    "time_limit_action": q_attrs.get('time_limit_action'),
-                    "time_limit_message": q_attrs.get('time_limit_message'),
-                    "time_limit_countdown_message": q_attrs.get('time_limit_countdown_message'),
+        with profile.phase('join'):
+            for qid, question in self.questions.items():
+                question.attributes = self.attributes.get(qid, [])
+                question.subquestions = self.subquestions.get(qid, [])
+                question.answer_options = self.answers.get(qid, [])
+            for gid, group in sorted_groups:
+                group.questions = group_questions.get(gid, [])
+            self.survey = Survey(
+                title="AI Safety Messaging Survey (735545) - Complete from XML",
+                description="Full survey with all conditional logic and randomization preserved",
+                status="draft",
+                settings={
+                    "format": "question_by_question",
+                    "theme": "editorial_academic",
+                    "show_progress_bar": True,
+                    "allow_backward_navigation": False,
+                    "prolific_integration": {
+                        "enabled": True,
+                        "completion_code": "CLLV7C0K",
+                        "screenout_code": "SCREENOUT"
+                    }
                 },
-                "subquestions": [],
-                "answer_options": []
-            }
-            
-            # Add subquestions
-            if qid in survey_data['subquestions']:
-                subs = sorted(survey_data['subquestions'][qid], key=lambda x: x['order'])
-                for sub in subs:
-                    sub_l10n = survey_data['question_l10ns'].get(sub['qid'], {})
-                    sub_text = sub_l10n.get('question', sub['title'])
-                    
-                    question["subquestions"].append({
-                        "code": sub['title'],
-                        "label": sub_text,
-                        "order_index": sub['order']
-                    })
-            
-            # Add "other" option if enabled
-            if question["settings"].get("other"):
-                other_text = question["settings"].get("other_replace_text") or "Other"
-                question["subquestions"].append({
-                    "code": "other",
-                    "label": other_text,
-                    "order_index": 999  # Always last
-                })
-            
-            # Add answer options
-            if qid in survey_data['answers']:
-                answers = sorted(survey_data['answers'][qid], key=lambda x: x['order'])
-                for ans in answers:
-                    # Look up answer text from l10ns using aid
-                    answer_text = survey_data['answer_l10ns'].get(ans['aid'], ans['code'])
-                    
-                    question["answer_options"].append({
-                        "code": ans['code'],
-                        "label": answer_text,
-                        "order_index": ans['order']
-                    })
-            
-            group["questions"].append(question)
+                groups=[group for _, group in sorted_groups]
+            )
+        
+        with profile.phase('l10n_join'):
+            self.select_language()
         
-        survey["question_groups"].append(group)
+        return self.survey
     
-    return survey
+    def languages(self) -> list:
+        """Languages present in the export, base language first"""
+        
+        languages = list(self.translations)
+        if self.base_language in languages:
+            languages.remove(self.base_language)
+            languages.insert(0, self.base_language)
+        return languages
+    
+    def select_language(self, language: Optional[str] = None):
+        """Copy one language's text onto the model (default: the base language)
+        
+        Text missing in that language falls back to the base language, as
+        LimeSurvey does.
+        """
+        
+        languages = self.languages()
+        if not languages:
+            return
+        language = language or languages[0]
+        if language not in self.translations:
+            raise ValueError(f"Language {language!r} not in survey (has {', '.join(languages)})")
+        
+        base = self.translations[languages[0]]
+        localized = self.translations[language]
+        self.language = language
+        group_l10ns, question_l10ns, answer_l10ns = (
+            localized[table] if language == languages[0] else ChainMap(localized[table], base[table])
+            for table in L10N_TABLES)
+        
+        for gid, group in self.groups.items():
+            group.title = group_l10ns.get(gid, f"Group {gid}")
+        for qid, question in self.questions.items():
+            question.text, question.help_text = question_l10ns.get(qid, ('(no text)', ''))
+        for parent_qid, subquestions in self.subquestions.items():
+            for qid, sub in zip(self.subquestion_ids[parent_qid], subquestions):
+                l10n = question_l10ns.get(qid)
+                sub.label = l10n[0] if l10n is not None else sub.code
+        for qid, options in self.answers.items():
+            for aid, option in zip(self.answer_ids[qid], options):
+                option.label = answer_l10ns.get(aid, option.code)
 
 
-if __name__ == "__main__":
-    lss_path = "/Users/nomads/Nomads/mats-research/uploads/limesurvey_survey_735545_1_19.lss"
-    output_path = "/Users/nomads/Nomads/focus-group-platform/test_surveys/survey_735545_complete.json"
+def convert_to_resonant_format(survey: Survey, compiler: Optional[ExpressionCompiler] = None,
+                               label_sets: bool = False, language: str = 'en') -> dict:
+    """Convert the survey model of an LSS export to Resonant JSON format
+    
+    language is the language of the model's text, recorded on label sets.
+    """
+    
+    if compiler is None:
+        compiler = ExpressionCompiler()
+    
+    result = survey_header(survey)
+    result["dependency_graph"] = build_survey_dependency_graph(
+        {"question_groups": iter_group_json(survey, 'resonant')}, compiler)
+    groups = iter_resonant_groups(survey, compiler)
+    if label_sets:
+        result[LABEL_SETS_KEY] = find_label_sets(iter_group_json(survey, 'resonant'), language=language)
+        groups = (apply_label_sets(group, result[LABEL_SETS_KEY]) for group in groups)
+    result["question_groups"] = list(groups)
+    return result
+
+
+def iter_resonant_groups(survey: Survey, compiler: Optional[ExpressionCompiler] = None) -> Iterator[dict]:
+    """Yield Resonant question groups one at a time, in group order
     
-    print(f"Parsing {lss_path}...")
-    survey = parse_lss_to_json(lss_path)
+    Relevance and validation expressions are compiled as each group is built;
+    syntax errors are collected on the compiler (pass one in to read them).
+    """
     
-    print(f"Found {len(survey['question_groups'])} groups")
-    total_questions = sum(len(g['questions']) for g in survey['question_groups'])
-    print(f"Found {total_questions} questions")
+    if compiler is None:
+        compiler = ExpressionCompiler()
     
-    with open(output_path, 'w') as f:
-        json.dump(survey, f, indent=2)
+    return iter_group_json(survey, 'resonant', compiler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert LimeSurvey LSS (XML) to Resonant Survey JSON")
+    parser.add_argument('input', help="LimeSurvey .lss export")
+    parser.add_argument('output', help="Resonant survey JSON to write")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='pretty',
+                        help="pretty (indented), compact, ndjson (one question per line), "
+                             "or sharded (output is a directory: one line per group plus a manifest)")
+    parser.add_argument('--label-sets', action='store_true',
+                        help="intern repeated answer scales into shared label sets")
+    parser.add_argument('--l10n-dir',
+                        help="also write one text shard per language plus manifest.json into this directory")
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.cache_dir and args.l10n_dir:
+        parser.error("--l10n-dir needs the parsed export and cannot be combined with --cache-dir")
+    
+    profile = profile_from_args(args)
+    cache = cache_from_args(args)
+    if cache is not None:
+        # A hit skips parsing; a miss converts in one piece so the result can be stored
+        with profile.phase('cache'):
+            survey = cache.convert(parse_lss_to_json, args.input, label_sets=args.label_sets)
+        with profile.phase('json_dump'):
+            counts = dump_survey_output(survey, args.output, args.format, ensure_ascii=ENSURE_ASCII)
+        print(f"{'Reused cached' if cache.last_hit else 'Cached new'} conversion of {args.input}")
+        print(f"Found {counts['groups']} groups")
+        print(f"Found {counts['questions']} questions")
+        print(f"✅ Created {args.output}")
+        finish_profile(profile, args)
+        return
+    
+    print(f"Parsing {args.input}...")
+    reader = read_lss_survey(args.input, profile)
+    survey = reader.survey
+    profile.count_unknown_types(survey.groups)
+    compiler = ExpressionCompiler()
+    
+    header = survey_header(survey)
+    with profile.phase('dependency_graph'):
+        header["dependency_graph"] = build_survey_dependency_graph(
+            {"question_groups": iter_group_json(survey, 'resonant')}, compiler)
+    groups = iter_resonant_groups(survey, compiler)
+    
+    if args.label_sets:
+        # Label sets go in the header, so find them in a cheap pre-pass over the model
+        with profile.phase('label_sets'):
+            label_sets = find_label_sets(iter_group_json(survey, 'resonant'), language=reader.language or 'en')
+        header[LABEL_SETS_KEY] = label_sets
+        groups = (apply_label_sets(group, label_sets) for group in groups)
     
-    print(f"✅ Created {output_path}")
+    # Groups are serialized as they are written; the full JSON document is never built.
+    # Building and compiling each group is charged to build_groups, the rest to json_dump.
+    with profile.phase('json_dump'):
+        counts = write_survey_output(args.output, header, profile.iter_phase('build_groups', groups), args.format,
+                                     ensure_ascii=ENSURE_ASCII)
+    
+    print(f"Found {counts['groups']} groups")
+    print(f"Found {counts['questions']} questions")
+    print(f"Compiled {compiler.stats()['expressions']} distinct expressions")
+    for error in compiler.errors:
+        print(f"⚠️  {error['code']} {error['field']}: {error['error']}")
+    for cycle in header["dependency_graph"]["cycles"]:
+        print(f"⚠️  Dependency cycle: {' -> '.join(cycle)}")
+    if args.label_sets:
+        print(f"Interned {len(label_sets)} shared label sets "
+              f"({sum(entry['uses'] for entry in label_sets.values())} questions)")
+    
+    print(f"✅ Created {args.output}")
+    
+    languages = reader.languages()
+    if len(languages) > 1 and not args.l10n_dir:
+        print(f"⚠️  {len(languages)} languages in export, text is {languages[0]} only (use --l10n-dir for the rest)")
+    if args.l10n_dir:
+        # One model for every language; only the text copied onto it changes
+        shards = []
+        for language in languages:
+            reader.select_language(language)
+            shards.append(translation_shard(iter_group_json(survey, 'resonant'), language))
+        reader.select_language()
+        manifest = write_shards(args.l10n_dir, shards, languages[0] if languages else None,
+                                os.path.relpath(args.output, args.l10n_dir))
+        for language, entry in manifest['languages'].items():
+            print(f"✅ Created {os.path.join(args.l10n_dir, entry['path'])} ({entry['bytes']} bytes)")
+    finish_profile(profile, args)
     print(f"\nPreserved logic:")
     print(f"  - Conditional relevance expressions")
     print(f"  - Randomization groups")
     print(f"  - Question order and dependencies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Streaming helpers for reading LimeSurvey LSS (XML) exports
+Rows are handed out as soon as they close and are cleared afterwards, so peak
+memory stays bounded no matter how large the responses/tokens sections are
+"""
+
+import sys
+import xml.etree.ElementTree as ET
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+def iter_table_rows(lss_path: str, tables: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, ET.Element]]:
+    """Yield (table_name, row) for every <row> of the requested top-level tables
+
+    LSS files are laid out as document > table > rows > row. Each row is only
+    valid until the generator is resumed: read what you need from it first.
+    Rows of tables that are not requested are discarded without being yielded.
+    """
+    wanted = set(tables) if tables is not None else None
+    stack = []
+
+    for event, elem in ET.iterparse(lss_path, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        depth = len(stack)
+
+        if depth == 3 and elem.tag == 'row':
+            table = stack[1].tag
+            if wanted is None or table in wanted:
+                yield table, elem
+            # Drop the finished row so <rows> never accumulates children
+            elem.clear()
+            stack[-1].remove(elem)
+        elif depth == 1:
+            # Finished a whole table (or a top-level scalar like DBVersion)
+            elem.clear()
+            stack[0].remove(elem)
+
+
+def decode_row(row: ET.Element) -> dict:
+    """Map every field of a row to its raw text in a single pass over its children"""
+    return {field.tag: field.text for field in row}
+
+
+def field_text(fields: dict, name: str, default: Optional[str] = "") -> Optional[str]:
+    """Stripped text of a decoded field, or default when it is missing or empty"""
+    value = fields.get(name)
+    return value.strip() if value else default
+
+
+def field_code(fields: dict, name: str, default: Optional[str] = "") -> Optional[str]:
+    """field_text, interned: codes, types and ids that repeat on many rows share one string"""
+    value = fields.get(name)
+    return sys.intern(value.strip()) if value else default
+
+
+def field_int(fields: dict, name: str, default: int = 0) -> int:
+    """Integer value of a decoded field, or default when it is missing or empty"""
+    value = fields.get(name)
+    return int(value.strip()) if value else default
@@ -4,22 +4,67 @@ Parse LimeSurvey XML (LSS) and convert to Resonant Survey JSON format
 This reads the actual XML structure to get the complete survey
 """
 
-import xml.etree.ElementTree as ET
-import json
-import sys
+import argparse
+from typing import Optional
+
+from conversion_cache import add_cache_arguments, cache_from_args
+from conversion_profile import NULL_PROFILE, ConversionProfile, add_profile_arguments, finish_profile, profile_from_args
+from expression_compiler import ExpressionCompiler
+from lss_xml import decode_row, field_int, field_text, iter_table_rows
+from survey_model import (
+    AnswerOption, Group, Question, SubQuestion, Survey, iter_group_json, survey_header, survey_to_json,
+)
+from survey_writer import OUTPUT_FORMATS, dump_survey_output, write_survey_output
+
+# Bump whenever the output format changes so cached conversions are invalidated
+CONVERTER_VERSION = "2"
+# Whether the CLI escapes non-ASCII text in its JSON output (batch_convert follows it)
+ENSURE_ASCII = True
 
 def parse_lss_to_json(lss_file):
-    """Parse LSS XML file and convert to Resonant JSON format"""
+    """Parse LSS XML file and convert to Resonant JSON format (relevance compiled alongside)"""
     
-    tree = ET.parse(lss_file)
-    root = tree.getroot()
+    return survey_to_json(read_lss_model(lss_file), 'lss', ExpressionCompiler())
+
+
+def read_lss_model(lss_file, profile: Optional[ConversionProfile] = None) -> Survey:
+    """Parse LSS XML file into the shared survey model"""
+    
+    profile = profile or NULL_PROFILE
+    
+    # Decode the three tables we need in one streaming pass. Rows are kept as
+    # plain field maps because answers precede questions in LSS exports.
+    rows = {'groups': [], 'questions': [], 'answers': []}
+    with profile.phase('parse'):
+        for table, row in iter_table_rows(lss_file, rows):
+            profile.count('lss_rows', table)
+            rows[table].append(decode_row(row))
+    
+    with profile.phase('join'):
+        survey = _join_lss_rows(rows)
+    
+    with profile.phase('sort'):
+        # Sort groups and questions within each group
+        survey.groups.sort(key=lambda g: g.order_index)
+        for group in survey.groups:
+            group.questions.sort(key=lambda q: q.order_index)
+            # Sort subquestions and answer options
+            for question in group.questions:
+                question.subquestions.sort(key=lambda sq: sq.order_index)
+                question.answer_options.sort(key=lambda ao: ao.order_index)
+    
+    return survey
+
+
+def _join_lss_rows(rows: dict) -> Survey:
+    """Build the (unsorted) survey model from the decoded groups / questions / answers rows"""
     
     # Initialize survey structure
-    survey = {
-        "title": "AI Safety Messaging Survey (735545) - Complete",
-        "description": "Current Issues and Policy Attitudes - Full Survey from LimeSurvey",
-        "status": "draft",
-        "settings": {
+    survey = Survey(
+        title="AI Safety Messaging Survey (735545) - Complete",
+        description="Current Issues and Policy Attitudes - Full Survey from LimeSurvey",
+        status="draft",
+        settings={
             "format": "question_by_question",
             "theme": "editorial_academic",
             "show_progress_bar": True,
@@ -29,153 +74,118 @@ def parse_lss_to_json(lss_file):
                 "completion_code": "CLLV7C0K",
                 "screenout_code": "SCREENOUT"
             }
-        },
-        "question_groups": []
-    }
+        }
+    )
     
     # Parse groups
-    groups_elem = root.find('.//groups')
-    if groups_elem is None:
+    if not rows['groups']:
         print("No groups found in XML")
         return survey
     
-    group_rows = groups_elem.findall('.//row')
     groups_dict = {}
     
-    for row in group_rows:
-        gid = row.find('gid').text
-        group_name = row.find('group_name').text
-        group_order = int(row.find('group_order').text)
-        grelevance = row.find('grelevance').text if row.find('grelevance') is not None else "1"
-        
-        groups_dict[gid] = {
-            "title": group_name,
-            "order_index": group_order,
-            "relevance": grelevance,
-            "questions": []
-        }
+    for fields in rows['groups']:
+        groups_dict[field_text(fields, 'gid')] = Group(
+            title=field_text(fields, 'group_name'),
+            order_index=field_int(fields, 'group_order'),
+            relevance=field_text(fields, 'grelevance', "1")
+        )
     
     # Parse questions
-    questions_elem = root.find('.//questions')
-    if questions_elem is None:
+    if not rows['questions']:
         print("No questions found in XML")
         return survey
     
-    question_rows = questions_elem.findall('.//row')
     questions_dict = {}
-    
-    for row in question_rows:
-        qid = row.find('qid').text
-        gid = row.find('gid').text
-        title = row.find('title').text
-        question_text_elem = row.find('question')
-        question_text = question_text_elem.text if question_text_elem is not None and question_text_elem.text else ""
-        qtype = row.find('type').text
-        question_order = int(row.find('question_order').text)
-        mandatory = row.find('mandatory').text if row.find('mandatory') is not None else "N"
-        relevance = row.find('relevance').text if row.find('relevance') is not None else "1"
-        
-        # Map LimeSurvey types to our types
-        type_map = {
-            "F": "array",
-            "R": "ranking",
-            "M": "multiple_choice_multiple",
-            "L": "multiple_choice_single",
-            "T": "long_text",
-            "S": "text",
-            "X": "text_display",
-            "*": "equation",
-            "5": "multiple_choice_single",  # 5-point choice
-            "!": "dropdown",
-            "Y": "yes_no",
-            "D": "date"
-        }
-        
-        question_type = type_map.get(qtype, "text")
-        
-        questions_dict[qid] = {
-            "code": title,
-            "question_text": question_text,
-            "question_type": question_type,
-            "order_index": question_order,
-            "settings": {
-                "mandatory": mandatory == "Y",
-                "relevance": relevance
-            },
-            "subquestions": [],
-            "answer_options": [],
-            "gid": gid
-        }
-    
-    # Parse subquestions
-    subquestions_elem = root.find('.//questions')
-    if subquestions_elem:
-        for row in subquestions_elem.findall('.//row'):
-            parent_qid = row.find('parent_qid')
-            if parent_qid is not None and parent_qid.text and parent_qid.text != "0":
-                parent_id = parent_qid.text
-                if parent_id in questions_dict:
-                    sq_title = row.find('title').text
-                    sq_text_elem = row.find('question')
-                    sq_text = sq_text_elem.text if sq_text_elem is not None and sq_text_elem.text else sq_title
-                    sq_order = int(row.find('question_order').text)
-                    
-                    questions_dict[parent_id]["subquestions"].append({
-                        "code": sq_title,
-                        "label": sq_text,
-                        "order_index": sq_order
-                    })
+    question_gids = {}
+    
+    for fields in rows['questions']:
+        qid = field_text(fields, 'qid')
+        questions_dict[qid] = Question(
+            code=field_text(fields, 'title'),
+            text=field_text(fields, 'question'),
+            limesurvey_type=field_text(fields, 'type'),
+            order_index=field_int(fields, 'question_order'),
+            mandatory=field_text(fields, 'mandatory', "N") == "Y",
+            relevance=field_text(fields, 'relevance', "1")
+        )
+        question_gids[qid] = field_text(fields, 'gid')
+    
+    # Parse subquestions (rows of the questions table with a parent_qid)
+    for fields in rows['questions']:
+        parent_id = field_text(fields, 'parent_qid', "0")
+        if parent_id != "0" and parent_id in questions_dict:
+            sq_title = field_text(fields, 'title')
+            questions_dict[parent_id].subquestions.append(SubQuestion(
+                code=sq_title,
+                label=field_text(fields, 'question', sq_title),
+                order_index=field_int(fields, 'question_order')
+            ))
     
     # Parse answer options
-    answers_elem = root.find('.//answers')
-    if answers_elem:
-        answer_rows = answers_elem.findall('.//row')
-        for row in answer_rows:
-            qid = row.find('qid').text
-            if qid in questions_dict:
-                code = row.find('code').text
-                answer_text_elem = row.find('answer')
-                answer_text = answer_text_elem.text if answer_text_elem is not None and answer_text_elem.text else code
-                sort_order = int(row.find('sortorder').text)
-                
-                questions_dict[qid]["answer_options"].append({
-                    "code": code,
-                    "label": answer_text,
-                    "order_index": sort_order
-                })
+    for fields in rows['answers']:
+        qid = field_text(fields, 'qid')
+        if qid in questions_dict:
+            code = field_text(fields, 'code')
+            questions_dict[qid].answer_options.append(AnswerOption(
+                code=code,
+                label=field_text(fields, 'answer', code),
+                order_index=field_int(fields, 'sortorder')
+            ))
     
     # Organize questions into groups
     for qid, question in questions_dict.items():
-        gid = question.pop("gid")
+        gid = question_gids[qid]
         if gid in groups_dict:
-            groups_dict[gid]["questions"].append(question)
+            groups_dict[gid].questions.append(question)
     
-    # Sort groups and add to survey
-    sorted_groups = sorted(groups_dict.values(), key=lambda g: g["order_index"])
-    survey["question_groups"] = sorted_groups
-    
-    # Sort questions within each group
-    for group in survey["question_groups"]:
-        group["questions"].sort(key=lambda q: q["order_index"])
-        # Sort subquestions and answer options
-        for question in group["questions"]:
-            question["subquestions"].sort(key=lambda sq: sq["order_index"])
-            question["answer_options"].sort(key=lambda ao: ao["order_index"])
+    survey.groups = list(groups_dict.values())
     
     return survey
 
+def main():
+    parser = argparse.ArgumentParser(description="Parse LimeSurvey XML (LSS) to Resonant Survey JSON")
+    parser.add_argument('input', help="LimeSurvey .lss export")
+    parser.add_argument('output', help="Resonant survey JSON to write")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='pretty',
+                        help="pretty (indented), compact, ndjson (one question per line), "
+                             "or sharded (output is a directory: one line per group plus a manifest)")
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    
+    profile = profile_from_args(args)
+    cache = cache_from_args(args)
+    if cache is not None:
+        with profile.phase('cache'):
+            survey = cache.convert(parse_lss_to_json, args.input)
+        with profile.phase('json_dump'):
+            counts = dump_survey_output(survey, args.output, args.format, ensure_ascii=ENSURE_ASCII)
+        print(f"{'Reused cached' if cache.last_hit else 'Cached new'} conversion of {args.input}")
+        print(f"Found {counts['groups']} groups")
+        print(f"Found {counts['questions']} questions")
+        print(f"✅ Created {args.output}")
+        finish_profile(profile, args)
+        return
+    
+    print(f"Parsing {args.input}...")
+    model = read_lss_model(args.input, profile)
+    profile.count_unknown_types(model.groups)
+    
+    # Each group is serialized as it is written; the full JSON document is never built
+    compiler = ExpressionCompiler()
+    groups = profile.iter_phase('serialize', iter_group_json(model, 'lss', compiler))
+    with profile.phase('json_dump'):
+        counts = write_survey_output(args.output, survey_header(model), groups, args.format, ensure_ascii=ENSURE_ASCII)
+    
+    print(f"Found {counts['groups']} groups")
+    print(f"Found {counts['questions']} questions")
+    print(f"Compiled {compiler.stats()['expressions']} distinct expressions")
+    for error in compiler.errors:
+        print(f"⚠️  {error['code']} {error['field']}: {error['error']}")
+    print(f"✅ Created {args.output}")
+    finish_profile(profile, args)
+
+
 if __name__ == "__main__":
-    input_file = "/Users/nomads/Nomads/mats-research/uploads/limesurvey_survey_735545_1_19.lss"
-    output_file = "/Users/nomads/Nomads/focus-group-platform/test_surveys/survey_735545_complete.json"
-    
-    print(f"Parsing {input_file}...")
-    survey = parse_lss_to_json(input_file)
-    
-    print(f"Found {len(survey['question_groups'])} groups")
-    total_questions = sum(len(g['questions']) for g in survey['question_groups'])
-    print(f"Found {total_questions} questions")
-    
-    with open(output_file, 'w') as f:
-        json.dump(survey, f, indent=2)
-    
-    print(f"✅ Created {output_file}")
+    main()
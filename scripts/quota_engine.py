@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Quota fill engine: incremental counters, vectorized recounts and log replay
+Compiles survey_quotas rows (migrations/007_quotas.sql) against a converted
+survey, then keeps one counter per quota in memory instead of querying
+responses for every check:
+
+    QuotaEngine.check(answers)       full quotas this response matches (what
+                                     /api/survey/quotas/check answers)
+    QuotaEngine.complete(answers)    screen out on a full matching quota,
+                                     otherwise count the response in every
+                                     quota it matches
+    recount(quotas, matrix)          counts from scratch over a whole response
+                                     export, one NumPy mask per condition
+
+Condition semantics are those of checkConditions in the check route: all
+conditions must hold, a missing answer never matches, values compare as
+strings (equals / in / not_in) or numbers (greater / less).
+
+Quota files hold a JSON list of survey_quotas rows (id, name, limit,
+current_count, action, redirect_url, conditions, is_active). A response log
+is JSON lines of {"response_id": ..., "answers": {...}} for completed
+responses, in arrival order.
+
+Usage:
+    python quota_engine.py quotas.json --survey survey.json --replay completes.jsonl -o quota_report.json
+    python quota_engine.py quotas.json --survey survey.json --recount responses_store/
+"""
+
+import argparse
+import json
+import math
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from bulk_relevance import ResponseMatrix
+from label_sets import LABEL_SETS_KEY, question_items
+from lss_responses import decode_column, load_codebook
+
+REPORT_FORMAT = 'resonant-quota-report'
+
+OPERATORS = ('equals', 'not_equals', 'in', 'not_in', 'greater', 'less')
+
+# Response store column that is set once a LimeSurvey response was submitted
+SUBMITTED_COLUMN = 'submitdate'
+
+
+def js_string(value) -> str:
+    """String(value) as the check route's JavaScript sees it"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, list):
+        return ','.join('' if item is None else js_string(item) for item in value)
+    return str(value)
+
+
+def js_number(value) -> float:
+    """Number(value) as the check route's JavaScript sees it (NaN when not numeric)"""
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = js_string(value).strip()
+    if not text:
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+
+@dataclass(slots=True)
+class QuotaCondition:
+    variable: str
+    operator: str
+    value: Any
+
+    def matches(self, answer) -> bool:
+        """One condition against one answer; None (unanswered) never matches"""
+        if answer is None:
+            return False
+        op = self.operator
+        if op == 'equals':
+            return js_string(answer) == js_string(self.value)
+        if op == 'not_equals':
+            return js_string(answer) != js_string(self.value)
+        if op == 'in':
+            return isinstance(self.value, list) and js_string(answer) in self.value
+        if op == 'not_in':
+            return not isinstance(self.value, list) or js_string(answer) not in self.value
+        if op == 'greater':
+            return js_number(answer) > js_number(self.value)
+        if op == 'less':
+            return js_number(answer) < js_number(self.value)
+        return False
+
+
+@dataclass(slots=True)
+class Quota:
+    id: str
+    name: str
+    limit: int
+    count: int
+    action: str
+    redirect_url: Optional[str]
+    conditions: List[QuotaCondition] = field(default_factory=list)
+
+    def matches(self, answers: Dict[str, Any]) -> bool:
+        return all(condition.matches(answers.get(condition.variable)) for condition in self.conditions)
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.limit
+
+
+def survey_codes(survey: dict) -> Dict[str, Optional[set]]:
+    """Answer variable -> the answer codes it can hold (None when free-form)"""
+    label_sets = survey.get(LABEL_SETS_KEY)
+    codes: Dict[str, Optional[set]] = {}
+    for group in survey.get('question_groups', []):
+        for question in group.get('questions', []):
+            code = question['code']
+            answers = {item['code'] for item in question_items(question, 'answer_options', label_sets)} or None
+            subquestions = question_items(question, 'subquestions', label_sets)
+            if question.get('question_type') == 'yes_no':
+                answers = {'Y', 'N'}
+            if subquestions and question.get('question_type') == 'multiple_choice_multiple':
+                codes[code] = None
+                for sub in subquestions:
+                    codes[f"{code}_{sub['code']}"] = {'Y'}
+            else:
+                codes[code] = answers
+                for sub in subquestions:
+                    codes[f"{code}_{sub['code']}"] = answers
+            if (question.get('settings') or {}).get('other'):
+                codes[f"{code}_other"] = None
+    return codes
+
+
+def compile_quotas(rows: Iterable[dict], survey: Optional[dict] = None) -> tuple:
+    """Active survey_quotas rows -> (quotas, problems)
+
+    Problems (unknown question codes, answer codes the question doesn't have,
+    unknown operators) are reported rather than raised; such conditions keep
+    the check route's behaviour and simply never match.
+    """
+    codes = survey_codes(survey) if survey is not None else None
+    quotas, problems = [], []
+    for row in rows:
+        if row.get('is_active') is False:
+            continue
+        quota = Quota(str(row.get('id') or row['name']), row['name'], int(row.get('limit', 100)),
+                      int(row.get('current_count') or 0), row.get('action', 'screenout'), row.get('redirect_url'))
+        for condition in row.get('conditions') or []:
+            variable, operator, value = condition.get('question_code'), condition.get('operator'), condition.get('value')
+            if operator not in OPERATORS:
+                problems.append({'quota': quota.name, 'problem': f"unknown operator {operator!r}"})
+            if codes is not None:
+                if variable not in codes:
+                    problems.append({'quota': quota.name, 'problem': f"unknown question code {variable!r}"})
+                elif codes[variable] is not None and operator in ('equals', 'not_equals', 'in', 'not_in'):
+                    values = value if isinstance(value, list) else [value]
+                    unknown = [v for v in values if js_string(v) not in codes[variable]]
+                    if unknown:
+                        problems.append({'quota': quota.name,
+                                         'problem': f"{variable} has no answer code(s) {', '.join(map(js_string, unknown))}"})
+            quota.conditions.append(QuotaCondition(variable, operator, value))
+        quotas.append(quota)
+    return quotas, problems
+
+
+class QuotaEngine:
+    """In-memory quota counters updated one completed response at a time"""
+
+    def __init__(self, quotas: List[Quota]):
+        self.quotas = quotas
+        self.history: List[dict] = []
+        self.completed = 0
+        self.screened_out = 0
+
+    def matching(self, answers: Dict[str, Any]) -> List[Quota]:
+        return [quota for quota in self.quotas if quota.matches(answers)]
+
+    def check(self, answers: Dict[str, Any]) -> List[Quota]:
+        """Full quotas the answers match"""
+        return [quota for quota in self.matching(answers) if quota.full]
+
+    def complete(self, answers: Dict[str, Any], response_id: Optional[str] = None) -> dict:
+        """Apply one completion: the first full matching quota's action, or count it in every matching quota"""
+        matching = self.matching(answers)
+        full = [quota for quota in matching if quota.full]
+        if full:
+            self.screened_out += 1
+            return {'response_id': response_id, 'outcome': full[0].action, 'quota': full[0].id}
+
+        self.completed += 1
+        for quota in matching:
+            quota.count += 1
+            self.history.append({'quota_id': quota.id, 'response_id': response_id,
+                                 'count_before': quota.count - 1, 'count_after': quota.count})
+        return {'response_id': response_id, 'outcome': 'complete', 'quotas': [quota.id for quota in matching]}
+
+    def counts(self) -> Dict[str, dict]:
+        return {quota.id: {'name': quota.name, 'count': quota.count, 'limit': quota.limit, 'full': quota.full}
+                for quota in self.quotas}
+
+
+def condition_mask(condition: QuotaCondition, matrix: ResponseMatrix) -> np.ndarray:
+    """Rows of a response matrix meeting one condition, evaluated once per distinct value"""
+    column = matrix.lookup(condition.variable)
+    if column is None:
+        return np.zeros(matrix.n_rows, dtype=bool)
+    return column.map(condition.matches).to_mask()
+
+
+def quota_masks(quotas: List[Quota], matrix: ResponseMatrix) -> Dict[str, np.ndarray]:
+    """Quota id -> rows matching all of its conditions"""
+    cache: Dict[tuple, np.ndarray] = {}
+    masks = {}
+    for quota in quotas:
+        mask = np.ones(matrix.n_rows, dtype=bool)
+        for condition in quota.conditions:
+            value = tuple(condition.value) if isinstance(condition.value, list) else condition.value
+            key = (condition.variable, condition.operator, value)
+            if key not in cache:
+                cache[key] = condition_mask(condition, matrix)
+            mask &= cache[key]
+        masks[quota.id] = mask
+    return masks
+
+
+def recount(quotas: List[Quota], matrix: ResponseMatrix, submitted: Optional[np.ndarray] = None) -> Dict[str, dict]:
+    """Counts from scratch over every (submitted) row of a response matrix"""
+    rows = submitted if submitted is not None else np.ones(matrix.n_rows, dtype=bool)
+    masks = quota_masks(quotas, matrix)
+    return {quota.id: {'count': int((masks[quota.id] & rows).sum()), 'limit': quota.limit} for quota in quotas}
+
+
+def store_matrix(store_dir: str, quotas: List[Quota]) -> tuple:
+    """ResponseMatrix of the quota variables in an lss_responses store, and its submitted-rows mask"""
+    codebook = load_codebook(store_dir)
+    variables = {condition.variable for quota in quotas for condition in quota.conditions}
+    arrays = {variable: decode_column(store_dir, variable, codebook)
+              for variable in variables if variable in codebook['columns']}
+    submitted = None
+    if SUBMITTED_COLUMN in codebook['columns']:
+        submitted = decode_column(store_dir, SUBMITTED_COLUMN, codebook) != ''
+    matrix = ResponseMatrix.from_arrays(arrays) if arrays else ResponseMatrix({}, codebook['n_rows'])
+    return matrix, submitted
+
+
+def iter_response_log(path: str) -> Iterator[dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay(engine: QuotaEngine, log: Iterable[dict]) -> dict:
+    """Feed a recorded log of completions through the engine; outcomes and when each quota filled"""
+    by_id = {quota.id: quota for quota in engine.quotas}
+    outcomes: Dict[str, int] = {}
+    filled_at: Dict[str, int] = {}
+    for index, entry in enumerate(log):
+        decision = engine.complete(entry.get('answers') or {}, entry.get('response_id'))
+        outcomes[decision['outcome']] = outcomes.get(decision['outcome'], 0) + 1
+        for quota_id in decision.get('quotas', []):
+            if by_id[quota_id].full and quota_id not in filled_at:
+                filled_at[quota_id] = index
+    return {'responses': sum(outcomes.values()), 'outcomes': outcomes, 'filled_at_response': filled_at}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile quotas and count them incrementally or from scratch")
+    parser.add_argument('quotas', help="JSON list of survey_quotas rows")
+    parser.add_argument('--survey', help="converted Resonant survey JSON to check question / answer codes against")
+    parser.add_argument('--replay', help="JSON-lines log of completed responses to feed through the engine")
+    parser.add_argument('--recount', metavar='STORE_DIR', help="lss_responses.py store to recount from")
+    parser.add_argument('--from-zero', action='store_true', help="ignore current_count when replaying")
+    parser.add_argument('-o', '--output', help="write the JSON report here")
+    args = parser.parse_args()
+
+    with open(args.quotas, 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+    survey = None
+    if args.survey:
+        with open(args.survey, 'r', encoding='utf-8') as f:
+            survey = json.load(f)
+    quotas, problems = compile_quotas(rows, survey)
+    print(f"✅ Compiled {len(quotas)} active quotas")
+    for problem in problems:
+        print(f"⚠️  {problem['quota']}: {problem['problem']}")
+
+    report = {'format': REPORT_FORMAT, 'problems': problems}
+    if args.recount:
+        matrix, submitted = store_matrix(args.recount, quotas)
+        if submitted is None:
+            print(f"⚠️  No {SUBMITTED_COLUMN} column, counting every response")
+        counts = recount(quotas, matrix, submitted)
+        report['recount'] = counts
+        print(f"Recounted {matrix.n_rows} responses:")
+        for quota in quotas:
+            drift = counts[quota.id]['count'] - quota.count
+            line = f"   {quota.name:<30} {counts[quota.id]['count']:>7} / {quota.limit:<7}"
+            if drift:
+                line += f"  (current_count {quota.count}, off by {drift:+d})"
+            print(line)
+
+    if args.replay:
+        if args.from_zero:
+            for quota in quotas:
+                quota.count = 0
+        engine = QuotaEngine(quotas)
+        report['replay'] = replay(engine, iter_response_log(args.replay))
+        report['replay']['counts'] = engine.counts()
+        print(f"Replayed {report['replay']['responses']} responses: {report['replay']['outcomes']}")
+        for quota_id, entry in engine.counts().items():
+            print(f"   {entry['name']:<30} {entry['count']:>7} / {entry['limit']:<7}{'  FULL' if entry['full'] else ''}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✅ Created {args.output}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Precomputed, counterbalanced order tables for a survey's randomization groups
+Instead of shuffling per request, every planned participant slot gets a row of
+a balanced design, so across participants each member appears equally often in
+every position. Tables are built with NumPy for all slots at once:
+
+    williams   Williams squares: also balances which member immediately
+               follows which (first-order carryover); k or 2k rows per block
+    latin      cyclic Latin squares: position balance only; k rows per block
+
+Rows are handed out in blocks of one square each. Within a block the rows are
+shuffled and the members relabelled at random (both keep the balance), so
+consecutive participants do not walk the square in order. Balance is exact for
+every complete block; the slot count is rounded up to whole blocks.
+
+Tables are made for groups that share a randomization_group, questions that
+share one, and questions with random_order set (their subquestions, or answer
+options). Each table is a uint8/uint16 .npy (slots x members) next to a
+manifest.json listing the members, so the runtime reads row `slot` in O(1),
+e.g. with np.load(path, mmap_mode='r')[slot].
+
+Usage:
+    python randomization_tables.py survey.json -o randomization/ --participants 5000 --seed 7
+    python randomization_tables.py --lookup randomization/manifest.json groups:messages 1234
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import zlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from label_sets import LABEL_SETS_KEY, question_items
+from survey_model import randomization_group_of
+
+MANIFEST_FORMAT = 'resonant-randomization-tables'
+MANIFEST_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+DESIGNS = ('williams', 'latin')
+
+
+def williams_square(k: int) -> np.ndarray:
+    """Rows of a Williams design for k members (k rows if k is even, else 2k)"""
+    # First row 0, 1, k-1, 2, k-2, ...; the others are its cyclic shifts
+    steps = np.arange(k)
+    first = np.where(steps % 2 == 1, (steps + 1) // 2, (k - steps // 2) % k)
+    square = (first[None, :] + steps[:, None]) % k
+    if k % 2 == 1:
+        square = np.concatenate([square, square[:, ::-1]])
+    return square
+
+
+def latin_square(k: int) -> np.ndarray:
+    steps = np.arange(k)
+    return (steps[None, :] + steps[:, None]) % k
+
+
+def design_square(k: int, design: str) -> np.ndarray:
+    return williams_square(k) if design == 'williams' else latin_square(k)
+
+
+def order_table(k: int, slots: int, design: str = 'williams', rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """(slots rounded up to whole blocks) x k member indices, one balanced order per slot"""
+    rng = rng or np.random.default_rng()
+    square = design_square(k, design)
+    rows = len(square)
+    blocks = max(1, -(-slots // rows))
+    # Shuffle rows within each block, then relabel members per block
+    row_order = rng.permuted(np.tile(np.arange(rows), (blocks, 1)), axis=1)
+    labels = rng.permuted(np.tile(np.arange(k), (blocks, 1)), axis=1)
+    table = square[row_order]
+    table = np.take_along_axis(labels[:, None, :], table, axis=2)
+    dtype = np.uint8 if k <= 256 else np.uint16
+    return table.reshape(blocks * rows, k).astype(dtype)
+
+
+def balance(table: np.ndarray) -> dict:
+    """Spread (max - min) of how often members land in each position and follow each other"""
+    slots, k = table.shape
+    positions = np.zeros((k, k), dtype=np.int64)
+    np.add.at(positions, (table.astype(np.intp), np.broadcast_to(np.arange(k), table.shape)), 1)
+    result = {'position_spread': int(positions.max() - positions.min())}
+    if k > 2:
+        pairs = np.zeros((k, k), dtype=np.int64)
+        np.add.at(pairs, (table[:, :-1].astype(np.intp), table[:, 1:].astype(np.intp)), 1)
+        off_diagonal = pairs[~np.eye(k, dtype=bool)]
+        result['carryover_spread'] = int(off_diagonal.max() - off_diagonal.min())
+    return result
+
+
+def randomization_groups(survey: dict) -> Dict[str, dict]:
+    """Table name -> {'kind', 'members'} for everything the runtime shuffles"""
+    label_sets = survey.get(LABEL_SETS_KEY)
+    groups = sorted(survey.get('question_groups', []), key=lambda group: group.get('order_index', 0))
+    tables: Dict[str, dict] = {}
+    for index, group in enumerate(groups):
+        name = randomization_group_of(group)
+        if name:
+            entry = tables.setdefault(f"groups:{name}", {'kind': 'groups', 'members': [], 'titles': []})
+            entry['members'].append(index)
+            entry['titles'].append(group.get('title'))
+        questions = sorted(group.get('questions', []), key=lambda question: question.get('order_index', 0))
+        for question in questions:
+            settings = question.get('settings') or {}
+            name = randomization_group_of(question)
+            if name:
+                tables.setdefault(f"questions:{name}", {'kind': 'questions', 'members': []})['members'].append(
+                    question['code'])
+            if settings.get('random_order') not in (None, '', '0', 0, False):
+                items = question_items(question, 'subquestions', label_sets)
+                kind = 'subquestions'
+                if not items:
+                    items, kind = question_items(question, 'answer_options', label_sets), 'answer_options'
+                if items:
+                    tables[f"{kind}:{question['code']}"] = {'kind': kind, 'members': [item['code'] for item in items]}
+    return {name: entry for name, entry in tables.items() if len(entry['members']) > 1}
+
+
+def _table_rng(seed: int, name: str) -> np.random.Generator:
+    # Independent stream per table, stable across runs and table order
+    return np.random.default_rng([seed, zlib.crc32(name.encode('utf-8'))])
+
+
+def write_tables(out_dir: str, survey: dict, participants: int, design: str = 'williams',
+                 seed: int = 0) -> dict:
+    """Write one .npy per randomization group and manifest.json; returns the manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    tables = {}
+    for index, (name, entry) in enumerate(sorted(randomization_groups(survey).items())):
+        table = order_table(len(entry['members']), participants, design, _table_rng(seed, name))
+        path = f"table_{index:03d}.npy"
+        np.save(os.path.join(out_dir, path), table)
+        with open(os.path.join(out_dir, path), 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        tables[name] = {
+            **entry,
+            'path': path,
+            'slots': len(table),
+            'block_rows': len(design_square(len(entry['members']), design)),
+            'dtype': str(table.dtype),
+            'sha256': digest,
+            'balance': balance(table),
+        }
+
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'version': MANIFEST_VERSION,
+        'design': design,
+        'seed': seed,
+        'participants': participants,
+        'tables': tables,
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def lookup(manifest_path: str, name: str, slot: int) -> Tuple[list, np.ndarray]:
+    """Members of a table in the order for a participant slot (slots past the end wrap around)"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entry = json.load(f)['tables'][name]
+    table = np.load(os.path.join(os.path.dirname(manifest_path), entry['path']), mmap_mode='r')
+    row = np.asarray(table[slot % len(table)])
+    return [entry['members'][i] for i in row], row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute counterbalanced order tables for randomization groups")
+    parser.add_argument('survey', nargs='?', help="converted Resonant survey JSON")
+    parser.add_argument('-o', '--output-dir', help="directory for the .npy tables and manifest.json")
+    parser.add_argument('--participants', type=int, default=5000, help="planned participant slots")
+    parser.add_argument('--design', choices=DESIGNS, default='williams')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--lookup', nargs=3, metavar=('MANIFEST', 'TABLE', 'SLOT'),
+                        help="print the order of one table for one slot")
+    args = parser.parse_args()
+
+    if args.lookup:
+        members, _ = lookup(args.lookup[0], args.lookup[1], int(args.lookup[2]))
+        print(json.dumps(members, ensure_ascii=False))
+        return
+    if not args.survey or not args.output_dir:
+        parser.error("survey and --output-dir are required")
+
+    with open(args.survey, 'r', encoding='utf-8') as f:
+        survey = json.load(f)
+    manifest = write_tables(args.output_dir, survey, args.participants, args.design, args.seed)
+    if not manifest['tables']:
+        print("⚠️  No randomization groups or random_order questions with more than one member")
+    for name, entry in manifest['tables'].items():
+        print(f"   {name:<30} {len(entry['members']):>4} members  {entry['slots']:>7} slots  "
+              f"balance {entry['balance']}")
+    print(f"✅ Created {os.path.join(args.output_dir, MANIFEST_NAME)} ({len(manifest['tables'])} tables)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Codebook and integer-encoded response cube for fast frequencies and crosstabs
+The codebook flattens a converted survey into categorical variables, one per
+question or per question x subquestion (Q1, Q1_SQ001, ...), and numbers each
+variable's answer codes 1..n by order_index (0 = no answer). Responses are
+loaded into one dense respondents x variables uint8 array (uint16 when a
+variable has 255+ codes), so frequencies and crosstabs are np.bincount calls
+instead of joins and string comparisons over response_data.
+
+Variable kinds:
+    single     one answer code (list, dropdown, yes/no, array rows)
+    multiple   multiple choice option: 1 = selected
+    rank       ranking position Q1_1, Q1_2, ...: the answer code ranked there
+Free-text, numeric and display questions are listed as skipped.
+
+Responses come from an lss_responses.py store (LimeSurvey codes, vectorized)
+or a response_data export with one row per answer:
+    SELECT rd.response_id, q.code AS question_code, sq.code AS subquestion_code, rd.value
+    FROM response_data rd JOIN questions q ON q.id = rd.question_id
+    LEFT JOIN subquestions sq ON sq.id = rd.subquestion_id
+
+Usage:
+    python response_cube.py survey.json --store responses_store/ -o cube/
+    python response_cube.py survey.json --rows response_data.csv -o cube/
+    python response_cube.py --crosstab cube/ Q1 Q2 --weights weights.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from label_sets import LABEL_SETS_KEY, question_items
+from lss_responses import load_codebook as load_store_codebook
+from lss_responses import read_column
+
+CODEBOOK_FORMAT = 'resonant-response-codebook'
+CODEBOOK_VERSION = 1
+CODEBOOK_NAME = 'codebook.json'
+CUBE_NAME = 'cube.npy'
+RESPONDENTS_NAME = 'respondents.json'
+
+MULTIPLE_TYPES = {'multiple_choice_multiple', 'button_multi_select', 'image_multi_select'}
+NO_DATA_TYPES = {'text_display', 'equation'}
+YES_NO_LEVELS = [{'code': 'Y', 'label': 'Yes'}, {'code': 'N', 'label': 'No'}]
+SELECTED_LEVELS = [{'code': 'Y', 'label': 'Selected'}]
+
+
+def _levels(items: List[dict]) -> List[dict]:
+    """Answer options of scale 0 ordered by order_index, as {code, label}"""
+    ordered = sorted(enumerate(items), key=lambda pair: (pair[1].get('order_index', pair[0]), pair[0]))
+    return [{'code': item['code'], 'label': item.get('label', item['code'])}
+            for _, item in ordered if not item.get('scale_id')]
+
+
+def build_codebook(survey: dict) -> dict:
+    """Flatten a converted survey into categorical variables with integer-coded levels"""
+    label_sets = survey.get(LABEL_SETS_KEY)
+    variables, skipped = [], []
+    for group in sorted(survey.get('question_groups', []), key=lambda g: g.get('order_index', 0)):
+        for question in sorted(group.get('questions', []), key=lambda q: q.get('order_index', 0)):
+            code, q_type = question['code'], question.get('question_type', 'text')
+            text = question.get('question_text', '')
+            if q_type in NO_DATA_TYPES:
+                continue
+            answers = _levels(question_items(question, 'answer_options', label_sets))
+            subquestions = _levels(question_items(question, 'subquestions', label_sets))
+            if q_type == 'yes_no':
+                answers = YES_NO_LEVELS
+            base = {'question': code, 'question_text': text}
+
+            if q_type in MULTIPLE_TYPES:
+                options = subquestions or answers
+                for option in options:
+                    variables.append({**base, 'name': f"{code}_{option['code']}", 'kind': 'multiple',
+                                      'subquestion': option['code'], 'label': option['label'],
+                                      'levels': SELECTED_LEVELS})
+            elif q_type == 'ranking' and answers:
+                for rank in range(1, len(answers) + 1):
+                    variables.append({**base, 'name': f"{code}_{rank}", 'kind': 'rank', 'subquestion': str(rank),
+                                      'label': f"Rank {rank}", 'levels': answers})
+            elif answers and subquestions:
+                for sub in subquestions:
+                    variables.append({**base, 'name': f"{code}_{sub['code']}", 'kind': 'single',
+                                      'subquestion': sub['code'], 'label': sub['label'], 'levels': answers})
+            elif answers:
+                variables.append({**base, 'name': code, 'kind': 'single', 'subquestion': None,
+                                  'label': text, 'levels': answers})
+            else:
+                skipped.append(code)
+
+    most = max((len(variable['levels']) for variable in variables), default=0)
+    return {
+        'format': CODEBOOK_FORMAT,
+        'version': CODEBOOK_VERSION,
+        'dtype': 'uint8' if most < 255 else 'uint16',
+        'variables': variables,
+        'skipped': skipped,
+    }
+
+
+class ResponseCube:
+    """respondents x variables integer codes with frequency and crosstab queries"""
+
+    def __init__(self, codebook: dict, data: np.ndarray, respondents: Optional[List[str]] = None):
+        self.codebook = codebook
+        self.data = data
+        self.respondents = respondents or [str(i) for i in range(len(data))]
+        self.index = {variable['name']: i for i, variable in enumerate(codebook['variables'])}
+
+    @classmethod
+    def load(cls, cube_dir: str, mmap: bool = True) -> 'ResponseCube':
+        with open(os.path.join(cube_dir, CODEBOOK_NAME), 'r', encoding='utf-8') as f:
+            codebook = json.load(f)
+        with open(os.path.join(cube_dir, RESPONDENTS_NAME), 'r', encoding='utf-8') as f:
+            respondents = json.load(f)
+        data = np.load(os.path.join(cube_dir, CUBE_NAME), mmap_mode='r' if mmap else None)
+        return cls(codebook, data, respondents)
+
+    def save(self, cube_dir: str):
+        os.makedirs(cube_dir, exist_ok=True)
+        np.save(os.path.join(cube_dir, CUBE_NAME), self.data)
+        with open(os.path.join(cube_dir, CODEBOOK_NAME), 'w', encoding='utf-8') as f:
+            json.dump(self.codebook, f, indent=2, ensure_ascii=False)
+        with open(os.path.join(cube_dir, RESPONDENTS_NAME), 'w', encoding='utf-8') as f:
+            json.dump(self.respondents, f)
+
+    def variable(self, name: str) -> dict:
+        return self.codebook['variables'][self.index[name]]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.data[:, self.index[name]]
+
+    def codes(self, name: str) -> List[Optional[str]]:
+        """Answer codes by integer code, None (no answer) first"""
+        return [None] + [level['code'] for level in self.variable(name)['levels']]
+
+    def labels(self, name: str) -> List[str]:
+        """Category labels by integer code, code 0 (no answer) first"""
+        return ['(no answer)'] + [level['label'] for level in self.variable(name)['levels']]
+
+    def frequencies(self, name: str, weights: Optional[np.ndarray] = None,
+                    mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """(Weighted) count per code, index 0 = no answer"""
+        column = self.column(name)
+        if mask is not None:
+            column = column[mask]
+            weights = weights[mask] if weights is not None else None
+        return np.bincount(column, weights=weights, minlength=len(self.variable(name)['levels']) + 1)
+
+    def crosstab(self, rows: str, columns: str, weights: Optional[np.ndarray] = None,
+                 mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """(Weighted) counts of rows-variable code x columns-variable code, code 0 = no answer"""
+        n_rows = len(self.variable(rows)['levels']) + 1
+        n_columns = len(self.variable(columns)['levels']) + 1
+        left, right = self.column(rows), self.column(columns)
+        if mask is not None:
+            left, right = left[mask], right[mask]
+            weights = weights[mask] if weights is not None else None
+        cells = left.astype(np.intp) * n_columns + right
+        return np.bincount(cells, weights=weights, minlength=n_rows * n_columns).reshape(n_rows, n_columns)
+
+    def where(self, name: str, codes: Iterable[str]) -> np.ndarray:
+        """Mask of respondents whose answer to a variable is one of codes"""
+        lookup = {level['code']: i + 1 for i, level in enumerate(self.variable(name)['levels'])}
+        return np.isin(self.column(name), [lookup[code] for code in codes if code in lookup])
+
+
+def _new_cube(codebook: dict, n_rows: int) -> np.ndarray:
+    # Column-major, so each variable's codes are contiguous
+    return np.zeros((n_rows, len(codebook['variables'])), dtype=codebook['dtype'], order='F')
+
+
+def cube_from_store(codebook: dict, store_dir: str) -> Tuple[ResponseCube, Dict[str, int]]:
+    """Encode an lss_responses.py store; returns the cube and per-variable counts of unknown codes"""
+    store = load_store_codebook(store_dir)
+    data = _new_cube(codebook, store['n_rows'])
+    unknown = {}
+    for position, variable in enumerate(codebook['variables']):
+        entry = store['columns'].get(variable['name'])
+        if entry is None or entry['kind'] != 'categorical':
+            continue
+        codes = read_column(store_dir, variable['name'], store)
+        lookup = {level['code']: i + 1 for i, level in enumerate(variable['levels'])}
+        # Store level index -> cube code; trailing 0 catches -1 (no answer)
+        lut = np.array([lookup.get(level, 0) for level in entry['levels']] + [0], dtype=data.dtype)
+        data[:, position] = lut[codes]
+        missing = [level for level in entry['levels'] if level not in lookup]
+        if missing:
+            unknown[variable['name']] = int(np.isin(codes, [entry['levels'].index(level) for level in missing]).sum())
+    respondents = None
+    if 'id' in store['columns']:
+        respondents = ['' if np.isnan(value) else str(int(value)) for value in read_column(store_dir, 'id', store)]
+    return ResponseCube(codebook, data, respondents), unknown
+
+
+def _parse_list(value: str) -> List[str]:
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        return [part for part in value.split(',') if part]
+    return [str(item) for item in parsed] if isinstance(parsed, list) else [str(parsed)]
+
+
+def cube_from_rows(codebook: dict, rows: Iterable[dict]) -> Tuple[ResponseCube, Dict[str, int]]:
+    """Encode response_data rows ({response_id, question_code, subquestion_code, value}) in one pass
+
+    Multiple choice and ranking answers the web client stores as a JSON list
+    under the question code are spread over their option / rank variables.
+    """
+    index = {variable['name']: i for i, variable in enumerate(codebook['variables'])}
+    lookups = [{level['code']: i + 1 for i, level in enumerate(variable['levels'])}
+               for variable in codebook['variables']]
+    kinds = {variable['question']: variable['kind'] for variable in codebook['variables']}
+    data = _new_cube(codebook, 1024)
+    respondents: Dict[str, int] = {}
+    unknown: Dict[str, int] = {}
+
+    def put(name: str, code: str):
+        position = index.get(name)
+        if position is None:
+            return
+        value = lookups[position].get(code)
+        if value is None:
+            unknown[name] = unknown.get(name, 0) + 1
+            return
+        data[row, position] = value
+
+    for record in rows:
+        response_id = str(record['response_id'])
+        row = respondents.setdefault(response_id, len(respondents))
+        if row >= len(data):
+            data = np.concatenate([data, np.zeros_like(data)])
+        question, sub, value = record['question_code'], record.get('subquestion_code') or '', record.get('value')
+        if value is None or value == '':
+            continue
+        kind = kinds.get(question)
+        if kind == 'multiple' and not sub:
+            for option in _parse_list(value):
+                put(f"{question}_{option}", 'Y')
+        elif kind == 'rank' and not sub:
+            for rank, option in enumerate(_parse_list(value), 1):
+                put(f"{question}_{rank}", option)
+        else:
+            put(f"{question}_{sub}" if sub else question, value)
+
+    return ResponseCube(codebook, np.asfortranarray(data[:len(respondents)]), list(respondents)), unknown
+
+
+def iter_row_file(path: str) -> Iterable[dict]:
+    """response_data rows from a CSV (with a header row) or JSON-lines export"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def load_weights(path: str, cube: ResponseCube) -> np.ndarray:
+    """Weights CSV (response_id, weight) aligned to the cube's respondents; missing ones weigh 0"""
+    weights = np.zeros(len(cube.respondents))
+    position = {respondent: i for i, respondent in enumerate(cube.respondents)}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for record in csv.DictReader(f):
+            i = position.get(str(record['response_id']))
+            if i is not None:
+                weights[i] = float(record['weight'])
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a codebook and integer response cube, or crosstab one")
+    parser.add_argument('survey', nargs='?', help="converted Resonant survey JSON")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--store', help="lss_responses.py response store")
+    source.add_argument('--rows', help="response_data export (.csv or .jsonl)")
+    parser.add_argument('-o', '--output-dir', help="directory for cube.npy, codebook.json, respondents.json")
+    parser.add_argument('--crosstab', nargs='+', metavar=('CUBE_DIR', 'VARIABLE'),
+                        help="print frequencies of one variable or a crosstab of two")
+    parser.add_argument('--weights', help="CSV of response_id,weight for --crosstab")
+    args = parser.parse_args()
+
+    if args.crosstab:
+        cube = ResponseCube.load(args.crosstab[0])
+        weights = load_weights(args.weights, cube) if args.weights else None
+        names = args.crosstab[1:3]
+        if len(names) == 1:
+            counts = cube.frequencies(names[0], weights)
+            for label, count in zip(cube.labels(names[0]), counts):
+                print(f"   {label:<20} {count:>12,.1f}")
+        else:
+            table = cube.crosstab(names[0], names[1], weights)
+            columns = cube.labels(names[1])
+            width = max(12, max(len(label) for label in columns) + 1)
+            print(' ' * 21 + ''.join(f"{label:>{width}}" for label in columns))
+            for label, counts in zip(cube.labels(names[0]), table):
+                print(f"   {label:<18}" + ''.join(f"{count:>{width},.1f}" for count in counts))
+        return
+
+    if not args.survey or not args.output_dir or not (args.store or args.rows):
+        parser.error("survey, --output-dir and --store or --rows are required")
+    with open(args.survey, 'r', encoding='utf-8') as f:
+        codebook = build_codebook(json.load(f))
+    print(f"Codebook: {len(codebook['variables'])} variables ({codebook['dtype']}), "
+          f"{len(codebook['skipped'])} free-form questions skipped")
+
+    if args.store:
+        cube, unknown = cube_from_store(codebook, args.store)
+    else:
+        cube, unknown = cube_from_rows(codebook, iter_row_file(args.rows))
+    for name, count in unknown.items():
+        print(f"⚠️  {name}: {count} answers with codes not in the survey (left as no answer)")
+    cube.save(args.output_dir)
+    print(f"✅ Created {args.output_dir} ({cube.data.shape[0]} respondents x {cube.data.shape[1]} variables, "
+          f"{cube.data.nbytes / 2**20:.1f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
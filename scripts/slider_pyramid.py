@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Aggregate dial-testing slider_events into multi-resolution time-series pyramids
+slider_events (migrations/001_slider_events.sql) holds one row per slider
+movement. This streams an export of it in chunks and turns every
+participant's movements into a step function sampled on a fixed grid (the
+value at time t is their latest movement at or before t; NaN before their
+first one), then computes per-bucket statistics across participants:
+
+    n, mean, std, p10, p25, median, p75, p90     all participants
+    mean[attr=value], n[attr=value]              per demographic split
+
+Level 0 samples every --step-ms; each further level halves the resolution,
+taking every participant's mean over the wider bucket before the statistics,
+until a level has at most --min-points buckets. Each level is one float32
+.npy (buckets x columns, row-major so a time window is a contiguous slice)
+listed in manifest.json; read_window() picks the coarsest level that still
+gives up to max_points buckets, so any zoom reads a few thousand rows.
+
+The export is CSV with session_id, participant_id, value and session_ms
+columns (extra columns are ignored). Rows may come in any order; only the
+dense participants x grid matrix is kept in memory, never the raw events.
+
+Usage:
+    python slider_pyramid.py slider_events.csv -o pyramid/ --session-id <uuid> --step-ms 250 \\
+        --demographics participants.csv --split gender --split age_group
+    python slider_pyramid.py --window pyramid/manifest.json 60000 120000
+"""
+
+import argparse
+import csv
+import json
+import os
+import warnings
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+MANIFEST_FORMAT = 'resonant-slider-pyramid'
+MANIFEST_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+DEFAULT_CHUNK_ROWS = 100000
+DEFAULT_STEP_MS = 250
+DEFAULT_MIN_POINTS = 1000
+UNKNOWN = '(unknown)'
+
+PERCENTILES = (10, 25, 50, 75, 90)
+STAT_COLUMNS = ['time_ms', 'n', 'mean', 'std', 'p10', 'p25', 'median', 'p75', 'p90']
+
+
+class StepGrid:
+    """Latest slider value per participant per grid cell, updated chunk by chunk"""
+
+    def __init__(self, step_ms: int, end_ms: Optional[int] = None):
+        self.step_ms = step_ms
+        self.max_cells = end_ms // step_ms + 1 if end_ms is not None else None
+        self.participants: Dict[str, int] = {}
+        self.last_ms = np.full((0, 0), -1, dtype=np.int64)
+        self.last_value = np.zeros((0, 0), dtype=np.float32)
+        self.events = 0
+        self.dropped = 0
+
+    def _grow(self, rows: int, cells: int):
+        old_rows, old_cells = self.last_ms.shape
+        if rows <= old_rows and cells <= old_cells:
+            return
+        rows, cells = max(rows, old_rows), max(cells, old_cells)
+        last_ms = np.full((rows, cells), -1, dtype=np.int64)
+        last_value = np.zeros((rows, cells), dtype=np.float32)
+        last_ms[:old_rows, :old_cells] = self.last_ms
+        last_value[:old_rows, :old_cells] = self.last_value
+        self.last_ms, self.last_value = last_ms, last_value
+
+    def add_chunk(self, participant_ids: List[str], session_ms: np.ndarray, values: np.ndarray):
+        """Fold one chunk of events in; later rows win ties at the same millisecond"""
+        self.events += len(session_ms)
+        rows = np.fromiter((self.participants.setdefault(p, len(self.participants)) for p in participant_ids),
+                           dtype=np.int64, count=len(participant_ids))
+        # Each event sets the value from the first grid time at or after it
+        cells = -(-session_ms // self.step_ms)
+        keep = session_ms >= 0
+        if self.max_cells is not None:
+            keep &= cells < self.max_cells
+        self.dropped += int((~keep).sum())
+        rows, cells, session_ms, values = rows[keep], cells[keep], session_ms[keep], values[keep]
+        if not len(rows):
+            return
+        self._grow(len(self.participants), int(cells.max()) + 1)
+
+        # Latest event per (participant, cell) within the chunk...
+        key = rows * self.last_ms.shape[1] + cells
+        order = np.lexsort((np.arange(len(key)), session_ms, key))
+        key = key[order]
+        chosen = order[np.append(key[1:] != key[:-1], True)]
+        r, c = rows[chosen], cells[chosen]
+        # ...replacing what earlier chunks left there unless it is newer
+        newer = session_ms[chosen] >= self.last_ms[r, c]
+        r, c, chosen = r[newer], c[newer], chosen[newer]
+        self.last_ms[r, c] = session_ms[chosen]
+        self.last_value[r, c] = values[chosen]
+
+    def matrix(self) -> np.ndarray:
+        """participants x cells float32 step-function samples (NaN before a participant's first event)"""
+        rows, cells = self.last_ms.shape
+        if self.max_cells is not None and cells < self.max_cells:
+            self._grow(rows, self.max_cells)
+            cells = self.max_cells
+        index = np.where(self.last_ms >= 0, np.arange(cells), -1)
+        np.maximum.accumulate(index, axis=1, out=index)
+        samples = np.take_along_axis(self.last_value, np.maximum(index, 0), axis=1)
+        samples[index < 0] = np.nan
+        return samples
+
+
+def iter_event_chunks(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                      session_id: Optional[str] = None) -> Iterator[Tuple[List[str], np.ndarray, np.ndarray]]:
+    """(participant ids, session_ms, values) arrays of up to chunk_rows events from a CSV export"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        participants, times, values = [], [], []
+        for row in csv.DictReader(f):
+            if session_id is not None and row.get('session_id') != session_id:
+                continue
+            participants.append(row['participant_id'])
+            times.append(int(float(row['session_ms'])))
+            values.append(float(row['value']))
+            if len(times) >= chunk_rows:
+                yield participants, np.array(times, dtype=np.int64), np.array(values, dtype=np.float32)
+                participants, times, values = [], [], []
+        if times:
+            yield participants, np.array(times, dtype=np.int64), np.array(values, dtype=np.float32)
+
+
+def bucket_stats(values: np.ndarray, times: np.ndarray, splits: Dict[str, np.ndarray]) -> np.ndarray:
+    """Statistics across participants (rows) for every bucket (column), as buckets x columns"""
+    with warnings.catch_warnings():
+        # Buckets before anyone moved the slider are all-NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        n = np.sum(~np.isnan(values), axis=0)
+        columns = [times, n, np.nanmean(values, axis=0), np.nanstd(values, axis=0),
+                   *np.nanpercentile(values, PERCENTILES, axis=0)]
+        for mask in splits.values():
+            subset = values[mask]
+            columns += [np.nanmean(subset, axis=0), np.sum(~np.isnan(subset), axis=0)]
+    return np.stack(columns, axis=1).astype(np.float32)
+
+
+def _halve(sums: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge neighbouring buckets pairwise (sums and sample counts per participant)"""
+    if sums.shape[1] % 2:
+        sums = np.pad(sums, ((0, 0), (0, 1)))
+        counts = np.pad(counts, ((0, 0), (0, 1)))
+    return sums[:, 0::2] + sums[:, 1::2], counts[:, 0::2] + counts[:, 1::2]
+
+
+def split_masks(participants: Dict[str, int], demographics: Dict[str, dict], attributes: Iterable[str]) -> Dict[str, np.ndarray]:
+    """'attr=value' -> participant-row mask, for every value each split attribute takes"""
+    masks = {}
+    order = sorted(participants, key=participants.get)
+    for attribute in attributes:
+        labels = np.array([demographics.get(p, {}).get(attribute) or UNKNOWN for p in order])
+        for value in sorted(set(labels.tolist())):
+            masks[f"{attribute}={value}"] = labels == value
+    return masks
+
+
+def build_pyramid(grid: StepGrid, out_dir: str, splits: Optional[Dict[str, np.ndarray]] = None,
+                  min_points: int = DEFAULT_MIN_POINTS) -> dict:
+    """Write one stats .npy per resolution level and manifest.json; returns the manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    splits = splits or {}
+    samples = grid.matrix()
+    valid = ~np.isnan(samples)
+    sums = np.where(valid, samples, 0).astype(np.float64)
+    counts = valid.astype(np.int32)
+    columns = STAT_COLUMNS + [name for split in splits for name in (f"mean[{split}]", f"n[{split}]")]
+
+    levels = []
+    bucket_ms = grid.step_ms
+    while True:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = np.where(counts > 0, sums / counts, np.nan)
+        times = np.arange(values.shape[1], dtype=np.float64) * bucket_ms
+        stats = bucket_stats(values, times, splits)
+        path = f"level_{len(levels):02d}.npy"
+        np.save(os.path.join(out_dir, path), stats)
+        levels.append({'level': len(levels), 'bucket_ms': bucket_ms, 'points': len(stats), 'path': path})
+        if len(stats) <= min_points:
+            break
+        sums, counts = _halve(sums, counts)
+        bucket_ms *= 2
+
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'version': MANIFEST_VERSION,
+        'step_ms': grid.step_ms,
+        'participants': len(grid.participants),
+        'events': grid.events,
+        'dropped_events': grid.dropped,
+        'columns': columns,
+        'splits': list(splits),
+        'levels': levels,
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def read_window(manifest_path: str, start_ms: float, end_ms: float, max_points: int = 2000) -> Dict[str, np.ndarray]:
+    """Columns for [start_ms, end_ms] from the finest level that needs at most max_points buckets"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    span = max(end_ms - start_ms, 0)
+    level = next((entry for entry in manifest['levels'] if span / entry['bucket_ms'] <= max_points),
+                 manifest['levels'][-1])
+    stats = np.load(os.path.join(os.path.dirname(manifest_path), level['path']), mmap_mode='r')
+    first = max(int(start_ms // level['bucket_ms']), 0)
+    last = int(end_ms // level['bucket_ms']) + 1
+    window = np.asarray(stats[first:last])
+    return {name: window[:, i] for i, name in enumerate(manifest['columns'])}
+
+
+def load_demographics(path: str) -> Dict[str, dict]:
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return {row['participant_id']: row for row in csv.DictReader(f)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resample slider events and build multi-resolution pyramids")
+    parser.add_argument('events', nargs='?', help="slider_events CSV export")
+    parser.add_argument('-o', '--output-dir', help="directory for level_*.npy and manifest.json")
+    parser.add_argument('--session-id', help="only events of this session")
+    parser.add_argument('--step-ms', type=int, default=DEFAULT_STEP_MS, help="finest grid spacing")
+    parser.add_argument('--end-ms', type=int, help="grid end (default: the last event)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--min-points', type=int, default=DEFAULT_MIN_POINTS,
+                        help="stop adding levels once one has at most this many buckets")
+    parser.add_argument('--demographics', help="CSV with participant_id and attribute columns")
+    parser.add_argument('--split', action='append', default=[], help="demographic column to split by (repeatable)")
+    parser.add_argument('--window', nargs=3, metavar=('MANIFEST', 'START_MS', 'END_MS'),
+                        help="print the buckets a chart of this time range would read")
+    parser.add_argument('--max-points', type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.window:
+        window = read_window(args.window[0], float(args.window[1]), float(args.window[2]), args.max_points)
+        for i in range(len(window['time_ms'])):
+            print(f"   {window['time_ms'][i]:>10.0f} ms  n {window['n'][i]:>5.0f}  mean {window['mean'][i]:6.1f}  "
+                  f"median {window['median'][i]:6.1f}  p10-p90 {window['p10'][i]:6.1f}-{window['p90'][i]:6.1f}")
+        return
+    if not args.events or not args.output_dir:
+        parser.error("events and --output-dir are required")
+    if args.split and not args.demographics:
+        parser.error("--split needs --demographics")
+
+    grid = StepGrid(args.step_ms, args.end_ms)
+    for chunk in iter_event_chunks(args.events, args.chunk_rows, args.session_id):
+        grid.add_chunk(*chunk)
+    print(f"Read {grid.events} events from {len(grid.participants)} participants")
+    if grid.dropped:
+        print(f"⚠️  Dropped {grid.dropped} events outside the grid")
+    if not grid.participants:
+        print("❌ No events")
+        return
+
+    splits = split_masks(grid.participants, load_demographics(args.demographics), args.split) if args.split else {}
+    manifest = build_pyramid(grid, args.output_dir, splits, args.min_points)
+    for level in manifest['levels']:
+        print(f"   level {level['level']:>2}: {level['points']:>8} buckets of {level['bucket_ms']} ms")
+    print(f"✅ Created {os.path.join(args.output_dir, MANIFEST_NAME)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Bulk-load a converted Resonant survey into the survey schema in one transaction
+Every row gets its UUID up front and foreign keys are resolved in memory, so
+each table (migrations/survey/001_survey_schema.sql) is written as a single
+COPY stream, in dependency order, instead of one API round trip per row.
+
+Targets:
+    --sql FILE      psql script: BEGIN; one COPY ... FROM stdin per table; COMMIT
+    --dsn DSN       load straight into Postgres (needs psycopg or psycopg2)
+    --sqlite FILE   load into a SQLite stand-in with the same tables and columns
+
+Usage:
+    python survey_db_loader.py survey.json --sql load_survey.sql
+    python survey_db_loader.py survey.lss --sqlite /tmp/survey.db
+"""
+
+import argparse
+import io
+import json
+import sqlite3
+import uuid
+from typing import Dict, Iterator, List, Optional, TextIO
+
+from label_sets import LABEL_SETS_KEY, question_items
+from survey_model import randomization_group_of, relevance_of
+
+# Tables in foreign-key dependency order, with the columns the loader fills
+# (created_at / updated_at are left to the column defaults)
+TABLE_COLUMNS = {
+    'surveys': ('id', 'title', 'description', 'status', 'settings'),
+    'question_groups': ('id', 'survey_id', 'title', 'description', 'order_index', 'relevance_logic', 'random_group'),
+    'questions': ('id', 'group_id', 'code', 'question_text', 'help_text', 'question_type', 'settings',
+                  'relevance_logic', 'order_index'),
+    'subquestions': ('id', 'question_id', 'code', 'label', 'order_index', 'relevance_logic'),
+    'answer_options': ('id', 'question_id', 'code', 'label', 'order_index', 'scale_id'),
+}
+
+JSON_COLUMNS = {'settings'}
+
+# Same tables for the SQLite stand-in; UUIDs and JSONB are stored as TEXT
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS surveys (
+  id TEXT PRIMARY KEY, title TEXT NOT NULL, description TEXT,
+  status TEXT NOT NULL DEFAULT 'draft', settings TEXT DEFAULT '{}', created_by TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP, updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS question_groups (
+  id TEXT PRIMARY KEY, survey_id TEXT REFERENCES surveys(id) ON DELETE CASCADE,
+  title TEXT, description TEXT, order_index INTEGER NOT NULL, relevance_logic TEXT,
+  random_group TEXT, created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS questions (
+  id TEXT PRIMARY KEY, group_id TEXT REFERENCES question_groups(id) ON DELETE CASCADE,
+  code TEXT NOT NULL, question_text TEXT NOT NULL, help_text TEXT, question_type TEXT NOT NULL,
+  settings TEXT DEFAULT '{}', relevance_logic TEXT, order_index INTEGER NOT NULL,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS subquestions (
+  id TEXT PRIMARY KEY, question_id TEXT REFERENCES questions(id) ON DELETE CASCADE,
+  code TEXT NOT NULL, label TEXT NOT NULL, order_index INTEGER NOT NULL, relevance_logic TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS answer_options (
+  id TEXT PRIMARY KEY, question_id TEXT REFERENCES questions(id) ON DELETE CASCADE,
+  code TEXT NOT NULL, label TEXT NOT NULL, order_index INTEGER NOT NULL, scale_id INTEGER DEFAULT 0,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+def row_id(survey_id: str, *path) -> str:
+    """Deterministic child UUID: the same survey id and position always give the same id"""
+    return str(uuid.uuid5(uuid.UUID(survey_id), '/'.join(str(part) for part in path)))
+
+
+def build_rows(survey: dict, survey_id: Optional[str] = None) -> Dict[str, List[tuple]]:
+    """Rows for every table, keyed by table name, with ids and foreign keys filled in
+
+    Relevance and randomization groups are read wherever the converter dialect
+    keeps them (survey_model.relevance_of); help_text follows the JSON import
+    route, falling back to the converter's settings. Shared label sets are
+    expanded into per-question rows.
+    """
+    survey_id = survey_id or str(uuid.uuid4())
+    rows = {table: [] for table in TABLE_COLUMNS}
+    label_sets = survey.get(LABEL_SETS_KEY)
+
+    rows['surveys'].append(survey_row(survey, survey_id))
+
+    for group_index, group in enumerate(survey.get('question_groups', [])):
+        group_id = row_id(survey_id, 'group', group_index)
+        rows['question_groups'].append(group_row(group, group_id, survey_id, group_index))
+
+        for question_index, question in enumerate(group.get('questions', [])):
+            question_id = row_id(survey_id, 'group', group_index, 'question', question_index)
+            rows['questions'].append(question_row(question, question_id, group_id, question_index))
+
+            for sub_index, sub in enumerate(question_items(question, 'subquestions', label_sets)):
+                sub_id = row_id(question_id, 'subquestion', sub_index)
+                rows['subquestions'].append(subquestion_row(sub, sub_id, question_id, sub_index))
+
+            for option_index, option in enumerate(question_items(question, 'answer_options', label_sets)):
+                option_id = row_id(question_id, 'answer_option', option_index)
+                rows['answer_options'].append(answer_option_row(option, option_id, question_id, option_index))
+
+    return rows
+
+
+def survey_row(survey: dict, survey_id: str) -> tuple:
+    return (
+        survey_id,
+        survey['title'],
+        survey.get('description'),
+        survey.get('status') or 'draft',
+        survey.get('settings') or {},
+    )
+
+
+def group_row(group: dict, group_id: str, survey_id: str, index: int) -> tuple:
+    return (
+        group_id,
+        survey_id,
+        group.get('title'),
+        group.get('description'),
+        group.get('order_index', index),
+        relevance_of(group)[0],
+        randomization_group_of(group) or None,
+    )
+
+
+def question_row(question: dict, question_id: str, group_id: str, index: int) -> tuple:
+    settings = question.get('settings') or {}
+    return (
+        question_id,
+        group_id,
+        question['code'],
+        question.get('question_text') or '',
+        question.get('help_text', settings.get('help_text')),
+        question['question_type'],
+        settings,
+        relevance_of(question)[0],
+        question.get('order_index', index),
+    )
+
+
+def subquestion_row(sub: dict, sub_id: str, question_id: str, index: int) -> tuple:
+    return (
+        sub_id,
+        question_id,
+        sub['code'],
+        sub.get('label') or sub['code'],
+        sub.get('order_index', index),
+        sub.get('relevance_logic'),
+    )
+
+
+def answer_option_row(option: dict, option_id: str, question_id: str, index: int) -> tuple:
+    return (
+        option_id,
+        question_id,
+        option['code'],
+        option.get('label') or option['code'],
+        option.get('order_index', index),
+        option.get('scale_id') or 0,
+    )
+
+
+def _copy_value(value, column: str) -> str:
+    """One field in Postgres COPY text format"""
+    if value is None:
+        return '\\N'
+    if column in JSON_COLUMNS:
+        value = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    elif isinstance(value, bool):
+        value = 't' if value else 'f'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def iter_copy_lines(table: str, rows: List[tuple]) -> Iterator[str]:
+    """COPY text-format data lines for one table (without the terminating \\.)"""
+    columns = TABLE_COLUMNS[table]
+    for row in rows:
+        yield '\t'.join(_copy_value(value, column) for value, column in zip(row, columns)) + '\n'
+
+
+def copy_statement(table: str) -> str:
+    return f"COPY {table} ({', '.join(TABLE_COLUMNS[table])}) FROM STDIN"
+
+
+def write_copy_script(f: TextIO, rows: Dict[str, List[tuple]]) -> Dict[str, int]:
+    """psql script loading every table in one transaction; returns rows per table"""
+    counts = {}
+    f.write('BEGIN;\n')
+    for table in TABLE_COLUMNS:
+        f.write(copy_statement(table) + ';\n')
+        for line in iter_copy_lines(table, rows[table]):
+            f.write(line)
+        f.write('\\.\n')
+        counts[table] = len(rows[table])
+    f.write('COMMIT;\n')
+    return counts
+
+
+class _LineReader(io.TextIOBase):
+    """File-like view of a line iterator, for psycopg2's copy_expert"""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._pending = ''
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._pending) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._pending += line
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def readline(self, size: int = -1) -> str:
+        if self._pending:
+            return self.read(self._pending.find('\n') + 1 or len(self._pending))
+        return next(self._lines, '')
+
+
+def load_postgres(conn, rows: Dict[str, List[tuple]]) -> Dict[str, int]:
+    """COPY every table over an open psycopg (3) or psycopg2 connection, in one transaction"""
+    counts = {}
+    try:
+        with conn.cursor() as cur:
+            for table in TABLE_COLUMNS:
+                lines = iter_copy_lines(table, rows[table])
+                if hasattr(cur, 'copy_expert'):
+                    cur.copy_expert(copy_statement(table), _LineReader(lines))
+                else:
+                    with cur.copy(copy_statement(table)) as copy:
+                        for line in lines:
+                            copy.write(line)
+                counts[table] = len(rows[table])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return counts
+
+
+def load_sqlite(conn: sqlite3.Connection, rows: Dict[str, List[tuple]]) -> Dict[str, int]:
+    """Load the same rows into a SQLite stand-in (tables created if missing), in one transaction"""
+    conn.executescript(SQLITE_SCHEMA)
+    conn.execute('PRAGMA foreign_keys = ON')
+    counts = {}
+    with conn:
+        for table, columns in TABLE_COLUMNS.items():
+            placeholders = ', '.join('?' for _ in columns)
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                (tuple(json.dumps(value, ensure_ascii=False) if column in JSON_COLUMNS else value
+                       for value, column in zip(row, columns))
+                 for row in rows[table]),
+            )
+            counts[table] = len(rows[table])
+    return counts
+
+
+def _connect_postgres(dsn: str):
+    try:
+        import psycopg
+        return psycopg.connect(dsn)
+    except ImportError:
+        pass
+    try:
+        import psycopg2
+        return psycopg2.connect(dsn)
+    except ImportError:
+        raise SystemExit("❌ --dsn needs psycopg or psycopg2 (pip install psycopg)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load a converted Resonant survey with COPY")
+    parser.add_argument('input', help="converted Resonant survey JSON (or an .lss export to convert first)")
+    parser.add_argument('--survey-id', help="UUID for the surveys row (default: random)")
+    parser.add_argument('--sql', help="write a psql script (BEGIN; COPY ...; COMMIT) to this file")
+    parser.add_argument('--dsn', help="load directly into this Postgres database")
+    parser.add_argument('--sqlite', help="load into this SQLite stand-in database")
+    args = parser.parse_args()
+
+    if not (args.sql or args.dsn or args.sqlite):
+        parser.error("one of --sql, --dsn or --sqlite is required")
+
+    if args.input.lower().endswith(('.lss', '.xml')):
+        from lss_to_resonant_json import parse_lss_to_json
+        survey = parse_lss_to_json(args.input)
+    else:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            survey = json.load(f)
+
+    rows = build_rows(survey, args.survey_id)
+    survey_id = rows['surveys'][0][0]
+
+    if args.sql:
+        with open(args.sql, 'w', encoding='utf-8') as f:
+            counts = write_copy_script(f, rows)
+        print(f"✅ Wrote {args.sql}")
+    if args.dsn:
+        conn = _connect_postgres(args.dsn)
+        try:
+            counts = load_postgres(conn, rows)
+        finally:
+            conn.close()
+        print(f"✅ Loaded into Postgres")
+    if args.sqlite:
+        conn = sqlite3.connect(args.sqlite)
+        try:
+            counts = load_sqlite(conn, rows)
+        finally:
+            conn.close()
+        print(f"✅ Loaded into {args.sqlite}")
+
+    print(f"Survey id: {survey_id}")
+    for table, count in counts.items():
+        print(f"  {table}: {count} rows")
+
+
+if __name__ == '__main__':
+    main()
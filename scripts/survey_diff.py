@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Differential re-import: diff a re-exported survey against its previous conversion
+Groups, questions, subquestions and answer options are matched by their codes
+(groups by title, falling back to the questions they contain), and the result
+is a minimal patch of insert / update / delete / move / reorder operations.
+The patch can be applied to the previous JSON, or to a database loaded with
+survey_db_loader, where it only writes the rows that actually changed, so
+existing rows keep their ids and the responses that reference them.
+
+Keys: repeated names get a "#n" suffix ("Q1", "Q1#2"); answer options with a
+scale_id other than 0 are keyed "code@scale".
+
+Usage:
+    python survey_diff.py previous.json new.lss -o patch.json
+    python survey_diff.py previous.json new.json -o patch.json --apply-sqlite survey.db --survey-id UUID
+"""
+
+import argparse
+import copy
+import json
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from label_sets import LABEL_SETS_KEY, expand_label_sets
+from survey_db_loader import (JSON_COLUMNS, TABLE_COLUMNS, answer_option_row, group_row, question_row,
+                              subquestion_row, survey_row)
+
+PATCH_FORMAT = 'resonant-survey-patch'
+PATCH_VERSION = 1
+
+QUESTION_LISTS = ('subquestions', 'answer_options')
+# Patch entity -> question list and database table (they share the name)
+ITEM_LISTS = {'subquestion': 'subquestions', 'answer_option': 'answer_options'}
+ITEM_TABLES = ITEM_LISTS
+
+
+def unique_keys(names: List[str]) -> List[str]:
+    """Stable keys for a list of possibly repeated names: first "Q1", then "Q1#2", ..."""
+    seen: Dict[str, int] = {}
+    keys = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        keys.append(name if seen[name] == 1 else f"{name}#{seen[name]}")
+    return keys
+
+
+def group_keys(groups: List[dict]) -> List[str]:
+    return unique_keys([group.get('title') or '' for group in groups])
+
+
+def question_keys(survey: dict) -> List[List[str]]:
+    """Question keys per group; codes are unique across the whole survey"""
+    names = [[question['code'] for question in group.get('questions', [])]
+             for group in survey.get('question_groups', [])]
+    flat = iter(unique_keys([name for group in names for name in group]))
+    return [[next(flat) for _ in group] for group in names]
+
+
+def item_keys(items: List[dict], entity: str) -> List[str]:
+    if entity == 'answer_option':
+        return unique_keys([item['code'] if not item.get('scale_id') else f"{item['code']}@{item['scale_id']}"
+                            for item in items])
+    return unique_keys([item['code'] for item in items])
+
+
+_MISSING = object()
+
+
+def _changes(old: dict, new: dict, exclude=()) -> dict:
+    """{'set': {...}, 'unset': [...]} of top-level fields, or {} when equal"""
+    changes = {}
+    updated = {key: value for key, value in new.items() if key not in exclude and old.get(key, _MISSING) != value}
+    removed = [key for key in old if key not in exclude and key not in new]
+    if updated:
+        changes['set'] = updated
+    if removed:
+        changes['unset'] = removed
+    return changes
+
+
+def _fields(item: dict, exclude=()) -> dict:
+    return {key: value for key, value in item.items() if key not in exclude}
+
+
+def _reorder(old_keys: List[str], new_keys: List[str]) -> Optional[List[str]]:
+    """New relative order of the kept keys, or None when it is unchanged"""
+    kept = set(old_keys) & set(new_keys)
+    old_order = [key for key in old_keys if key in kept]
+    new_order = [key for key in new_keys if key in kept]
+    return new_order if old_order != new_order else None
+
+
+def _match_groups(old_groups: List[dict], new_groups: List[dict]) -> Dict[int, int]:
+    """new group index -> old group index, by title first, then by shared question codes"""
+    old_index = {key: i for i, key in enumerate(group_keys(old_groups))}
+    matches = {}
+    for j, key in enumerate(group_keys(new_groups)):
+        if key in old_index:
+            matches[j] = old_index[key]
+
+    # Renamed groups: pair leftovers that share the most question codes
+    codes = lambda group: {question['code'] for question in group.get('questions', [])}
+    free_old = [i for i in range(len(old_groups)) if i not in matches.values()]
+    for j in range(len(new_groups)):
+        if j in matches or not free_old:
+            continue
+        new_codes = codes(new_groups[j])
+        best = max(free_old, key=lambda i: len(codes(old_groups[i]) & new_codes))
+        if codes(old_groups[best]) & new_codes:
+            matches[j] = best
+            free_old.remove(best)
+    return matches
+
+
+def _diff_items(ops: list, question_key: str, old_items: List[dict], new_items: List[dict], entity: str):
+    old_keys, new_keys = item_keys(old_items, entity), item_keys(new_items, entity)
+    old_by_key = dict(zip(old_keys, old_items))
+    new_set = set(new_keys)
+
+    for key in old_keys:
+        if key not in new_set:
+            ops.append({'op': 'delete', 'entity': entity, 'question': question_key, 'key': key})
+    order = _reorder(old_keys, new_keys)
+    if order is not None:
+        ops.append({'op': 'reorder', 'entity': entity, 'question': question_key, 'order': order})
+    for index, (key, item) in enumerate(zip(new_keys, new_items)):
+        if key not in old_by_key:
+            ops.append({'op': 'insert', 'entity': entity, 'question': question_key, 'key': key,
+                        'index': index, 'value': item})
+            continue
+        changes = _changes(old_by_key[key], item)
+        if changes:
+            ops.append({'op': 'update', 'entity': entity, 'question': question_key, 'key': key, **changes})
+
+
+def diff_surveys(old: dict, new: dict) -> dict:
+    """Minimal patch turning old into new; both are converted Resonant surveys
+
+    Surveys that use shared label sets are compared with the sets expanded.
+    """
+    if LABEL_SETS_KEY in old or LABEL_SETS_KEY in new:
+        old, new = expand_label_sets(copy.deepcopy(old)), expand_label_sets(copy.deepcopy(new))
+
+    ops = []
+    survey_changes = _changes(old, new, exclude=('question_groups',))
+    if survey_changes:
+        ops.append({'op': 'update', 'entity': 'survey', **survey_changes})
+
+    old_groups, new_groups = old.get('question_groups', []), new.get('question_groups', [])
+    old_gkeys = group_keys(old_groups)
+    matches = _match_groups(old_groups, new_groups)
+    matched_old = set(matches.values())
+
+    # Groups: deletes by old key, then the new sequence
+    for i, key in enumerate(old_gkeys):
+        if i not in matched_old:
+            ops.append({'op': 'delete', 'entity': 'group', 'key': key})
+    kept_new_order = [old_gkeys[matches[j]] for j in range(len(new_groups)) if j in matches]
+    kept_old_order = [key for i, key in enumerate(old_gkeys) if i in matched_old]
+    if kept_new_order != kept_old_order:
+        ops.append({'op': 'reorder', 'entity': 'group', 'order': kept_new_order})
+    for j, group in enumerate(new_groups):
+        if j not in matches:
+            ops.append({'op': 'insert', 'entity': 'group', 'index': j, 'value': _fields(group, ('questions',))})
+            continue
+        changes = _changes(old_groups[matches[j]], group, exclude=('questions',))
+        if changes:
+            ops.append({'op': 'update', 'entity': 'group', 'key': old_gkeys[matches[j]], **changes})
+
+    # Questions: matched by key across the whole survey, so moves keep their identity
+    old_qkeys, new_qkeys = question_keys(old), question_keys(new)
+    old_location = {key: (i, k) for i, keys in enumerate(old_qkeys) for k, key in enumerate(keys)}
+    new_location = {key: (j, k) for j, keys in enumerate(new_qkeys) for k, key in enumerate(keys)}
+
+    for key, (i, _) in old_location.items():
+        if key not in new_location:
+            ops.append({'op': 'delete', 'entity': 'question', 'key': key})
+
+    for j, keys in enumerate(new_qkeys):
+        # Questions that stayed in this (matched) group keep their relative order unless reordered
+        i = matches.get(j)
+        stayed_old = [key for key in old_qkeys[i] if new_location.get(key, (None,))[0] == j] if i is not None else []
+        stayed_new = [key for key in keys if key in set(stayed_old)]
+        if stayed_old != stayed_new:
+            ops.append({'op': 'reorder', 'entity': 'question', 'group': j, 'order': stayed_new})
+
+        stayed = set(stayed_old)
+        for k, key in enumerate(keys):
+            question = new_groups[j]['questions'][k]
+            if key not in old_location:
+                ops.append({'op': 'insert', 'entity': 'question', 'key': key, 'group': j, 'index': k,
+                            'value': question})
+                continue
+            oi, ok = old_location[key]
+            old_question = old_groups[oi]['questions'][ok]
+            if key not in stayed:
+                ops.append({'op': 'move', 'entity': 'question', 'key': key, 'group': j, 'index': k})
+            changes = _changes(old_question, question, exclude=QUESTION_LISTS)
+            if changes:
+                ops.append({'op': 'update', 'entity': 'question', 'key': key, **changes})
+            _diff_items(ops, key, old_question.get('subquestions') or [], question.get('subquestions') or [],
+                        'subquestion')
+            _diff_items(ops, key, old_question.get('answer_options') or [], question.get('answer_options') or [],
+                        'answer_option')
+
+    return {'format': PATCH_FORMAT, 'version': PATCH_VERSION, 'operations': ops}
+
+
+def _apply_fields(item: dict, op: dict):
+    for key in op.get('unset', []):
+        item.pop(key, None)
+    item.update(copy.deepcopy(op.get('set', {})))
+
+
+def _apply_list(items: List[dict], keys: List[str], deletes: set, order: Optional[List[str]],
+                inserts: List[Tuple[int, dict]]) -> List[dict]:
+    """Delete, reorder the kept items, then insert at final indices (ascending)"""
+    kept = [(key, item) for key, item in zip(keys, items) if key not in deletes]
+    if order is not None:
+        by_key = dict(kept)
+        kept = [(key, by_key[key]) for key in order]
+    result = [item for _, item in kept]
+    for index, item in sorted(inserts, key=lambda insert: insert[0]):
+        result.insert(index, item)
+    return result
+
+
+def apply_patch(old: dict, patch: dict) -> dict:
+    """Apply a diff_surveys patch to the previous JSON; returns the new survey (label sets expanded)"""
+    survey = copy.deepcopy(old)
+    if LABEL_SETS_KEY in survey:
+        expand_label_sets(survey)
+    ops: Dict[Tuple[str, str], List[dict]] = {}
+    for op in patch['operations']:
+        ops.setdefault((op['entity'], op['op']), []).append(op)
+
+    old_groups = survey.pop('question_groups', [])
+    for op in ops.get(('survey', 'update'), []):
+        _apply_fields(survey, op)
+
+    # Index everything by key before the lists are rebuilt, so moves can find their question
+    old_gkeys = group_keys(old_groups)
+    group_by_key = dict(zip(old_gkeys, old_groups))
+    group_question_keys = dict(zip(old_gkeys, question_keys({'question_groups': old_groups})))
+    questions = {key: question for gkey, group in group_by_key.items()
+                 for key, question in zip(group_question_keys[gkey], group.get('questions', []))}
+
+    # Sources are keyed by the old titles, so resolve them before any group is renamed
+    sources = new_group_sources({'question_groups': old_groups}, patch)
+    for op in ops.get(('group', 'update'), []):
+        group = group_by_key[op['key']]
+        group_questions = group.pop('questions', [])
+        _apply_fields(group, op)
+        group['questions'] = group_questions
+
+    inserted_groups = {op['index']: op['value'] for op in ops.get(('group', 'insert'), [])}
+    removed = {op['key'] for op in ops.get(('question', 'delete'), []) + ops.get(('question', 'move'), [])}
+    new_groups = []
+    for j, source in enumerate(sources):
+        if source is None:
+            group, keys = {**copy.deepcopy(inserted_groups[j]), 'questions': []}, []
+        else:
+            group, keys = group_by_key[source], group_question_keys[source]
+        order = next((op['order'] for op in ops.get(('question', 'reorder'), []) if op['group'] == j), None)
+        inserts = [(op['index'], copy.deepcopy(op['value']) if op['op'] == 'insert' else questions[op['key']])
+                   for op in ops.get(('question', 'insert'), []) + ops.get(('question', 'move'), [])
+                   if op['group'] == j]
+        group['questions'] = _apply_list([questions[key] for key in keys], keys, removed, order, inserts)
+        new_groups.append(group)
+
+    for op in ops.get(('question', 'update'), []):
+        question = questions[op['key']]
+        lists = {name: question.pop(name) for name in QUESTION_LISTS if name in question}
+        _apply_fields(question, op)
+        question.update(lists)
+
+    for entity, list_name in ITEM_LISTS.items():
+        touched = {op['question'] for (op_entity, _), entity_ops in ops.items() if op_entity == entity
+                   for op in entity_ops}
+        for question_key in touched:
+            question_ops = lambda name: [op for op in ops.get((entity, name), []) if op['question'] == question_key]
+            question = questions[question_key]
+            items = question.get(list_name) or []
+            keys = item_keys(items, entity)
+            by_key = dict(zip(keys, items))
+            for op in question_ops('update'):
+                _apply_fields(by_key[op['key']], op)
+            order = next((op['order'] for op in question_ops('reorder')), None)
+            question[list_name] = _apply_list(items, keys, {op['key'] for op in question_ops('delete')}, order,
+                                              [(op['index'], copy.deepcopy(op['value']))
+                                               for op in question_ops('insert')])
+
+    survey['question_groups'] = new_groups
+    return survey
+
+
+def patch_summary(patch: dict) -> Dict[str, Dict[str, int]]:
+    """Operation counts per entity, e.g. {'question': {'update': 3, 'move': 1}}"""
+    summary: Dict[str, Dict[str, int]] = {}
+    for op in patch['operations']:
+        counts = summary.setdefault(op['entity'], {})
+        counts[op['op']] = counts.get(op['op'], 0) + 1
+    return summary
+
+
+class _ExistingIds:
+    """Ids of one survey's rows in the database, under the same keys the patch uses"""
+
+    def __init__(self, cur, survey_id: str, placeholder: str):
+        cur.execute(f"SELECT id, title FROM question_groups WHERE survey_id = {placeholder} "
+                    f"ORDER BY order_index, id", (survey_id,))
+        groups = cur.fetchall()
+        self.groups = dict(zip(unique_keys([title or '' for _, title in groups]), [gid for gid, _ in groups]))
+
+        codes, ids = [], []
+        for group_id, _ in groups:
+            cur.execute(f"SELECT id, code FROM questions WHERE group_id = {placeholder} ORDER BY order_index, id",
+                        (group_id,))
+            for question_id, code in cur.fetchall():
+                codes.append(code)
+                ids.append(question_id)
+        self.questions = dict(zip(unique_keys(codes), ids))
+
+        self.items: Dict[Tuple[str, str, str], str] = {}
+        for question_key, question_id in self.questions.items():
+            cur.execute(f"SELECT id, code FROM subquestions WHERE question_id = {placeholder} "
+                        f"ORDER BY order_index, id", (question_id,))
+            rows = cur.fetchall()
+            for key, (sub_id, _) in zip(item_keys([{'code': code} for _, code in rows], 'subquestion'), rows):
+                self.items[('subquestion', question_key, key)] = sub_id
+            cur.execute(f"SELECT id, code, scale_id FROM answer_options WHERE question_id = {placeholder} "
+                        f"ORDER BY order_index, id", (question_id,))
+            rows = cur.fetchall()
+            options = [{'code': code, 'scale_id': scale_id} for _, code, scale_id in rows]
+            for key, (option_id, _, _) in zip(item_keys(options, 'answer_option'), rows):
+                self.items[('answer_option', question_key, key)] = option_id
+
+
+def _locate_questions(survey: dict) -> Dict[str, Tuple[int, int, dict]]:
+    """question key -> (group index, index in group, question)"""
+    groups = survey.get('question_groups', [])
+    return {key: (j, k, groups[j]['questions'][k])
+            for j, keys in enumerate(question_keys(survey)) for k, key in enumerate(keys)}
+
+
+def new_group_sources(old: dict, patch: dict) -> List[Optional[str]]:
+    """For each group of the patched survey, the key of the old group it continues (None if inserted)"""
+    group_ops = [op for op in patch['operations'] if op['entity'] == 'group']
+    deleted = {op['key'] for op in group_ops if op['op'] == 'delete'}
+    inserted = {op['index'] for op in group_ops if op['op'] == 'insert'}
+    kept = [key for key in group_keys(old.get('question_groups', [])) if key not in deleted]
+    order = iter(next((op['order'] for op in group_ops if op['op'] == 'reorder'), kept))
+    return [None if j in inserted else next(order) for j in range(len(kept) + len(inserted))]
+
+
+def apply_patch_to_db(conn, survey_id: str, old: dict, patch: dict, placeholder: str = '?') -> Dict[str, int]:
+    """Write only the rows a patch changes, in one transaction; returns rows written per table
+
+    Existing rows are found by the patch keys and keep their ids; an UPDATE sets
+    only the columns whose value differs. Use placeholder='%s' for psycopg.
+    """
+    if LABEL_SETS_KEY in old:
+        old = expand_label_sets(copy.deepcopy(old))
+    new = apply_patch(old, patch)
+    written = {table: 0 for table in TABLE_COLUMNS}
+    cur = conn.cursor()
+    ids = _ExistingIds(cur, survey_id, placeholder)
+
+    def execute(table: str, sql: str, params: tuple):
+        cur.execute(sql, params)
+        written[table] += 1
+
+    def db_values(table: str, values) -> tuple:
+        return tuple(json.dumps(value, ensure_ascii=False) if column in JSON_COLUMNS and value is not None else value
+                     for column, value in values)
+
+    def insert(table: str, row: tuple):
+        columns = TABLE_COLUMNS[table]
+        execute(table, f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join([placeholder] * len(columns))})",
+                db_values(table, zip(columns, row)))
+
+    def update(table: str, old_row: tuple, new_row: tuple):
+        changed = [(column, value) for column, before, value in zip(TABLE_COLUMNS[table], old_row, new_row)
+                   if before != value]
+        if changed:
+            assignments = ', '.join(f"{column} = {placeholder}" for column, _ in changed)
+            execute(table, f"UPDATE {table} SET {assignments} WHERE id = {placeholder}",
+                    db_values(table, changed) + (new_row[0],))
+
+    def delete(table: str, row_id: str):
+        execute(table, f"DELETE FROM {table} WHERE id = {placeholder}", (row_id,))
+
+    def insert_question(question: dict, question_id: str, group_id: str, index: int):
+        insert('questions', question_row(question, question_id, group_id, index))
+        for sub_index, sub in enumerate(question.get('subquestions') or []):
+            insert('subquestions', subquestion_row(sub, str(uuid.uuid4()), question_id, sub_index))
+        for option_index, option in enumerate(question.get('answer_options') or []):
+            insert('answer_options', answer_option_row(option, str(uuid.uuid4()), question_id, option_index))
+
+    old_groups, new_groups = old.get('question_groups', []), new['question_groups']
+    old_group_index = {key: i for i, key in enumerate(group_keys(old_groups))}
+    old_questions, new_questions = _locate_questions(old), _locate_questions(new)
+    operations = patch['operations']
+
+    try:
+        update('surveys', survey_row(old, survey_id), survey_row(new, survey_id))
+
+        # Groups: inserts and updates first so questions can move into them, deletes last
+        group_ids = []
+        for j, (source, group) in enumerate(zip(new_group_sources(old, patch), new_groups)):
+            if source is None:
+                group_ids.append(str(uuid.uuid4()))
+                insert('question_groups', group_row(group, group_ids[-1], survey_id, j))
+                continue
+            group_ids.append(ids.groups[source])
+            i = old_group_index[source]
+            update('question_groups', group_row(old_groups[i], group_ids[-1], survey_id, i),
+                   group_row(group, group_ids[-1], survey_id, j))
+
+        old_group_ids = {old_group_index[key]: group_id for key, group_id in ids.groups.items()}
+        changed_questions = {op['key'] for op in operations
+                             if op['entity'] == 'question' and op['op'] not in ('delete', 'reorder')}
+        changed_questions |= {op['question'] for op in operations if op['entity'] in ITEM_LISTS}
+        # Reorders, and inserts / deletes ahead of a question, shift its position without naming it;
+        # rows without an explicit order_index store that position
+        changed_questions |= {key for key, (j, k, _) in new_questions.items() if key in old_questions
+                              and (group_ids[j], k) != (old_group_ids[old_questions[key][0]], old_questions[key][1])}
+        for op in operations:
+            if op['entity'] == 'question' and op['op'] == 'delete':
+                delete('questions', ids.questions[op['key']])
+
+        for key in sorted(changed_questions, key=lambda key: new_questions[key][:2]):
+            j, k, question = new_questions[key]
+            if key not in old_questions:
+                insert_question(question, str(uuid.uuid4()), group_ids[j], k)
+                continue
+            question_id = ids.questions[key]
+            i, old_k, old_question = old_questions[key]
+            update('questions', question_row(old_question, question_id, old_group_ids[i], old_k),
+                   question_row(question, question_id, group_ids[j], k))
+
+            for entity, list_name in ITEM_LISTS.items():
+                make_row = subquestion_row if entity == 'subquestion' else answer_option_row
+                old_items, new_items = old_question.get(list_name) or [], question.get(list_name) or []
+                old_keys, new_keys = item_keys(old_items, entity), item_keys(new_items, entity)
+                old_by_key = {item_key: (index, item) for index, (item_key, item)
+                              in enumerate(zip(old_keys, old_items))}
+                for item_key in set(old_keys) - set(new_keys):
+                    delete(ITEM_TABLES[entity], ids.items[(entity, key, item_key)])
+                for index, (item_key, item) in enumerate(zip(new_keys, new_items)):
+                    if item_key not in old_by_key:
+                        insert(ITEM_TABLES[entity], make_row(item, str(uuid.uuid4()), question_id, index))
+                        continue
+                    item_id = ids.items[(entity, key, item_key)]
+                    old_index, old_item = old_by_key[item_key]
+                    update(ITEM_TABLES[entity], make_row(old_item, item_id, question_id, old_index),
+                           make_row(item, item_id, question_id, index))
+
+        for op in operations:
+            if op['entity'] == 'group' and op['op'] == 'delete':
+                delete('question_groups', ids.groups[op['key']])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff a re-exported survey against its previous conversion")
+    parser.add_argument('previous', help="previously converted Resonant survey JSON")
+    parser.add_argument('new', help="new .lss export or converted JSON")
+    parser.add_argument('-o', '--output', help="write the patch JSON here")
+    parser.add_argument('--apply-sqlite', help="apply the patch to this SQLite database (see survey_db_loader.py)")
+    parser.add_argument('--survey-id', help="surveys.id of the previous import, for --apply-sqlite")
+    args = parser.parse_args()
+
+    with open(args.previous, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    if args.new.lower().endswith(('.lss', '.xml')):
+        from lss_to_resonant_json import parse_lss_to_json
+        new = parse_lss_to_json(args.new)
+    else:
+        with open(args.new, 'r', encoding='utf-8') as f:
+            new = json.load(f)
+
+    start = time.perf_counter()
+    patch = diff_surveys(previous, new)
+    print(f"Diffed in {(time.perf_counter() - start) * 1000:.1f} ms: {len(patch['operations'])} operations")
+    for entity, counts in patch_summary(patch).items():
+        print(f"   {entity}: " + ", ".join(f"{count} {op}" for op, count in sorted(counts.items())))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(patch, f, indent=2, ensure_ascii=False)
+        print(f"✅ Created {args.output}")
+
+    if args.apply_sqlite:
+        if not args.survey_id:
+            parser.error("--apply-sqlite needs --survey-id")
+        import sqlite3
+        conn = sqlite3.connect(args.apply_sqlite)
+        conn.execute('PRAGMA foreign_keys = ON')
+        start = time.perf_counter()
+        try:
+            touched = apply_patch_to_db(conn, args.survey_id, previous, patch)
+        finally:
+            conn.close()
+        print(f"✅ Applied in {(time.perf_counter() - start) * 1000:.1f} ms, rows written: "
+              + ", ".join(f"{table} {count}" for table, count in touched.items() if count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo survey-flow simulator for launch capacity planning
+Runs synthetic respondents through a converted Resonant survey and reports how
+many pages they see, how many response_data rows a finished response holds and
+how many requests / row writes the web client sends while they take it, plus
+the expected database write rate for a launch of N participants.
+
+Flow (LimeSurvey semantics, read from the converted JSON of any converter dialect):
+    - groups and questions sharing a randomization_group swap places randomly
+    - group and question relevance are evaluated as the respondent gets there
+    - array_filter / array_filter_exclude hide subquestions not ticked in the source
+    - mandatory questions are always answered, optional ones may be skipped
+    - random_order shuffles the order subquestions are answered in
+
+Writes follow SurveyRenderer.full.tsx: each answer key is saved through
+/api/survey/response after 500 ms without input (one request and one
+response_data upsert per key in the batch); every page after the first and
+every 60 s with unsaved changes triggers /api/survey/[id]/autosave, which
+updates survey_responses and upserts every answer so far; finishing posts
+/api/survey/response/[id]/complete.
+
+Respondents are seeded individually (seed, index), so results do not depend on
+how they are split across worker processes.
+
+Usage:
+    python survey_flow_sim.py survey.json -n 20000 --participants 5000 --arrival-window 1800 -o flow_report.json
+"""
+
+import argparse
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from bulk_relevance import SELECTED
+from expression_compiler import ExpressionCompiler, ExpressionEvaluator, Node
+from label_sets import LABEL_SETS_KEY, question_items
+from survey_model import randomization_group_of, relevance_node
+
+REPORT_FORMAT = 'resonant-flow-simulation'
+
+# Client timings from SurveyRenderer.full.tsx
+DEBOUNCE_SECONDS = 0.5
+AUTOSAVE_INTERVAL = 60.0
+
+ENDPOINTS = ('response', 'autosave', 'complete')
+
+# Types the renderer shows but never stores an answer for
+NO_ANSWER_TYPES = {'text_display', 'equation'}
+
+# Types whose subquestions are stored as separate Q_SQ keys
+SUBQUESTION_KEY_TYPES = {
+    'array', 'array_numbers', 'array_texts', 'array_dual_scale', 'array_10_point',
+    'array_yes_no_uncertain', 'array_increase_same_decrease', 'array_5_point', 'array_column',
+    'multiple_numerical', 'multiple_short_text',
+}
+
+# Types stored as one key holding a list of choices
+MULTI_CHOICE_TYPES = {'multiple_choice_multiple', 'button_multi_select', 'image_multi_select'}
+
+METRICS = ('pages', 'questions_shown', 'response_data_rows', 'response_saves', 'autosaves',
+           'requests', 'row_writes', 'seconds')
+
+
+@dataclass(slots=True)
+class Behaviour:
+    """How synthetic respondents answer; times are medians of lognormal draws"""
+    skip_probability: float = 0.1
+    other_probability: float = 0.05
+    page_seconds: float = 4.0
+    item_seconds: float = 3.0
+    sigma: float = 0.6
+    speed_sigma: float = 0.4
+
+
+@dataclass(slots=True)
+class QuestionFlow:
+    code: str
+    question_type: str
+    relevance: Optional[Node]
+    mandatory: bool
+    random_order: bool
+    other: bool
+    randomization_group: str
+    subquestions: List[str]
+    answers: List[str]
+    array_filter: List[str]
+    array_filter_exclude: List[str]
+
+
+@dataclass(slots=True)
+class GroupFlow:
+    relevance: Optional[Node]
+    randomization_group: str
+    questions: List[QuestionFlow] = field(default_factory=list)
+
+
+def _sources(value: Optional[str]) -> List[str]:
+    return [source.strip() for source in (value or '').split(';') if source.strip()]
+
+
+def _flag(value) -> bool:
+    return value not in (None, '', '0', 0, False, 'N')
+
+
+def plan_flow(survey: dict, compiler: Optional[ExpressionCompiler] = None) -> List[GroupFlow]:
+    """Compile a converted survey into the structures respondents walk through"""
+    compiler = compiler or ExpressionCompiler()
+    label_sets = survey.get(LABEL_SETS_KEY)
+    flow = []
+    for group in sorted(survey.get('question_groups', []), key=lambda g: g.get('order_index', 0)):
+        group_flow = GroupFlow(relevance_node(group, compiler), randomization_group_of(group))
+        for question in sorted(group.get('questions', []), key=lambda q: q.get('order_index', 0)):
+            settings = question.get('settings') or {}
+            answers = [item['code'] for item in question_items(question, 'answer_options', label_sets)
+                       if not item.get('scale_id')]
+            group_flow.questions.append(QuestionFlow(
+                code=question['code'],
+                question_type=question.get('question_type', 'text'),
+                relevance=relevance_node(question, compiler),
+                mandatory=_flag(settings.get('mandatory')),
+                random_order=_flag(settings.get('random_order')),
+                other=_flag(settings.get('other', settings.get('other_option'))),
+                randomization_group=randomization_group_of(question),
+                subquestions=[item['code'] for item in question_items(question, 'subquestions', label_sets)],
+                answers=answers,
+                array_filter=_sources(settings.get('array_filter')),
+                array_filter_exclude=_sources(settings.get('array_filter_exclude')),
+            ))
+        flow.append(group_flow)
+    return flow
+
+
+def shuffle_slots(items: list, rng: random.Random) -> list:
+    """Shuffle items sharing a non-empty randomization_group among the positions they hold"""
+    slots: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        if item.randomization_group:
+            slots.setdefault(item.randomization_group, []).append(index)
+    if not slots:
+        return items
+    order = list(items)
+    for positions in slots.values():
+        members = [items[index] for index in positions]
+        rng.shuffle(members)
+        for index, member in zip(positions, members):
+            order[index] = member
+    return order
+
+
+class _Respondent:
+    """Clock, client-side save state and write log of one simulated respondent"""
+
+    def __init__(self, behaviour: Behaviour, rng: random.Random, evaluator: ExpressionEvaluator,
+                 record_payloads: bool = False):
+        self.behaviour = behaviour
+        self.rng = rng
+        self.evaluator = evaluator
+        self.speed = rng.lognormvariate(0.0, behaviour.speed_sigma)
+        self.clock = 0.0
+        self.stored: Dict[str, object] = {}
+        self.pending: Dict[str, tuple] = {}
+        self.page = 0
+        self.last_input = 0.0
+        self.dirty = False
+        self.next_tick = AUTOSAVE_INTERVAL
+        # (seconds, endpoint, rows, payload); payload is the request body when recording
+        self.writes: List[tuple] = []
+        self.record_payloads = record_payloads
+        self.counts = dict.fromkeys(METRICS, 0)
+
+    def think(self, median: float):
+        self.advance(self.clock + median * self.speed * self.rng.lognormvariate(0.0, self.behaviour.sigma))
+
+    def advance(self, until: float):
+        """Move the clock, firing the debounced save and interval autosaves that fall due"""
+        while True:
+            flush_at = self.last_input + DEBOUNCE_SECONDS if self.pending else None
+            if flush_at is not None and flush_at <= until and flush_at <= self.next_tick:
+                self.flush(flush_at)
+            elif self.next_tick <= until:
+                if self.dirty:
+                    self.autosave(self.next_tick)
+                self.next_tick += AUTOSAVE_INTERVAL
+            else:
+                break
+        self.clock = until
+
+    def flush(self, at: float):
+        for key, (question_code, subquestion_code) in self.pending.items():
+            payload = None
+            if self.record_payloads:
+                payload = {'question_code': question_code, 'subquestion_code': subquestion_code,
+                           'value': self.stored[key]}
+            self.writes.append((at, 'response', 1, payload))
+        self.counts['response_saves'] += len(self.pending)
+        self.pending.clear()
+
+    def autosave(self, at: float):
+        # survey_responses metadata update plus one upsert per answer so far
+        payload = {'answers': dict(self.stored), 'current_group_index': self.page} if self.record_payloads else None
+        self.writes.append((at, 'autosave', 1 + len(self.stored), payload))
+        self.counts['autosaves'] += 1
+        self.dirty = False
+
+    def answer(self, question_code: str, value, variables: Dict[str, object], subquestion_code: Optional[str] = None):
+        """One input event: store under the renderer's key, expose LimeSurvey variables to relevance"""
+        self.think(self.behaviour.item_seconds)
+        key = f"{question_code}_{subquestion_code}" if subquestion_code else question_code
+        self.stored[key] = value
+        self.pending[key] = (question_code, subquestion_code)
+        self.last_input = self.clock
+        self.dirty = True
+        self.evaluator.update(variables)
+
+    def navigate(self, page: int):
+        self.think(self.behaviour.page_seconds)
+        self.page = page
+        if page > 0:
+            self.autosave(self.clock)
+        self.counts['pages'] += 1
+
+    def complete(self):
+        self.think(self.behaviour.page_seconds)
+        if self.pending:
+            self.advance(max(self.clock, self.last_input + DEBOUNCE_SECONDS))
+        self.writes.append((self.clock, 'complete', 1, None))
+
+    def result(self) -> dict:
+        counts = self.counts
+        counts['response_data_rows'] = len(self.stored)
+        counts['requests'] = len(self.writes)
+        counts['row_writes'] = sum(write[2] for write in self.writes)
+        counts['seconds'] = self.clock
+        return counts
+
+
+def _answer_value(question: QuestionFlow, rng: random.Random):
+    if question.answers:
+        return rng.choice(question.answers)
+    if question.question_type == 'yes_no':
+        return rng.choice(('Y', 'N'))
+    if question.question_type in ('multiple_choice_single', 'dropdown', 'array', 'array_5_point'):
+        return str(rng.randint(1, 5))
+    if question.question_type == 'date':
+        return '2026-01-01'
+    return 'text'
+
+
+def _answer_question(respondent: _Respondent, question: QuestionFlow, shown: List[str]):
+    rng = respondent.rng
+    behaviour = respondent.behaviour
+    code = question.code
+    if question.question_type in MULTI_CHOICE_TYPES:
+        choices = shown + (['other'] if question.other and rng.random() < behaviour.other_probability else [])
+        if not choices:
+            return
+        ticked = [choice for choice in choices if rng.random() < 0.5] or [rng.choice(choices)]
+        selected = []
+        for choice in ticked:
+            selected.append(choice)
+            # Every tick re-sends the whole list under the question's own key
+            respondent.answer(code, list(selected), {f"{code}_{choice}": SELECTED if choice != 'other' else 'text'})
+            if choice == 'other':
+                respondent.answer(f"{code}_other", 'text', {})
+    elif question.question_type in SUBQUESTION_KEY_TYPES and shown:
+        for sub in shown:
+            if question.mandatory or rng.random() >= behaviour.skip_probability:
+                value = _answer_value(question, rng)
+                respondent.answer(code, value, {f"{code}_{sub}": value}, sub)
+    elif question.question_type == 'ranking':
+        ranked = list(question.answers)
+        rng.shuffle(ranked)
+        for rank in range(1, len(ranked) + 1):
+            respondent.answer(code, ranked[:rank], {f"{code}_{rank}": ranked[rank - 1]})
+    else:
+        value = _answer_value(question, rng)
+        if question.other and rng.random() < behaviour.other_probability:
+            value = 'other'
+        respondent.answer(code, value, {code: value})
+        if value == 'other':
+            respondent.answer(f"{code}_other", 'text', {f"{code}_other": 'text'})
+
+
+def simulate_respondent(flow: List[GroupFlow], behaviour: Behaviour, rng: random.Random,
+                        evaluator: ExpressionEvaluator, record_payloads: bool = False) -> _Respondent:
+    """Walk one respondent through the survey; returns it with its counts and write log
+
+    With record_payloads, each write also carries the JSON body the client
+    would post (survey_load_test.py replays these).
+    """
+    respondent = _Respondent(behaviour, rng, evaluator, record_payloads)
+    page = 0
+    for group in shuffle_slots(flow, rng):
+        if group.relevance is not None and not evaluator.is_true(group.relevance):
+            continue
+        respondent.navigate(page)
+        page += 1
+        for question in shuffle_slots(group.questions, rng):
+            if question.relevance is not None and not evaluator.is_true(question.relevance):
+                continue
+            respondent.counts['questions_shown'] += 1
+            if question.question_type in NO_ANSWER_TYPES:
+                continue
+            shown = [sub for sub in question.subquestions
+                     if all(evaluator.lookup(f"{source}_{sub}") == SELECTED for source in question.array_filter)
+                     and not any(evaluator.lookup(f"{source}_{sub}") == SELECTED
+                                 for source in question.array_filter_exclude)]
+            if question.random_order:
+                rng.shuffle(shown)
+            if question.question_type not in SUBQUESTION_KEY_TYPES and not question.mandatory \
+                    and rng.random() < behaviour.skip_probability:
+                continue
+            _answer_question(respondent, question, shown)
+    respondent.complete()
+    return respondent
+
+
+# Per-process state, set once by _init_worker so the survey is compiled once per worker
+_worker = {}
+
+
+def _init_worker(survey: dict, behaviour: Behaviour):
+    compiler = ExpressionCompiler()
+    _worker['flow'] = plan_flow(survey, compiler)
+    _worker['nodes'] = compiler.nodes
+    _worker['behaviour'] = behaviour
+
+
+def _run_chunk(seed: int, start: int, count: int) -> dict:
+    """Simulate respondents start..start+count; returns their metrics and per-second write histograms"""
+    metrics = {name: [] for name in METRICS}
+    times = {endpoint: [] for endpoint in ENDPOINTS}
+    rows = {endpoint: [] for endpoint in ENDPOINTS}
+    for index in range(start, start + count):
+        rng = random.Random(f"{seed}:{index}")
+        evaluator = ExpressionEvaluator(nodes=_worker['nodes'])
+        respondent = simulate_respondent(_worker['flow'], _worker['behaviour'], rng, evaluator)
+        for name, value in respondent.result().items():
+            metrics[name].append(value)
+        for at, endpoint, n_rows, _ in respondent.writes:
+            times[endpoint].append(at)
+            rows[endpoint].append(n_rows)
+
+    histograms = {}
+    for endpoint in ENDPOINTS:
+        seconds = np.floor(np.asarray(times[endpoint], dtype=np.float64)).astype(np.intp)
+        histograms[endpoint] = {
+            'requests': np.bincount(seconds),
+            'rows': np.bincount(seconds, weights=np.asarray(rows[endpoint], dtype=np.float64)),
+        }
+    return {'metrics': metrics, 'histograms': histograms}
+
+
+def _add(total: Optional[np.ndarray], part: np.ndarray) -> np.ndarray:
+    if total is None:
+        return part.astype(np.float64)
+    if len(part) > len(total):
+        total, part = part.astype(np.float64), total
+    total[:len(part)] += part
+    return total
+
+
+def simulate(survey: dict, respondents: int, behaviour: Behaviour, seed: int = 0,
+             workers: Optional[int] = None, chunk_size: int = 500) -> dict:
+    """Run respondents across worker processes; metrics per respondent and summed write histograms"""
+    chunks = [(seed, start, min(chunk_size, respondents - start)) for start in range(0, respondents, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(survey, behaviour)
+        results = [_run_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(survey, behaviour)) as pool:
+            results = list(pool.map(_run_chunk, *zip(*chunks)))
+
+    metrics = {name: np.concatenate([np.asarray(r['metrics'][name], dtype=np.float64) for r in results])
+               for name in METRICS}
+    histograms = {endpoint: {kind: None for kind in ('requests', 'rows')} for endpoint in ENDPOINTS}
+    for result in results:
+        for endpoint, parts in result['histograms'].items():
+            for kind, part in parts.items():
+                histograms[endpoint][kind] = _add(histograms[endpoint][kind], part)
+    return {'respondents': respondents, 'metrics': metrics, 'histograms': histograms}
+
+
+def distribution(values: np.ndarray) -> dict:
+    percentiles = np.percentile(values, [5, 50, 95, 99]) if len(values) else [0.0] * 4
+    return {
+        'mean': round(float(values.mean()), 3) if len(values) else 0.0,
+        'p5': round(float(percentiles[0]), 3),
+        'p50': round(float(percentiles[1]), 3),
+        'p95': round(float(percentiles[2]), 3),
+        'p99': round(float(percentiles[3]), 3),
+        'max': round(float(values.max()), 3) if len(values) else 0.0,
+    }
+
+
+def launch_load(histograms: dict, respondents: int, participants: int, arrival_window: float) -> dict:
+    """Expected requests and row writes per second when participants start uniformly over arrival_window
+
+    The mean per-respondent write profile (per second since starting) is
+    convolved with the arrival rate, participants / arrival_window.
+    """
+    window = max(1, int(round(arrival_window)))
+    arrivals = np.full(window, participants / window)
+    load = {'participants': participants, 'arrival_window_seconds': window, 'endpoints': {}}
+    totals = {}
+    for endpoint, parts in histograms.items():
+        entry = {}
+        for kind, histogram in parts.items():
+            profile = histogram / respondents if histogram is not None else np.zeros(1)
+            rate = np.convolve(profile, arrivals)
+            totals[kind] = _add(totals.get(kind), rate)
+            entry[f'peak_{kind}_per_second'] = round(float(rate.max()), 2)
+            entry[f'total_{kind}'] = round(float(rate.sum()), 1)
+        load['endpoints'][endpoint] = entry
+    for kind, rate in totals.items():
+        load[f'peak_{kind}_per_second'] = round(float(rate.max()), 2)
+        load[f'peak_{kind}_at_second'] = int(rate.argmax())
+        load[f'total_{kind}'] = round(float(rate.sum()), 1)
+    load['duration_seconds'] = len(totals['requests'])
+    return load
+
+
+def build_report(simulation: dict, behaviour: Behaviour, seed: int, participants: int,
+                 arrival_window: float) -> dict:
+    return {
+        'format': REPORT_FORMAT,
+        'respondents': simulation['respondents'],
+        'seed': seed,
+        'behaviour': asdict(behaviour),
+        'distributions': {name: distribution(values) for name, values in simulation['metrics'].items()},
+        'launch': launch_load(simulation['histograms'], simulation['respondents'], participants, arrival_window),
+    }
+
+
+def main():
+    defaults = Behaviour()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('survey', help="converted Resonant survey JSON")
+    parser.add_argument('-n', '--respondents', type=int, default=10000, help="synthetic respondents to simulate")
+    parser.add_argument('--participants', type=int, default=5000, help="launch size for the write-rate estimate")
+    parser.add_argument('--arrival-window', type=float, default=1800,
+                        help="seconds over which participants start (uniformly)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=500, help="respondents per worker task")
+    parser.add_argument('--skip-probability', type=float, default=defaults.skip_probability,
+                        help="chance an optional question (or array row) is left unanswered")
+    parser.add_argument('--other-probability', type=float, default=defaults.other_probability)
+    parser.add_argument('--page-seconds', type=float, default=defaults.page_seconds,
+                        help="median time spent on a page besides answering")
+    parser.add_argument('--item-seconds', type=float, default=defaults.item_seconds,
+                        help="median time per answer input")
+    parser.add_argument('-o', '--output', help="write the JSON report here")
+    args = parser.parse_args()
+
+    with open(args.survey, 'r', encoding='utf-8') as f:
+        survey = json.load(f)
+    behaviour = Behaviour(args.skip_probability, args.other_probability, args.page_seconds, args.item_seconds)
+
+    print(f"Simulating {args.respondents} respondents...")
+    simulation = simulate(survey, args.respondents, behaviour, args.seed, args.workers, args.chunk_size)
+    report = build_report(simulation, behaviour, args.seed, args.participants, args.arrival_window)
+
+    for name, values in report['distributions'].items():
+        print(f"   {name:<20} mean {values['mean']:>10,.1f}  p50 {values['p50']:>10,.1f}  "
+              f"p95 {values['p95']:>10,.1f}  max {values['max']:>10,.1f}")
+    launch = report['launch']
+    print(f"✅ {launch['participants']} participants over {launch['arrival_window_seconds']}s: "
+          f"peak {launch['peak_requests_per_second']:,.1f} requests/s, "
+          f"{launch['peak_rows_per_second']:,.1f} row writes/s")
+    for endpoint, entry in launch['endpoints'].items():
+        print(f"   {endpoint:<10} peak {entry['peak_requests_per_second']:>8,.1f} requests/s  "
+              f"{entry['peak_rows_per_second']:>10,.1f} rows/s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Created {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Per-language text shards for converted Resonant surveys
+The converted survey JSON holds the structure once, with base-language text.
+Every language of the export also gets a small shard with only its text, and
+a manifest lists the shards, so a runtime fetches just the participant's
+language instead of one document carrying every translation.
+
+Shard layout (groups by position, questions by code, lists by position):
+    {"language": "de",
+     "groups": [{"title": ...}, ...],
+     "questions": {"Q1": {"question_text": ..., "help_text": ...,
+                          "subquestions": [label, ...], "answer_options": [label, ...]}}}
+
+Usage:
+    python lss_to_resonant_json.py survey.lss survey.json --l10n-dir l10n/
+    python survey_l10n.py survey.json l10n/manifest.json --language de -o survey.de.json
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+from typing import Dict, Iterable
+
+from label_sets import LABEL_SETS_KEY, expand_label_sets
+
+MANIFEST_FORMAT = 'resonant-survey-l10n'
+MANIFEST_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+def _help_text(question: dict) -> str:
+    return question.get('help_text', (question.get('settings') or {}).get('help_text', ''))
+
+
+def translation_shard(groups: Iterable[dict], language: str) -> dict:
+    """Text of one language, read from converted groups (consumed one at a time)"""
+    shard = {'language': language, 'groups': [], 'questions': {}}
+    for group in groups:
+        shard['groups'].append({'title': group.get('title')})
+        for question in group.get('questions', []):
+            shard['questions'][question['code']] = {
+                'question_text': question.get('question_text'),
+                'help_text': _help_text(question),
+                'subquestions': [sub.get('label') for sub in question.get('subquestions') or []],
+                'answer_options': [option.get('label') for option in question.get('answer_options') or []],
+            }
+    return shard
+
+
+def localize(survey: dict, shard: dict) -> dict:
+    """Copy of a converted survey with the text of a shard applied
+
+    Text missing from the shard (or lists whose length no longer matches)
+    keeps the base-language text.
+    """
+    survey = copy.deepcopy(survey)
+    if LABEL_SETS_KEY in survey:
+        expand_label_sets(survey)
+    for group, text in zip(survey.get('question_groups', []), shard['groups']):
+        if text.get('title') is not None:
+            group['title'] = text['title']
+    for group in survey.get('question_groups', []):
+        for question in group.get('questions', []):
+            text = shard['questions'].get(question['code'])
+            if text is None:
+                continue
+            question['question_text'] = text['question_text']
+            if 'help_text' in question:
+                question['help_text'] = text['help_text']
+            elif 'help_text' in (question.get('settings') or {}):
+                question['settings']['help_text'] = text['help_text']
+            for kind in ('subquestions', 'answer_options'):
+                items = question.get(kind) or []
+                if len(items) == len(text[kind]):
+                    for item, label in zip(items, text[kind]):
+                        item['label'] = label
+    return survey
+
+
+def write_shards(out_dir: str, shards: Iterable[dict], base_language: str, structure: str) -> dict:
+    """Write <language>.json shards and manifest.json into out_dir; returns the manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    languages: Dict[str, dict] = {}
+    for shard in shards:
+        data = json.dumps(shard, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        path = f"{shard['language'] or 'default'}.json"
+        with open(os.path.join(out_dir, path), 'wb') as f:
+            f.write(data)
+        languages[shard['language']] = {
+            'path': path,
+            'bytes': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+            'questions': len(shard['questions']),
+        }
+
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'version': MANIFEST_VERSION,
+        'structure': structure,
+        'base_language': base_language,
+        'languages': languages,
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def load_shard(manifest_path: str, language: str) -> dict:
+    """Read one language's shard, falling back to the base language if it has none"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    entry = manifest['languages'].get(language) or manifest['languages'][manifest['base_language']]
+    with open(os.path.join(os.path.dirname(manifest_path), entry['path']), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a language shard to a converted survey")
+    parser.add_argument('survey', help="converted Resonant survey JSON")
+    parser.add_argument('manifest', help="manifest.json written with --l10n-dir")
+    parser.add_argument('--language', required=True, help="language code, e.g. de")
+    parser.add_argument('-o', '--output', required=True, help="localized survey JSON to write")
+    args = parser.parse_args()
+
+    with open(args.survey, 'r', encoding='utf-8') as f:
+        survey = json.load(f)
+    shard = load_shard(args.manifest, args.language)
+    if shard['language'] != args.language:
+        print(f"⚠️  No {args.language} shard, using base language {shard['language']}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(localize(survey, shard), f, indent=2, ensure_ascii=False)
+    print(f"✅ Created {args.output} ({shard['language']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Asyncio load generator replaying simulated survey sessions over HTTP
+Builds one request sequence per participant from a converted survey JSON (the
+respondent model of survey_flow_sim.py, with the bodies the web client would
+post), then starts the participants over a ramp and replays their answer
+saves, autosaves and completion against the survey endpoints through a pooled
+keep-alive HTTP/1.1 client. Reports latency percentiles, status codes and
+throughput per endpoint.
+
+--stub starts survey_stub_server.py in-process so the test runs offline (CI);
+--base-url points it at a real deployment instead. A real deployment needs
+existing incomplete responses: pass their ids with --response-ids (one per
+line), otherwise random UUIDs are used and autosaves answer 404.
+
+Session think times are multiplied by --time-scale (0 sends each session's
+requests back to back). Requests of one participant are sent one after the
+other, as the client does. Latency is measured from when a request is issued,
+so it includes waiting for a free pooled connection (--connections).
+
+Usage:
+    python survey_load_test.py survey.json --stub --participants 2000 --ramp 10 --time-scale 0.01
+    python survey_load_test.py survey.json --base-url https://staging.example.org --survey-id <uuid> \\
+        --response-ids response_ids.txt --participants 500 --ramp 600 -o load_report.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import ssl
+import sys
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from expression_compiler import ExpressionCompiler, ExpressionEvaluator
+from survey_flow_sim import ENDPOINTS, Behaviour, plan_flow, simulate_respondent
+from survey_stub_server import start_stub
+
+REPORT_FORMAT = 'resonant-load-test'
+
+
+class HttpPool:
+    """Keep-alive HTTP/1.1 connections to one origin, at most `size` open at once"""
+
+    def __init__(self, base_url: str, size: int = 100, timeout: float = 20.0):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == 'https' else None
+        self.prefix = url.path.rstrip('/')
+        self.host_header = url.netloc
+        self.timeout = timeout
+        self.opened = 0
+        self._slots = asyncio.Semaphore(size)
+        self._idle: deque = deque()
+
+    async def request(self, method: str, path: str, body: bytes = b'') -> Tuple[int, bytes]:
+        """Send one request; returns (status, response body)"""
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                connection = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+                self.opened += 1
+            reader, writer = connection
+            try:
+                status, payload, keep_alive = await asyncio.wait_for(
+                    self._exchange(reader, writer, method, path, body), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append(connection)
+            else:
+                writer.close()
+            return status, payload
+
+    async def _exchange(self, reader, writer, method: str, path: str, body: bytes):
+        head = (f"{method} {self.prefix}{path} HTTP/1.1\r\n"
+                f"Host: {self.host_header}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: keep-alive\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split(b' ', 2)[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            payload = b''.join(chunks)
+        elif 'content-length' in headers:
+            payload = await reader.readexactly(int(headers['content-length']))
+        else:
+            payload = await reader.read()
+            keep_alive = False
+        return status, payload, keep_alive
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+def build_sessions(survey: dict, participants: int, behaviour: Behaviour, seed: int = 0) -> List[list]:
+    """Simulated (seconds, endpoint, payload) request sequences, one per participant"""
+    compiler = ExpressionCompiler()
+    flow = plan_flow(survey, compiler)
+    sessions = []
+    for index in range(participants):
+        rng = random.Random(f"{seed}:{index}")
+        respondent = simulate_respondent(flow, behaviour, rng, ExpressionEvaluator(nodes=compiler.nodes),
+                                         record_payloads=True)
+        sessions.append([(at, endpoint, payload) for at, endpoint, _, payload in respondent.writes])
+    return sessions
+
+
+def request_for(survey_id: str, response_id: str, endpoint: str, payload: Optional[dict]) -> Tuple[str, bytes]:
+    """Path and JSON body the survey client sends for one simulated write"""
+    if endpoint == 'response':
+        return '/api/survey/response', json.dumps({'response_id': response_id, **payload}).encode('utf-8')
+    if endpoint == 'autosave':
+        return f'/api/survey/{survey_id}/autosave', json.dumps({'response_id': response_id, **payload}).encode('utf-8')
+    return f'/api/survey/response/{response_id}/complete', b''
+
+
+class LoadStats:
+    """Latencies and status codes per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in ENDPOINTS}
+        self.statuses: Dict[str, Dict[str, int]] = {endpoint: {} for endpoint in ENDPOINTS}
+        self.request_bytes = 0
+
+    def record(self, endpoint: str, seconds: float, status: str):
+        self.latencies[endpoint].append(seconds)
+        counts = self.statuses[endpoint]
+        counts[status] = counts.get(status, 0) + 1
+
+    def report(self, wall_seconds: float) -> dict:
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            latencies = np.asarray(self.latencies[endpoint]) * 1000
+            statuses = self.statuses[endpoint]
+            ok = sum(count for status, count in statuses.items() if status.startswith('2'))
+            entry = {'requests': len(latencies), 'ok': ok, 'statuses': statuses,
+                     'requests_per_second': round(len(latencies) / wall_seconds, 2) if wall_seconds else None}
+            if len(latencies):
+                p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+                entry['latency_ms'] = {'mean': round(float(latencies.mean()), 3), 'p50': round(float(p50), 3),
+                                       'p90': round(float(p90), 3), 'p95': round(float(p95), 3),
+                                       'p99': round(float(p99), 3), 'max': round(float(latencies.max()), 3)}
+            endpoints[endpoint] = entry
+        total = sum(entry['requests'] for entry in endpoints.values())
+        failed = total - sum(entry['ok'] for entry in endpoints.values())
+        return {
+            'wall_seconds': round(wall_seconds, 3),
+            'requests': total,
+            'errors': failed,
+            'error_rate': round(failed / total, 6) if total else 0.0,
+            'requests_per_second': round(total / wall_seconds, 2) if wall_seconds else None,
+            'request_bytes': self.request_bytes,
+            'endpoints': endpoints,
+        }
+
+
+async def run_participant(pool: HttpPool, stats: LoadStats, session: list, survey_id: str, response_id: str,
+                          start_at: float, time_scale: float):
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(max(0.0, start_at - loop.time()))
+    started = loop.time()
+    for at, endpoint, payload in session:
+        delay = started + at * time_scale - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        path, body = request_for(survey_id, response_id, endpoint, payload)
+        stats.request_bytes += len(body)
+        sent = time.perf_counter()
+        try:
+            status, _ = await pool.request('POST', path, body)
+            outcome = str(status)
+        except (OSError, asyncio.TimeoutError, ValueError, asyncio.IncompleteReadError) as e:
+            outcome = type(e).__name__
+        stats.record(endpoint, time.perf_counter() - sent, outcome)
+
+
+async def run_load(base_url: str, sessions: List[list], survey_id: str, response_ids: List[str],
+                   ramp: float, time_scale: float, connections: int, timeout: float) -> Tuple[dict, int]:
+    """Replay every session (participants start evenly over ramp seconds); returns (report, connections opened)"""
+    pool = HttpPool(base_url, connections, timeout)
+    stats = LoadStats()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    step = ramp / len(sessions) if sessions else 0.0
+    wall = time.perf_counter()
+    await asyncio.gather(*(run_participant(pool, stats, session, survey_id, response_ids[index], start + index * step,
+                                           time_scale)
+                           for index, session in enumerate(sessions)))
+    wall = time.perf_counter() - wall
+    await pool.close()
+    return stats.report(wall), pool.opened
+
+
+async def _main(args, sessions: List[list], response_ids: List[str]) -> dict:
+    if not args.stub:
+        report, opened = await run_load(args.base_url, sessions, args.survey_id, response_ids, args.ramp,
+                                        args.time_scale, args.connections, args.timeout)
+        return {**report, 'connections_opened': opened}
+    server, state = await start_stub()
+    async with server:
+        base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        report, opened = await run_load(base_url, sessions, args.survey_id, response_ids, args.ramp,
+                                        args.time_scale, args.connections, args.timeout)
+    return {**report, 'connections_opened': opened, 'stub': state.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('survey', help="converted Resonant survey JSON")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--stub', action='store_true', help="run against an in-process stub server")
+    target.add_argument('--base-url', help="deployment to load, e.g. https://staging.example.org")
+    parser.add_argument('--survey-id', default='00000000-0000-0000-0000-000000000000')
+    parser.add_argument('--response-ids', help="file of existing incomplete response ids, one per line")
+    parser.add_argument('--participants', type=int, default=1000)
+    parser.add_argument('--ramp', type=float, default=10.0, help="seconds over which participants start")
+    parser.add_argument('--time-scale', type=float, default=0.01,
+                        help="multiplier on simulated think time (1 = real time, 0 = no pauses)")
+    parser.add_argument('--connections', type=int, default=100, help="maximum open connections")
+    parser.add_argument('--timeout', type=float, default=20.0, help="seconds per request")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-p95-ms', type=float, help="fail if any endpoint's p95 latency exceeds this")
+    parser.add_argument('--max-error-rate', type=float, default=0.0, help="fail above this share of failed requests")
+    parser.add_argument('-o', '--output', help="write the JSON report here")
+    args = parser.parse_args()
+
+    with open(args.survey, 'r', encoding='utf-8') as f:
+        survey = json.load(f)
+
+    if args.response_ids:
+        with open(args.response_ids, 'r', encoding='utf-8') as f:
+            response_ids = [line.strip() for line in f if line.strip()]
+        if len(response_ids) < args.participants:
+            print(f"❌ {args.response_ids} has {len(response_ids)} ids for {args.participants} participants")
+            sys.exit(1)
+    else:
+        response_ids = [str(uuid.uuid4()) for _ in range(args.participants)]
+        if args.base_url:
+            print("⚠️  No --response-ids: random ids will not exist on the server")
+
+    print(f"Simulating {args.participants} sessions...")
+    sessions = build_sessions(survey, args.participants, Behaviour(), args.seed)
+    print(f"   {sum(len(session) for session in sessions)} requests")
+
+    report = asyncio.run(_main(args, sessions, response_ids))
+    report = {'format': REPORT_FORMAT, 'participants': args.participants, 'ramp_seconds': args.ramp,
+              'time_scale': args.time_scale, 'seed': args.seed, **report}
+
+    print(f"✅ {report['requests']} requests in {report['wall_seconds']:.1f}s "
+          f"({report['requests_per_second']:,.1f}/s, {report['connections_opened']} connections)")
+    for endpoint, entry in report['endpoints'].items():
+        latency = entry.get('latency_ms')
+        if latency:
+            print(f"   {endpoint:<10} {entry['requests']:>8} requests  p50 {latency['p50']:8.1f} ms  "
+                  f"p95 {latency['p95']:8.1f} ms  p99 {latency['p99']:8.1f} ms  ok {entry['ok']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Created {args.output}")
+
+    failed = False
+    if report['error_rate'] > args.max_error_rate:
+        print(f"❌ Error rate {report['error_rate']:.2%} above {args.max_error_rate:.2%}")
+        failed = True
+    if args.max_p95_ms is not None:
+        for endpoint, entry in report['endpoints'].items():
+            if entry.get('latency_ms', {}).get('p95', 0) > args.max_p95_ms:
+                print(f"❌ {endpoint} p95 {entry['latency_ms']['p95']:.1f} ms above {args.max_p95_ms:.1f} ms")
+                failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+Compact typed intermediate representation shared by the survey converters
+The TSV, LS3-style XML and LSS XML front ends all fill these classes, and one
+serializer turns them into Resonant JSON. Every class uses __slots__, so a
+question is a single small object instead of several dicts, and a question
+only stores the attributes it actually has.
+
+Given an ExpressionCompiler, the serializer also writes the compiled form of
+every relevance / validation expression next to its source (see
+ExpressionCompiler.compile_group), whatever the dialect.
+
+The front ends historically emit slightly different JSON layouts; the
+serializer reproduces each of them byte for byte via the dialect argument:
+    resonant  lss_to_resonant_json (settings carry relevance and every attribute)
+    lss       parse_lss_xml_to_json (relevance on the group, minimal settings)
+    tsv       convert_limesurvey_to_json (relevance_logic / help_text fields)
+Tools that read converted JSON back use relevance_of / relevance_node /
+randomization_group_of, which look in the right place for every dialect.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional, Tuple
+
+from expression_compiler import COMPILED_SUFFIX, ExpressionCompiler, Node
+
+DIALECTS = ('resonant', 'lss', 'tsv')
+
+# LimeSurvey question type -> Resonant question_type
+TYPE_MAP = {
+    "F": "array",
+    "R": "ranking",
+    "M": "multiple_choice_multiple",
+    "L": "multiple_choice_single",
+    "T": "long_text",
+    "S": "text",
+    "X": "text_display",
+    "*": "equation",
+    "5": "multiple_choice_single",  # 5-point choice
+    "!": "dropdown",
+    "Y": "yes_no",
+    "D": "date"
+}
+
+# Question attributes copied into the settings of the resonant dialect, in order
+RESONANT_ATTRIBUTE_SETTINGS = (
+    'array_filter',
+    'array_filter_exclude',
+    'array_filter_style',
+    'display_columns',
+    'max_answers',
+    'min_answers',
+    'random_order',
+    'other_replace_text',
+    'em_validation_q',
+    'em_validation_q_tip',
+    'cssclass',
+    'exclude_all_others',
+    'exclude_all_others_auto',
+    'hidden',
+    'time_limit',
+    'time_limit_action',
+    'time_limit_message',
+    'time_limit_countdown_message',
+)
+
+
+def map_type(limesurvey_type: str) -> str:
+    """Map a LimeSurvey question type to a Resonant type, falling back to text"""
+    return TYPE_MAP.get(limesurvey_type, "text")
+
+
+@dataclass(slots=True)
+class Attribute:
+    name: str
+    value: Optional[str]
+
+
+@dataclass(slots=True)
+class AnswerOption:
+    code: str
+    label: str
+    order_index: int
+    scale_id: Optional[int] = None
+
+
+@dataclass(slots=True)
+class SubQuestion:
+    code: str
+    label: str
+    order_index: int
+
+
+@dataclass(slots=True)
+class Question:
+    code: str
+    text: str
+    limesurvey_type: str
+    order_index: int
+    help_text: str = ""
+    relevance: str = "1"
+    mandatory: bool = False
+    other: bool = False
+    attributes: List[Attribute] = field(default_factory=list)
+    subquestions: List[SubQuestion] = field(default_factory=list)
+    answer_options: List[AnswerOption] = field(default_factory=list)
+
+    @property
+    def question_type(self) -> str:
+        return map_type(self.limesurvey_type)
+
+    def attribute(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        for attribute in self.attributes:
+            if attribute.name == name:
+                return attribute.value
+        return default
+
+
+@dataclass(slots=True)
+class Group:
+    title: str
+    order_index: int
+    description: str = ""
+    relevance: str = "1"
+    randomization_group: str = ""
+    questions: List[Question] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Survey:
+    title: str
+    description: str = ""
+    status: str = "draft"
+    settings: dict = field(default_factory=dict)
+    groups: List[Group] = field(default_factory=list)
+
+
+def survey_header(survey: Survey) -> dict:
+    """Survey-level fields of the JSON document (everything but question_groups)"""
+    return {
+        "title": survey.title,
+        "description": survey.description,
+        "status": survey.status,
+        "settings": survey.settings,
+    }
+
+
+def survey_to_json(survey: Survey, dialect: str = 'resonant', compiler: Optional[ExpressionCompiler] = None) -> dict:
+    """The whole survey as one JSON-ready dict"""
+    return {**survey_header(survey), "question_groups": list(iter_group_json(survey, dialect, compiler))}
+
+
+def iter_group_json(survey: Survey, dialect: str = 'resonant',
+                    compiler: Optional[ExpressionCompiler] = None) -> Iterator[dict]:
+    """JSON-ready question groups, built one at a time for streaming writers"""
+    if dialect not in DIALECTS:
+        raise ValueError(f"Unknown dialect {dialect!r} (expected one of {', '.join(DIALECTS)})")
+    for group in survey.groups:
+        yield group_to_json(group, dialect, compiler)
+
+
+def group_to_json(group: Group, dialect: str = 'resonant', compiler: Optional[ExpressionCompiler] = None) -> dict:
+    """One group in the given dialect, with compiled expressions when a compiler is passed"""
+    result = _group_json(group, dialect)
+    return compiler.compile_group(result) if compiler is not None else result
+
+
+def _group_json(group: Group, dialect: str) -> dict:
+    questions = [question_to_json(question, dialect) for question in group.questions]
+    if dialect == 'resonant':
+        return {
+            "title": group.title,
+            "order_index": group.order_index,
+            "settings": {
+                "relevance": group.relevance,
+                "randomization_group": group.randomization_group
+            },
+            "questions": questions
+        }
+    if dialect == 'lss':
+        return {
+            "title": group.title,
+            "order_index": group.order_index,
+            "relevance": group.relevance,
+            "questions": questions
+        }
+    return {
+        "title": group.title,
+        "description": group.description,
+        "order_index": group.order_index,
+        "relevance_logic": group.relevance,
+        "questions": questions
+    }
+
+
+def question_to_json(question: Question, dialect: str = 'resonant') -> dict:
+    subquestions = [{"code": sub.code, "label": sub.label, "order_index": sub.order_index}
+                    for sub in question.subquestions]
+
+    if dialect == 'tsv':
+        return {
+            "code": question.code,
+            "question_text": question.text,
+            "help_text": question.help_text,
+            "question_type": question.question_type,
+            "settings": {
+                "mandatory": question.mandatory,
+                "other_option": question.other
+            },
+            "relevance_logic": question.relevance,
+            "order_index": question.order_index,
+            "subquestions": subquestions,
+            "answer_options": [{"code": option.code, "label": option.label, "order_index": option.order_index,
+                                "scale_id": option.scale_id} for option in question.answer_options]
+        }
+
+    answer_options = [{"code": option.code, "label": option.label, "order_index": option.order_index}
+                      for option in question.answer_options]
+
+    if dialect == 'lss':
+        return {
+            "code": question.code,
+            "question_text": question.text,
+            "question_type": question.question_type,
+            "order_index": question.order_index,
+            "settings": {
+                "mandatory": question.mandatory,
+                "relevance": question.relevance
+            },
+            "subquestions": subquestions,
+            "answer_options": answer_options
+        }
+
+    settings = {
+        "mandatory": question.mandatory,
+        "other": question.other,
+        "relevance": question.relevance,
+        "help_text": question.help_text,
+        "limesurvey_type": question.limesurvey_type,
+    }
+    for name in RESONANT_ATTRIBUTE_SETTINGS:
+        settings[name] = question.attribute(name)
+
+    # "other" is offered as an extra subquestion, always last
+    if question.other:
+        subquestions.append({
+            "code": "other",
+            "label": settings["other_replace_text"] or "Other",
+            "order_index": 999
+        })
+
+    return {
+        "code": question.code,
+        "question_text": question.text,
+        "question_type": question.question_type,
+        "order_index": question.order_index,
+        "settings": settings,
+        "subquestions": subquestions,
+        "answer_options": answer_options
+    }
+
+
+def relevance_of(item: dict) -> Tuple[Optional[str], Any]:
+    """(expression, compiled form) of a converted group or question in any dialect
+
+    The resonant dialect keeps relevance in settings, as do lss questions; lss
+    groups have it inline as relevance, tsv groups and questions inline as
+    relevance_logic. Both are None when the item has no relevance at all.
+    """
+    settings = item.get('settings') or {}
+    for source, name in ((settings, 'relevance'), (item, 'relevance'), (item, 'relevance_logic')):
+        if source.get(name) is not None:
+            return source[name], source.get(name + COMPILED_SUFFIX)
+    return None, None
+
+
+def relevance_node(item: dict, compiler: ExpressionCompiler) -> Optional[Node]:
+    """Compiled relevance of a converted group or question (None when empty or invalid)
+
+    Uses the compiled form embedded at conversion time when there is one.
+    """
+    expression, compiled = relevance_of(item)
+    if compiled is not None:
+        return compiler.nodes.load(compiled)
+    return compiler.try_compile(expression)
+
+
+def randomization_group_of(item: dict) -> str:
+    """Randomization group of a converted group or question ('' when none)"""
+    return (item.get('settings') or {}).get('randomization_group') or item.get('random_group') or ''
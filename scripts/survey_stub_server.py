@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the survey response endpoints, for offline load tests
+Speaks just enough HTTP/1.1 (keep-alive, Content-Length bodies) to answer the
+routes the survey client posts to while a participant takes a survey, keeping
+response_data in memory with the same upsert key as the database
+(response_id, question, subquestion):
+
+    POST /api/survey/response                  one answer
+    POST /api/survey/<survey_id>/autosave      all answers + position
+    POST /api/survey/response/<id>/complete    mark complete
+    GET  /stats                                request and row counters
+
+Responses are created on first use (the real app creates them when the take
+page renders). --latency-ms / --row-latency-ms add a fixed and a per-row delay
+to stand in for database time.
+
+Usage:
+    python survey_stub_server.py --port 8787 --latency-ms 5 --row-latency-ms 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import re
+from typing import Dict, Optional, Tuple
+
+AUTOSAVE_PATH = re.compile(r'^/api/survey/([^/]+)/autosave$')
+COMPLETE_PATH = re.compile(r'^/api/survey/response/([^/]+)/complete$')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+# Request bodies above this are refused rather than buffered
+MAX_BODY_BYTES = 16 * 2**20
+
+
+class StubState:
+    """In-memory survey_responses / response_data and per-route counters"""
+
+    def __init__(self, latency: float = 0.0, row_latency: float = 0.0):
+        self.latency = latency
+        self.row_latency = row_latency
+        self.responses: Dict[str, dict] = {}
+        self.requests: Dict[str, int] = {}
+        self.rows_upserted = 0
+
+    def response(self, response_id: str) -> dict:
+        return self.responses.setdefault(response_id, {'status': 'incomplete', 'metadata': {}, 'data': {}})
+
+    def upsert(self, response: dict, key: str, value):
+        """One response_data row, keyed like the client's answers (Q1 or Q1_SQ001)"""
+        response['data'][key] = value if isinstance(value, str) else json.dumps(value)
+        self.rows_upserted += 1
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'rows_upserted': self.rows_upserted,
+            'responses': len(self.responses),
+            'complete': sum(1 for response in self.responses.values() if response['status'] == 'complete'),
+            'response_data_rows': sum(len(response['data']) for response in self.responses.values()),
+        }
+
+    async def handle(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        """Route one request; returns (status, JSON body)"""
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats()
+        if method != 'POST':
+            return 405, {'error': 'Method not allowed'}
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            return 400, {'error': 'Invalid JSON'}
+
+        if path == '/api/survey/response':
+            route, rows = 'response', 1
+        elif AUTOSAVE_PATH.match(path):
+            route, rows = 'autosave', 1 + len(data.get('answers') or {})
+        elif COMPLETE_PATH.match(path):
+            route, rows = 'complete', 1
+        else:
+            return 404, {'error': 'Not found'}
+        self.requests[route] = self.requests.get(route, 0) + 1
+        if self.latency or self.row_latency:
+            await asyncio.sleep(self.latency + self.row_latency * rows)
+
+        if route == 'response':
+            if not data.get('response_id') or not data.get('question_code'):
+                return 400, {'error': 'response_id and question_code are required'}
+            key = data['question_code']
+            if data.get('subquestion_code'):
+                key += '_' + data['subquestion_code']
+            self.upsert(self.response(data['response_id']), key, data.get('value'))
+            return 200, {'success': True, 'data': None}
+
+        if route == 'autosave':
+            if not data.get('response_id'):
+                return 400, {'error': 'response_id is required'}
+            response = self.response(data['response_id'])
+            if response['status'] == 'complete':
+                return 400, {'error': 'Cannot autosave completed response'}
+            response['metadata']['current_group_index'] = data.get('current_group_index')
+            for key, value in (data.get('answers') or {}).items():
+                self.upsert(response, key, value)
+            return 200, {'success': True}
+
+        response_id = COMPLETE_PATH.match(path).group(1)
+        self.response(response_id)['status'] = 'complete'
+        return 200, {'success': True}
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """One request off a keep-alive connection; None when the client closed it"""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, target, _ = line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError(f"request body of {length} bytes")
+    body = await reader.readexactly(length) if length else b''
+    return method, target.split('?', 1)[0], headers, body
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool):
+    body = json.dumps(payload).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+
+
+async def start_stub(host: str = '127.0.0.1', port: int = 0, state: Optional[StubState] = None):
+    """Start serving; returns (asyncio server, state). Port 0 picks a free port."""
+    state = state or StubState()
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    status, payload = await state.handle(method, path, body)
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                _write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(serve, host, port, backlog=4096)
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve stand-ins for the survey response endpoints")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="fixed delay per request")
+    parser.add_argument('--row-latency-ms', type=float, default=0.0, help="extra delay per row written")
+    args = parser.parse_args()
+
+    async def run():
+        server, _ = await start_stub(args.host, args.port, StubState(args.latency_ms / 1000, args.row_latency_ms / 1000))
+        print(f"✅ Stub listening on http://{args.host}:{server.sockets[0].getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
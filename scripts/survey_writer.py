@@ -0,0 +1,164 @@
+"""
+Streaming output layer for converted Resonant surveys
+Groups are serialized one at a time as the converter yields them, so the full
+nested survey never has to be held in memory. Output is byte-stable: the same
+input always produces the same bytes, which keeps diffs and caches useful.
+
+Formats:
+    pretty   indent=2, byte-identical to json.dump(survey, f, indent=2)
+    compact  no whitespace at all
+    ndjson   one record per line: the survey header, then each group
+             (without its questions) followed by one line per question
+    sharded  a directory instead of a file: groups.jsonl holds the header and
+             then each whole group as one compact line, and manifest.json
+             lists every group's order, relevance, randomization group and
+             byte range, so a runtime can fetch just the groups a participant
+             reaches (read_group, or an HTTP Range request)
+"""
+
+import json
+import os
+from typing import Iterable, Optional, TextIO
+
+from survey_model import relevance_of
+
+FORMATS = ('pretty', 'compact', 'ndjson')
+OUTPUT_FORMATS = FORMATS + ('sharded',)
+
+SHARD_MANIFEST_FORMAT = 'resonant-survey-shards'
+SHARD_MANIFEST_VERSION = 1
+SHARD_MANIFEST_NAME = 'manifest.json'
+SHARD_PACK_NAME = 'groups.jsonl'
+
+
+def write_survey(f: TextIO, header: dict, groups: Iterable[dict], fmt: str = 'pretty',
+                 ensure_ascii: bool = False) -> dict:
+    """Stream a survey (header fields + question_groups) to f; returns group/question counts"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    if fmt == 'ndjson':
+        return _write_ndjson(f, header, groups, ensure_ascii)
+    return _write_document(f, header, groups, fmt == 'pretty', ensure_ascii)
+
+
+def dump_survey(survey: dict, f: TextIO, fmt: str = 'pretty', ensure_ascii: bool = False) -> dict:
+    """write_survey for an already assembled survey dict"""
+    header = {key: value for key, value in survey.items() if key != 'question_groups'}
+    return write_survey(f, header, survey.get('question_groups', []), fmt, ensure_ascii)
+
+
+def write_survey_output(path: str, header: dict, groups: Iterable[dict], fmt: str = 'pretty',
+                        ensure_ascii: bool = False) -> dict:
+    """write_survey to a file, or write_sharded when fmt is 'sharded' (path is then a directory)"""
+    if fmt == 'sharded':
+        return write_sharded(path, header, groups, ensure_ascii)
+    with open(path, 'w', encoding='utf-8') as f:
+        return write_survey(f, header, groups, fmt, ensure_ascii)
+
+
+def dump_survey_output(survey: dict, path: str, fmt: str = 'pretty', ensure_ascii: bool = False) -> dict:
+    """write_survey_output for an already assembled survey dict"""
+    header = {key: value for key, value in survey.items() if key != 'question_groups'}
+    return write_survey_output(path, header, survey.get('question_groups', []), fmt, ensure_ascii)
+
+
+def write_sharded(out_dir: str, header: dict, groups: Iterable[dict], ensure_ascii: bool = False) -> dict:
+    """Write groups.jsonl and its manifest.json into out_dir; returns group/question counts"""
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {'groups': 0, 'questions': 0}
+    dumps = lambda obj: json.dumps(obj, separators=(',', ':'), ensure_ascii=ensure_ascii)
+    entries = []
+
+    with open(os.path.join(out_dir, SHARD_PACK_NAME), 'wb') as f:
+        line = (dumps(header) + '\n').encode('utf-8')
+        f.write(line)
+        header_range = {'offset': 0, 'length': len(line)}
+        offset = len(line)
+        for group in groups:
+            line = (dumps(group) + '\n').encode('utf-8')
+            f.write(line)
+            settings = group.get('settings') or {}
+            questions = group.get('questions', [])
+            relevance, compiled = relevance_of(group)
+            entry = {
+                'index': counts['groups'],
+                'title': group.get('title'),
+                'order_index': group.get('order_index'),
+                'relevance': relevance,
+                'randomization_group': settings.get('randomization_group') or None,
+                'questions': [question.get('code') for question in questions],
+                'offset': offset,
+                'length': len(line),
+            }
+            if compiled is not None:
+                entry['relevance_compiled'] = compiled
+            entries.append(entry)
+            offset += len(line)
+            counts['groups'] += 1
+            counts['questions'] += len(questions)
+
+    manifest = {
+        'format': SHARD_MANIFEST_FORMAT,
+        'version': SHARD_MANIFEST_VERSION,
+        'path': SHARD_PACK_NAME,
+        'bytes': offset,
+        'header': header_range,
+        'groups': entries,
+    }
+    with open(os.path.join(out_dir, SHARD_MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=ensure_ascii)
+    return counts
+
+
+def read_group(manifest_path: str, index: Optional[int] = None) -> dict:
+    """One group of a sharded survey (or its header when index is None), reading only its byte range"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    entry = manifest['header'] if index is None else manifest['groups'][index]
+    with open(os.path.join(os.path.dirname(manifest_path), manifest['path']), 'rb') as f:
+        f.seek(entry['offset'])
+        return json.loads(f.read(entry['length']))
+
+
+def _write_document(f: TextIO, header: dict, groups: Iterable[dict], pretty: bool, ensure_ascii: bool) -> dict:
+    counts = {'groups': 0, 'questions': 0}
+    if pretty:
+        dumps = lambda obj: json.dumps(obj, indent=2, ensure_ascii=ensure_ascii)
+        item_sep, key_sep, indent = ',\n', ': ', '\n  '
+    else:
+        dumps = lambda obj: json.dumps(obj, separators=(',', ':'), ensure_ascii=ensure_ascii)
+        item_sep, key_sep, indent = ',', ':', ''
+
+    # Header fields first, exactly as json.dumps would lay them out one level deep
+    f.write('{')
+    for key, value in header.items():
+        f.write(indent + dumps(key) + key_sep + dumps(value).replace('\n', indent) + item_sep.rstrip(' \n'))
+    f.write(indent + dumps('question_groups') + key_sep + '[')
+
+    group_indent = indent + ('  ' if pretty else '')
+    for group in groups:
+        if counts['groups']:
+            f.write(',')
+        f.write(group_indent + dumps(group).replace('\n', group_indent))
+        counts['groups'] += 1
+        counts['questions'] += len(group.get('questions', []))
+
+    if counts['groups']:
+        f.write(indent)
+    f.write(']' + ('\n}' if pretty else '}'))
+    return counts
+
+
+def _write_ndjson(f: TextIO, header: dict, groups: Iterable[dict], ensure_ascii: bool) -> dict:
+    counts = {'groups': 0, 'questions': 0}
+    dumps = lambda obj: json.dumps(obj, separators=(',', ':'), ensure_ascii=ensure_ascii)
+
+    f.write(dumps({'record': 'survey', **header}) + '\n')
+    for group_index, group in enumerate(groups):
+        group_fields = {key: value for key, value in group.items() if key != 'questions'}
+        f.write(dumps({'record': 'group', 'group_index': group_index, **group_fields}) + '\n')
+        for question in group.get('questions', []):
+            f.write(dumps({'record': 'question', 'group_index': group_index, **question}) + '\n')
+            counts['questions'] += 1
+        counts['groups'] += 1
+    return counts
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic LimeSurvey exports (LSS XML or TSV) of any size
+Surveys are built from a seeded plan, so the same knobs always give the same
+file. Question types, relevance expressions, array filters, attributes,
+translations and responses are mixed the way real exports mix them, which
+makes the files usable as converter fixtures and benchmark inputs.
+Files are written row by row, so generating very large exports needs only
+memory for the plan (a few small ints per question).
+
+LSS files use the LimeSurvey 4+ layout: l10n tables with one row per
+language, subquestions in their own table, SGQA-named response columns.
+TSV files carry the base language only.
+
+Usage:
+    python synthetic_survey.py big.lss --groups 100 --questions 5000 --languages 3 --responses 10000
+    python synthetic_survey.py big.tsv --groups 100 --questions 5000 --subquestions 6 --answers 7
+"""
+
+import argparse
+import csv
+import random
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, TextIO
+
+from survey_model import RESONANT_ATTRIBUTE_SETTINGS
+
+SURVEY_ID = 735545
+LANGUAGES = ('en', 'de', 'fr', 'es', 'it', 'nl', 'pl', 'pt', 'sv', 'fi')
+
+# Question types and how often they are drawn
+QUESTION_TYPES = {
+    'F': 4, 'L': 4, 'M': 2, 'S': 2, 'T': 1, 'N': 1, '5': 1, '!': 1, 'Y': 1, 'R': 1, 'D': 1, 'X': 1,
+}
+SUBQUESTION_TYPES = {'F', 'M'}
+ANSWER_TYPES = {'F', 'L', '!', 'R'}
+
+# Columns of a TSV export as convert_limesurvey_to_json reads them: LimeSurvey's
+# type/scale plus the id / related_id / type / scale_id columns of newer exports
+TSV_COLUMNS = ('class', 'type/scale', 'name', 'relevance', 'text', 'help', 'language', 'validation', 'mandatory',
+               'other', 'default', 'same_default', 'id', 'related_id', 'type', 'scale_id')
+
+
+@dataclass
+class SyntheticSpec:
+    groups: int = 10
+    questions: int = 100
+    subquestions: int = 5
+    answers: int = 5
+    attributes: int = 2
+    languages: int = 1
+    responses: int = 0
+    seed: int = 0
+
+
+@dataclass
+class _PlannedQuestion:
+    qid: int
+    gid: int
+    qtype: str
+    order: int
+    relevance: str
+    mandatory: str
+    other: str
+    subquestions: int
+    answers: int
+    attributes: List[str]
+
+
+def plan_survey(spec: SyntheticSpec) -> List[_PlannedQuestion]:
+    """Deterministic question plan; subquestion qids are allocated after all questions"""
+    rng = random.Random(spec.seed)
+    types, weights = zip(*QUESTION_TYPES.items())
+    attribute_names = [name for name in RESONANT_ATTRIBUTE_SETTINGS if not name.startswith('array_filter')]
+    plan = []
+    for index in range(spec.questions):
+        qtype = rng.choices(types, weights)[0]
+        qid = index + 1
+        previous = plan[rng.randrange(len(plan))] if plan and rng.random() < 0.4 else None
+        if previous is None:
+            relevance = '1'
+        elif previous.answers:
+            relevance = f'Q{previous.qid} == "A{rng.randint(1, previous.answers)}"'
+        else:
+            relevance = f'!is_empty(Q{previous.qid})'
+
+        attributes = rng.sample(attribute_names, min(spec.attributes, len(attribute_names)))
+        filters = [q for q in plan[-20:] if q.qtype == 'M']
+        if qtype in SUBQUESTION_TYPES and filters and rng.random() < 0.3:
+            attributes.append('array_filter')
+
+        plan.append(_PlannedQuestion(
+            qid=qid,
+            gid=index * spec.groups // max(spec.questions, 1) + 1,
+            qtype=qtype,
+            order=index,
+            relevance=relevance,
+            mandatory=rng.choice('YN'),
+            other='Y' if qtype in ('L', 'M') and rng.random() < 0.2 else 'N',
+            subquestions=spec.subquestions if qtype in SUBQUESTION_TYPES else 0,
+            answers=spec.answers if qtype in ANSWER_TYPES else 0,
+            attributes=attributes,
+        ))
+    return plan
+
+
+def _array_filter_source(plan: List[_PlannedQuestion], question: _PlannedQuestion) -> str:
+    for candidate in reversed(plan[max(0, question.qid - 21):question.qid - 1]):
+        if candidate.qtype == 'M':
+            return f"Q{candidate.qid}"
+    return ""
+
+
+def _attribute_value(name: str, question: _PlannedQuestion, rng: random.Random) -> str:
+    if name == 'em_validation_q':
+        return f"!is_empty(Q{question.qid})"
+    if name in ('hidden', 'random_order', 'exclude_all_others_auto'):
+        return rng.choice('01')
+    if name in ('display_columns', 'max_answers', 'min_answers', 'time_limit'):
+        return str(rng.randint(1, 5))
+    return f"{name} value {rng.randint(1, 99)}"
+
+
+def _cdata(value) -> str:
+    return '<![CDATA[' + str(value).replace(']]>', ']]]]><![CDATA[>') + ']]>'
+
+
+class _TableWriter:
+    """Writes one LSS table; every row must have the same fields as the first"""
+
+    def __init__(self, f: TextIO, name: str, fields: List[str]):
+        self.f, self.name, self.fields = f, name, fields
+        self.rows = 0
+        f.write(f'<{name}><fields>' + ''.join(f'<fieldname>{field}</fieldname>' for field in fields)
+                + '</fields><rows>')
+
+    def row(self, *values):
+        self.f.write('<row>' + ''.join(f'<{field}>{_cdata(value)}</{field}>'
+                                      for field, value in zip(self.fields, values) if value is not None)
+                     + '</row>\n')
+        self.rows += 1
+
+    def close(self) -> int:
+        self.f.write(f'</rows></{self.name}>\n')
+        return self.rows
+
+
+def write_lss(f: TextIO, spec: SyntheticSpec) -> Dict[str, int]:
+    """Write a synthetic LSS export; returns rows written per table"""
+    plan = plan_survey(spec)
+    languages = LANGUAGES[:max(1, min(spec.languages, len(LANGUAGES)))]
+    rng = random.Random(spec.seed + 1)
+    counts = {}
+
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n<document>'
+            '<LimeSurveyDocType>Survey</LimeSurveyDocType><DBVersion>600</DBVersion>'
+            '<languages>' + ''.join(f'<language>{language}</language>' for language in languages)
+            + '</languages>\n')
+
+    # Answers precede questions in LimeSurvey exports
+    answers = _TableWriter(f, 'answers', ['aid', 'qid', 'code', 'sortorder', 'assessment_value', 'scale_id'])
+    aid = 0
+    for question in plan:
+        for index in range(question.answers):
+            aid += 1
+            answers.row(aid, question.qid, f"A{index + 1}", index, 0, 0)
+    counts['answers'] = answers.close()
+
+    answer_l10ns = _TableWriter(f, 'answer_l10ns', ['id', 'aid', 'answer', 'language'])
+    aid = 0
+    for question in plan:
+        for index in range(question.answers):
+            aid += 1
+            for language in languages:
+                answer_l10ns.row(answer_l10ns.rows + 1, aid, f"Answer {index + 1} ({language})", language)
+    counts['answer_l10ns'] = answer_l10ns.close()
+
+    groups = _TableWriter(f, 'groups', ['gid', 'sid', 'group_order', 'randomization_group', 'grelevance'])
+    for gid in range(1, spec.groups + 1):
+        randomization = f"rg{gid % 3}" if gid % 4 == 0 else ""
+        first_qid = (gid - 1) * spec.questions // spec.groups
+        relevance = f'Q{first_qid} == "A1"' if gid % 5 == 0 and first_qid else "1"
+        groups.row(gid, SURVEY_ID, gid - 1, randomization, relevance)
+    counts['groups'] = groups.close()
+
+    group_l10ns = _TableWriter(f, 'group_l10ns', ['id', 'gid', 'group_name', 'description', 'language'])
+    for gid in range(1, spec.groups + 1):
+        for language in languages:
+            group_l10ns.row(group_l10ns.rows + 1, gid, f"Group {gid} ({language})", "", language)
+    counts['group_l10ns'] = group_l10ns.close()
+
+    questions = _TableWriter(f, 'questions', ['qid', 'parent_qid', 'sid', 'gid', 'type', 'title', 'question_order',
+                                              'relevance', 'mandatory', 'other'])
+    for question in plan:
+        questions.row(question.qid, 0, SURVEY_ID, question.gid, question.qtype, f"Q{question.qid}", question.order,
+                      question.relevance, question.mandatory, question.other)
+    counts['questions'] = questions.close()
+
+    subquestions = _TableWriter(f, 'subquestions', ['qid', 'parent_qid', 'sid', 'gid', 'type', 'title',
+                                                    'question_order', 'relevance'])
+    next_qid = spec.questions
+    for question in plan:
+        for index in range(question.subquestions):
+            next_qid += 1
+            subquestions.row(next_qid, question.qid, SURVEY_ID, question.gid, 'T', f"SQ{index + 1:03d}", index, "1")
+    counts['subquestions'] = subquestions.close()
+
+    question_l10ns = _TableWriter(f, 'question_l10ns', ['id', 'qid', 'question', 'help', 'language'])
+    for question in plan:
+        for language in languages:
+            question_l10ns.row(question_l10ns.rows + 1, question.qid, f"Question {question.qid} ({language})",
+                               "Help text" if question.qid % 3 == 0 else "", language)
+    next_qid = spec.questions
+    for question in plan:
+        for index in range(question.subquestions):
+            next_qid += 1
+            for language in languages:
+                question_l10ns.row(question_l10ns.rows + 1, next_qid, f"Item {index + 1} ({language})", "", language)
+    counts['question_l10ns'] = question_l10ns.close()
+
+    attributes = _TableWriter(f, 'question_attributes', ['qaid', 'qid', 'attribute', 'value', 'language'])
+    for question in plan:
+        for name in question.attributes:
+            value = _array_filter_source(plan, question) if name == 'array_filter' else _attribute_value(name, question, rng)
+            attributes.row(attributes.rows + 1, question.qid, name, value, "")
+    counts['question_attributes'] = attributes.close()
+
+    surveys = _TableWriter(f, 'surveys', ['sid', 'language', 'additional_languages'])
+    surveys.row(SURVEY_ID, languages[0], ' '.join(languages[1:]))
+    counts['surveys'] = surveys.close()
+
+    languagesettings = _TableWriter(f, 'surveys_languagesettings', ['surveyls_survey_id', 'surveyls_language',
+                                                                    'surveyls_title', 'surveyls_description'])
+    for language in languages:
+        languagesettings.row(SURVEY_ID, language, f"Synthetic survey ({language})", "Generated by synthetic_survey.py")
+    counts['surveys_languagesettings'] = languagesettings.close()
+
+    if spec.responses:
+        counts['responses'] = _write_responses(f, plan, spec)
+
+    f.write('</document>\n')
+    return counts
+
+
+def _response_columns(plan: List[_PlannedQuestion]) -> Iterator[tuple]:
+    """(SGQA column, question) for every answerable column"""
+    for question in plan:
+        if question.qtype == 'X':
+            continue
+        base = f"_{SURVEY_ID}X{question.gid}X{question.qid}"
+        if question.subquestions:
+            for index in range(question.subquestions):
+                yield base + f"SQ{index + 1:03d}", question
+        elif question.qtype == 'R':
+            for rank in range(1, question.answers + 1):
+                yield base + str(rank), question
+        else:
+            yield base, question
+        if question.other == 'Y':
+            yield base + 'other', None
+
+
+def _response_value(question, rng: random.Random) -> str:
+    if question is None:
+        return "Other text"
+    if question.answers:
+        return f"A{rng.randint(1, question.answers)}"
+    return {
+        'M': lambda: 'Y',
+        'N': lambda: str(rng.randint(0, 100)),
+        '5': lambda: str(rng.randint(1, 5)),
+        'Y': lambda: rng.choice('YN'),
+        'D': lambda: f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 00:00:00",
+    }.get(question.qtype, lambda: f"Free text {rng.randint(1, 1000)}")()
+
+
+def _write_responses(f: TextIO, plan: List[_PlannedQuestion], spec: SyntheticSpec) -> int:
+    rng = random.Random(spec.seed + 2)
+    columns = list(_response_columns(plan))
+    f.write('<responses><fields>'
+            + ''.join(f'<fieldname>{name}</fieldname>' for name in ('id', 'submitdate', 'lastpage', 'startlanguage'))
+            + ''.join(f'<fieldname>{column}</fieldname>' for column, _ in columns)
+            + '</fields><rows>')
+    for response_id in range(1, spec.responses + 1):
+        fields = [f'<id>{_cdata(response_id)}</id><submitdate>{_cdata("2024-01-01 12:00:00")}</submitdate>'
+                  f'<lastpage>{_cdata(spec.groups)}</lastpage><startlanguage>{_cdata("en")}</startlanguage>']
+        for column, question in columns:
+            # Roughly one answer in five is left empty (skipped or not shown)
+            if rng.random() < 0.2:
+                continue
+            fields.append(f'<{column}>{_cdata(_response_value(question, rng))}</{column}>')
+        f.write('<row>' + ''.join(fields) + '</row>\n')
+    f.write('</rows></responses>\n')
+    return spec.responses
+
+
+def write_tsv(f: TextIO, spec: SyntheticSpec) -> Dict[str, int]:
+    """Write a synthetic TSV export (base language only); returns rows written per class"""
+    plan = plan_survey(spec)
+    language = LANGUAGES[0]
+    writer = csv.DictWriter(f, TSV_COLUMNS, restval='', delimiter='\t', lineterminator='\n')
+    writer.writeheader()
+    counts = {'S': 0, 'G': 0, 'Q': 0, 'SQ': 0, 'A': 0}
+
+    def row(row_class: str, **fields):
+        writer.writerow({'class': row_class, **fields})
+        counts[row_class] += 1
+
+    row('S', name='surveyls_title', text="Synthetic survey", language=language)
+    row('S', name='surveyls_description', text="Generated by synthetic_survey.py", language=language)
+
+    questions_by_group: Dict[int, List[_PlannedQuestion]] = {}
+    for question in plan:
+        questions_by_group.setdefault(question.gid, []).append(question)
+
+    for gid in range(1, spec.groups + 1):
+        row('G', id=f"G{gid}", name=f"G{gid}", text=f"Group {gid}", relevance="1", language=language)
+        for question in questions_by_group.get(gid, []):
+            qid = f"Q{question.qid}"
+            row('Q', id=qid, related_id=f"G{gid}", name=qid, relevance=question.relevance, language=language,
+                text=f"Question {question.qid}", help="Help text" if question.qid % 3 == 0 else "",
+                mandatory=question.mandatory, other=question.other, type=question.qtype,
+                **{'type/scale': question.qtype})
+            for index in range(question.subquestions):
+                row('SQ', related_id=qid, name=f"SQ{index + 1:03d}", text=f"Item {index + 1}", language=language)
+            for index in range(question.answers):
+                row('A', related_id=qid, name=f"A{index + 1}", text=f"Answer {index + 1}", language=language,
+                    scale_id='0')
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic LimeSurvey export")
+    parser.add_argument('output', help="file to write; .tsv/.txt gives TSV, anything else LSS XML")
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--subquestions', type=int, default=5, help="per array / multiple choice question")
+    parser.add_argument('--answers', type=int, default=5, help="per list / array / ranking question")
+    parser.add_argument('--attributes', type=int, default=2, help="question attributes per question")
+    parser.add_argument('--languages', type=int, default=1, help="languages (LSS only)")
+    parser.add_argument('--responses', type=int, default=0, help="response rows (LSS only)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    spec = SyntheticSpec(args.groups, args.questions, args.subquestions, args.answers, args.attributes,
+                         args.languages, args.responses, args.seed)
+    with open(args.output, 'w', encoding='utf-8', newline='') as f:
+        if args.output.lower().endswith(('.tsv', '.txt')):
+            counts = write_tsv(f, spec)
+        else:
+            counts = write_lss(f, spec)
+
+    print(f"✅ Created {args.output}: {sum(counts.values())} rows")
+    for table, count in counts.items():
+        print(f"   {table}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Shared fixtures for the converter script tests
+The scripts import each other by module name, so the scripts directory goes on
+sys.path the same way it is when they are run directly.
+
+Usage:
+    python -m pytest scripts/tests
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+
+def fixture_path(name: str) -> str:
+    return os.path.join(FIXTURES_DIR, name)
+
+
+def load_fixture(name: str) -> dict:
+    with open(fixture_path(name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def lss_path() -> str:
+    """Two-language LSS export (6 groups, 18 questions, 12 responses)"""
+    return fixture_path('survey.lss')
+
+
+@pytest.fixture
+def tsv_path() -> str:
+    """TSV export of the same shape"""
+    return fixture_path('survey.tsv')
+
+
+@pytest.fixture
+def resonant_survey() -> dict:
+    """Golden lss_to_resonant_json output for survey.lss"""
+    return load_fixture('survey.resonant.json')
@@ -0,0 +1,42 @@
+"""Batch conversion: outputs match the single-file CLIs and never clobber the batch manifest"""
+
+from pathlib import Path
+
+import pytest
+
+import convert_limesurvey_to_json
+import lss_to_resonant_json
+from batch_convert import MANIFEST_NAME, assign_outputs, convert_file
+from conftest import fixture_path
+from test_converters import read_bytes, run_converter
+
+
+def non_ascii_copy(tmp_path, name: str) -> str:
+    """The fixture with accented question text"""
+    with open(fixture_path(name), 'r', encoding='utf-8') as f:
+        text = f.read().replace('Question 1', 'Frage über Größe 1')
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('fmt', ['pretty', 'compact', 'ndjson'])
+@pytest.mark.parametrize('module, source', [(lss_to_resonant_json, 'survey.lss'),
+                                            (convert_limesurvey_to_json, 'survey.tsv')], ids=['xml', 'tsv'])
+def test_batch_output_matches_the_cli(tmp_path, module, source, fmt):
+    source = non_ascii_copy(tmp_path, source)
+    cli_output, batch_output = tmp_path / 'cli.out', tmp_path / 'batch.out'
+    run_converter(module, source, str(cli_output), '--format', fmt)
+    result = convert_file(source, str(batch_output), 'resonant', fmt)
+    assert result['error'] is None
+    assert read_bytes(str(batch_output)) == read_bytes(str(cli_output))
+
+
+def test_outputs_never_take_the_manifest_name(tmp_path):
+    inputs = [Path('a/manifest.lss'), Path('b/manifest.tsv'), Path('c/Manifest.txt'), Path('d/survey.lss')]
+    outputs = assign_outputs(inputs, tmp_path)
+    names = [output.name for output in outputs.values()]
+    assert names == ['manifest_2.json', 'manifest_3.json', 'Manifest_4.json', 'survey.json']
+    assert MANIFEST_NAME not in names
+    # Other suffixes cannot collide, so the stem is kept
+    assert assign_outputs(inputs[:1], tmp_path, '.ndjson')[inputs[0]].name == 'manifest.ndjson'
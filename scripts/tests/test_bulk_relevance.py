@@ -0,0 +1,97 @@
+"""Vectorized relevance / array_filter masks against the reference evaluator"""
+
+import numpy as np
+import pytest
+
+import bulk_relevance
+from bulk_relevance import ResponseMatrix, shown_masks
+from conftest import fixture_path, load_fixture
+from expression_compiler import ExpressionCompiler, ExpressionEvaluator
+from lss_responses import decode_column, import_responses, load_codebook
+from survey_model import relevance_node
+
+GOLDEN = ['survey.resonant.json', 'survey.lss.json', 'survey.tsv.json']
+IDS = ['resonant', 'lss', 'tsv']
+
+
+@pytest.fixture(scope='module')
+def matrix(tmp_path_factory) -> ResponseMatrix:
+    """The fixture export's 12 responses
+
+    The group 5 conditions read Q11 / Q12 as single answers, so those take the
+    answers of their first array row.
+    """
+    store_dir = str(tmp_path_factory.mktemp('responses'))
+    import_responses(fixture_path('survey.lss'), store_dir)
+    codebook = load_codebook(store_dir)
+    arrays = {variable: decode_column(store_dir, variable, codebook) for variable in codebook['columns']}
+    arrays['Q11'], arrays['Q12'] = arrays['Q11_SQ001'], arrays['Q12_SQ001']
+    return ResponseMatrix.from_arrays(arrays)
+
+
+def reference_masks(survey: dict, matrix: ResponseMatrix) -> dict:
+    """Question masks from ExpressionEvaluator, one respondent at a time"""
+    compiler = ExpressionCompiler()
+    masks = {}
+    for row in range(matrix.n_rows):
+        answers = {name: factor.values[factor.codes[row]] for name, factor in matrix.columns.items()}
+        answers = {name: value for name, value in answers.items() if value is not None}
+        evaluator = ExpressionEvaluator(answers, compiler.nodes)
+        for group in survey['question_groups']:
+            group_node = relevance_node(group, compiler)
+            group_shown = group_node is None or evaluator.is_true(group_node)
+            for question in group['questions']:
+                node = relevance_node(question, compiler)
+                shown = group_shown and (node is None or evaluator.is_true(node))
+                masks.setdefault(question['code'], []).append(shown)
+    return masks
+
+
+# A question of group 5 with no relevance of its own: resonant / lss group 5
+# needs Q12 == "A1", the TSV fixture's needs Q11 == "A2"
+@pytest.mark.parametrize('golden, code', list(zip(GOLDEN, ['Q14', 'Q14', 'Q13'])), ids=IDS)
+def test_group_relevance_in_every_dialect(golden, code):
+    survey = load_fixture(golden)
+    matrix = ResponseMatrix.from_arrays({'Q11': np.array(['A2', 'A1', '']), 'Q12': np.array(['A1', 'A2', 'A2'])})
+    masks = shown_masks(survey, matrix)
+    assert masks[code].tolist() == [True, False, False]
+    assert masks['Q1'].tolist() == [True, True, True]
+
+
+@pytest.mark.parametrize('golden', GOLDEN, ids=IDS)
+def test_masks_match_reference_evaluator(golden, matrix):
+    survey = load_fixture(golden)
+    masks = shown_masks(survey, matrix)
+    expected = reference_masks(survey, matrix)
+    assert {code: masks[code].tolist() for code in expected} == expected
+    # The fixture's responses reach group 5 only sometimes
+    assert 0 < masks['Q15'].sum() < matrix.n_rows
+
+
+def test_uncompiled_relevance_is_compiled_on_the_fly():
+    survey = {'question_groups': [{'title': 'G', 'relevance_logic': 'Q1 > 2',
+                                   'questions': [{'code': 'Q2', 'relevance_logic': 'Q1 < 5'}]}]}
+    matrix = ResponseMatrix.from_arrays({'Q1': np.array(['1', '3', '7', ''])})
+    assert shown_masks(survey, matrix)['Q2'].tolist() == [False, True, False, False]
+
+
+def test_array_filter_masks_subquestions():
+    survey = {'question_groups': [{'title': 'G', 'settings': {}, 'questions': [
+        {'code': 'Q1', 'settings': {}, 'subquestions': [{'code': 'SQ1'}, {'code': 'SQ2'}]},
+        {'code': 'Q2', 'settings': {'array_filter': 'Q1'}, 'subquestions': [{'code': 'SQ1'}, {'code': 'SQ2'}]},
+        {'code': 'Q3', 'settings': {'array_filter_exclude': 'Q1'}, 'subquestions': [{'code': 'SQ1'}, {'code': 'SQ2'}]},
+    ]}]}
+    matrix = ResponseMatrix.from_arrays({'Q1[SQ1]': np.array(['Y', '', 'Y']), 'Q1[SQ2]': np.array(['', 'Y', 'Y'])})
+    masks = shown_masks(survey, matrix)
+    assert masks['Q2_SQ1'].tolist() == [True, False, True]
+    assert masks['Q2_SQ2'].tolist() == [False, True, True]
+    assert masks['Q3_SQ1'].tolist() == [False, True, False]
+
+
+def test_sparse_combinations_match_dense(monkeypatch, matrix):
+    survey = load_fixture('survey.resonant.json')
+    dense = shown_masks(survey, matrix)
+    monkeypatch.setattr(bulk_relevance, 'DENSE_PAIR_LIMIT', 0)
+    sparse = shown_masks(survey, matrix)
+    assert dense.keys() == sparse.keys()
+    assert all((dense[name] == sparse[name]).all() for name in dense)
@@ -0,0 +1,48 @@
+"""Conversion cache: hits skip the converter, LRU eviction, and entries evicted by another process"""
+
+import json
+import os
+
+import conversion_cache
+from conversion_cache import ConversionCache
+from convert_limesurvey_to_json import parse_limesurvey_tsv
+
+
+def test_second_conversion_is_a_hit(tmp_path, tsv_path):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    first = json.loads(json.dumps(cache.convert(parse_limesurvey_tsv, tsv_path)))
+    assert not cache.last_hit
+    assert cache.convert(parse_limesurvey_tsv, tsv_path) == first
+    assert cache.last_hit
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'), max_bytes=0)
+    cache.put('a', {'title': 'A'})
+    assert cache.stats()['entries'] == 0
+    cache.max_bytes = 10 ** 6
+    for key in ('old', 'new'):
+        cache.put(key, {'title': key})
+    os.utime(cache._entry_path('old'), (0, 0))
+    cache.max_bytes = os.path.getsize(cache._entry_path('new'))
+    cache.evict()
+    assert cache.get('old') is None
+    assert cache.get('new') == {'title': 'new'}
+
+
+def test_entry_evicted_during_a_hit_is_a_miss(tmp_path, monkeypatch):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    cache.put('key', {'title': 'cached'})
+    real_utime = os.utime
+
+    def evicted_first(path, *args, **kwargs):
+        # Another process evicts the entry right after it was read
+        os.unlink(path)
+        return real_utime(path, *args, **kwargs)
+
+    monkeypatch.setattr(conversion_cache.os, 'utime', evicted_first)
+    assert cache.get('key') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (0, 1, 0)
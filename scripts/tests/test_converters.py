@@ -0,0 +1,121 @@
+"""
+Golden-output tests: each converter front end against its checked-in output
+The golden files are the converters' pretty output for fixtures/survey.lss and
+fixtures/survey.tsv. After an intended output change, regenerate them with
+
+    UPDATE_GOLDEN=1 python -m pytest scripts/tests/test_converters.py
+
+and review the diff.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import convert_limesurvey_to_json
+import lss_to_resonant_json
+import parse_lss_xml_to_json
+from conftest import SCRIPTS_DIR, fixture_path
+
+# (script module, parse function, input fixture, golden output)
+CONVERTERS = [
+    (lss_to_resonant_json, lss_to_resonant_json.parse_lss_to_json, 'survey.lss', 'survey.resonant.json'),
+    (parse_lss_xml_to_json, parse_lss_xml_to_json.parse_lss_to_json, 'survey.lss', 'survey.lss.json'),
+    (convert_limesurvey_to_json, convert_limesurvey_to_json.parse_limesurvey_tsv, 'survey.tsv', 'survey.tsv.json'),
+]
+IDS = ['resonant', 'lss', 'tsv']
+
+
+def run_converter(module, *args) -> subprocess.CompletedProcess:
+    script = os.path.join(SCRIPTS_DIR, os.path.basename(module.__file__))
+    return subprocess.run([sys.executable, script, *args], check=True, capture_output=True, text=True)
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def read_ndjson(path: str) -> dict:
+    """Reassemble a survey from survey / group / question records"""
+    survey, groups = None, []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            kind = record.pop('record')
+            if kind == 'survey':
+                survey = record
+                continue
+            group_index = record.pop('group_index')
+            if kind == 'group':
+                groups.append(dict(record, questions=[]))
+            else:
+                groups[group_index]['questions'].append(record)
+    survey['question_groups'] = groups
+    return survey
+
+
+@pytest.mark.parametrize('module, parse, source, golden', CONVERTERS, ids=IDS)
+def test_cli_output_matches_golden(tmp_path, module, parse, source, golden):
+    output = str(tmp_path / golden)
+    run_converter(module, fixture_path(source), output)
+    if os.environ.get('UPDATE_GOLDEN'):
+        shutil.copyfile(output, fixture_path(golden))
+    assert read_bytes(output) == read_bytes(fixture_path(golden))
+
+
+@pytest.mark.parametrize('module, parse, source, golden', CONVERTERS, ids=IDS)
+def test_parse_function_matches_golden(module, parse, source, golden):
+    with open(fixture_path(golden), 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    # Compiled expressions are tuples in memory and lists once serialized
+    assert json.loads(json.dumps(parse(fixture_path(source)))) == expected
+
+
+@pytest.mark.parametrize('fmt', ['compact', 'ndjson'])
+@pytest.mark.parametrize('module, parse, source, golden', CONVERTERS, ids=IDS)
+def test_output_formats_agree(tmp_path, module, parse, source, golden, fmt):
+    output = str(tmp_path / golden)
+    run_converter(module, fixture_path(source), output, '--format', fmt)
+    survey = read_ndjson(output) if fmt == 'ndjson' else json.loads(read_bytes(output))
+    with open(fixture_path(golden), 'r', encoding='utf-8') as f:
+        assert survey == json.load(f)
+
+
+@pytest.mark.parametrize('module, parse, source, golden', CONVERTERS, ids=IDS)
+def test_cached_conversion_matches_golden(tmp_path, module, parse, source, golden):
+    cache_dir = str(tmp_path / 'cache')
+    for attempt in ('miss', 'hit'):
+        output = str(tmp_path / f"{attempt}.json")
+        run_converter(module, fixture_path(source), output, '--cache-dir', cache_dir)
+        assert read_bytes(output) == read_bytes(fixture_path(golden))
+
+
+def test_l10n_shards_cover_every_language(tmp_path, resonant_survey):
+    l10n_dir = tmp_path / 'l10n'
+    run_converter(lss_to_resonant_json, fixture_path('survey.lss'), str(tmp_path / 'survey.json'),
+                  '--l10n-dir', str(l10n_dir))
+    with open(l10n_dir / 'manifest.json', 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert sorted(manifest['languages']) == ['de', 'en']
+    # The main output stays in the base language
+    assert read_bytes(str(tmp_path / 'survey.json')) == read_bytes(fixture_path('survey.resonant.json'))
+
+
+def test_tsv_settings_after_the_groups_reach_the_header(tmp_path):
+    # Same export with the S rows moved to the end: the streaming CLI must agree with parse_limesurvey_tsv
+    with open(fixture_path('survey.tsv'), 'r', encoding='utf-8') as f:
+        header, *rows = f.readlines()
+    late = tmp_path / 'late_settings.tsv'
+    late.write_text(''.join([header] + [row for row in rows if not row.startswith('S\t')]
+                            + [row for row in rows if row.startswith('S\t')]), encoding='utf-8')
+    output = tmp_path / 'out.json'
+    run_converter(convert_limesurvey_to_json, str(late), str(output))
+    with open(output, 'r', encoding='utf-8') as f:
+        converted = json.load(f)
+    assert converted == json.loads(json.dumps(convert_limesurvey_to_json.parse_limesurvey_tsv(str(late))))
+    assert converted['title'] == 'Synthetic survey'
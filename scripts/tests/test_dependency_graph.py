@@ -0,0 +1,38 @@
+"""Dependency graph: one implementation shared by the converter and converted surveys"""
+
+import pytest
+
+from dependency_graph import build_survey_dependency_graph
+from lss_to_resonant_json import parse_lss_to_json
+from survey_model import DIALECTS, Group, Question, SubQuestion, Survey, iter_group_json, survey_to_json
+
+
+def chained_survey() -> Survey:
+    """Q2 reads Q1, Q3 reads a Q2 subquestion through its group, Q4 and Q5 read each other"""
+    q1 = Question('Q1', 'First', 'L', 0)
+    q2 = Question('Q2', 'Second', 'F', 1, relevance='Q1 == "A1"', subquestions=[SubQuestion('SQ1', 'One', 0)])
+    q3 = Question('Q3', 'Third', 'S', 0)
+    q4 = Question('Q4', 'Fourth', 'S', 1, relevance='Q5 == "x"')
+    q5 = Question('Q5', 'Fifth', 'S', 2, relevance='Q4 == "y" or missing == 1')
+    return Survey('Chained', groups=[Group('G1', 0, questions=[q1, q2]),
+                                     Group('G2', 1, relevance='Q2_SQ1 == "A1"', questions=[q3, q4, q5])])
+
+
+@pytest.mark.parametrize('dialect', DIALECTS)
+def test_graph_reads_every_dialect(dialect):
+    graph = build_survey_dependency_graph(survey_to_json(chained_survey(), dialect))
+    assert graph['dependents'] == {'Q1': ['Q2'], 'Q2': ['Q3', 'Q4', 'Q5'], 'Q4': ['Q5'], 'Q5': ['Q4']}
+    assert graph['evaluation_order'] == ['Q1', 'Q2', 'Q3', 'Q4', 'Q5']
+    assert graph['cycles'] == [['Q4', 'Q5']]
+    assert graph['unresolved'] == {'Q5': ['missing']}
+
+
+def test_groups_are_read_once_from_a_generator():
+    survey = chained_survey()
+    graph = build_survey_dependency_graph({'question_groups': iter_group_json(survey, 'resonant')})
+    assert graph == build_survey_dependency_graph(survey_to_json(survey, 'resonant'))
+
+
+def test_converter_embeds_the_graph_of_its_own_output(lss_path):
+    converted = parse_lss_to_json(lss_path)
+    assert converted['dependency_graph'] == build_survey_dependency_graph(converted)
@@ -0,0 +1,110 @@
+"""Expression compiler and reference evaluator"""
+
+import json
+
+import pytest
+
+from expression_compiler import ExpressionCompiler, ExpressionEvaluator, ExpressionSyntaxError
+
+
+@pytest.fixture
+def compiler() -> ExpressionCompiler:
+    return ExpressionCompiler()
+
+
+def test_compile_builds_tuple_nodes(compiler):
+    assert compiler.compile('Q1 == "A1"') == ('==', ('var', 'Q1'), ('const', 'A1'))
+    assert compiler.compile('!is_empty(Q2)') == ('not', ('call', 'is_empty', ('var', 'Q2')))
+    # Precedence: * binds tighter than +
+    assert compiler.compile('Q1 + 2 * 3') == ('+', ('var', 'Q1'), ('*', ('const', 2), ('const', 3)))
+
+
+def test_word_operators_braces_and_suffixes(compiler):
+    assert compiler.compile('Q1 eq "A1" AND Q2 gt 3') == compiler.compile('Q1 == "A1" && Q2 > 3')
+    assert compiler.compile('{Q1.NAOK == "Y"}') == ('==', ('var', 'Q1', 'NAOK'), ('const', 'Y'))
+
+
+def test_identical_subexpressions_are_shared(compiler):
+    first = compiler.compile('Q1 == "A1" and Q2 > 3')
+    second = compiler.compile('Q2 > 3 or Q5 == 1')
+    assert first[2] is second[1]
+    assert compiler.compile('{Q1 == "A1"}') is compiler.compile('Q1 == "A1"')
+
+
+def test_syntax_errors(compiler):
+    with pytest.raises(ExpressionSyntaxError):
+        compiler.compile('Q1 ==')
+    assert compiler.try_compile('Q1 ==') is None
+    assert compiler.try_compile('  ') is None
+    assert compiler.compile_field('Q1 ==', 'Q7', 'relevance') is None
+    assert compiler.errors == [{'code': 'Q7', 'field': 'relevance', 'expression': 'Q1 ==',
+                                'error': "Unexpected end of expression at position 5 in 'Q1 =='"}]
+
+
+def test_compile_group_skips_empty_sources(compiler):
+    group = {
+        'title': 'G1',
+        'settings': {'relevance': ''},
+        'questions': [{'code': 'Q1', 'settings': {'relevance': 'Q2 > 1', 'em_validation_q': ''}}],
+    }
+    compiled = compiler.compile_group(group)
+    assert 'relevance_compiled' not in compiled['settings']
+    settings = compiled['questions'][0]['settings']
+    assert settings['relevance_compiled'] == ('>', ('var', 'Q2'), ('const', 1))
+    assert 'em_validation_q_compiled' not in settings
+
+
+def test_compile_group_inline_fields_follow_their_source(compiler):
+    group = {'title': 'G1', 'relevance_logic': 'Q1 == "A1"', 'order_index': 0,
+             'questions': [{'code': 'Q2', 'relevance_logic': '', 'question_type': 'text'}]}
+    compiled = compiler.compile_group(group)
+    assert list(compiled) == ['title', 'relevance_logic', 'relevance_logic_compiled', 'order_index', 'questions']
+    assert compiled['questions'][0] == {'code': 'Q2', 'relevance_logic': '', 'question_type': 'text'}
+
+
+def test_evaluate_comparisons_and_arithmetic(compiler):
+    evaluator = ExpressionEvaluator({'Q1': 'A1', 'Q2': '5'})
+    assert evaluator.is_true(compiler.compile('Q1 == "A1"'))
+    assert evaluator.is_true(compiler.compile('Q2 > 3'))
+    # Numeric strings compare as numbers, other strings as strings
+    assert evaluator.evaluate(compiler.compile('Q2 == 5')) is True
+    assert evaluator.evaluate(compiler.compile('"10" < "9"')) is False
+    # + follows JavaScript: a string operand concatenates
+    assert evaluator.evaluate(compiler.compile('Q2 + 2')) == '52'
+    assert evaluator.evaluate(compiler.compile('Q2 * 2')) == 10
+    assert evaluator.evaluate(compiler.compile('if(Q9, 1, 2)')) == 2
+
+
+def test_evaluate_missing_answers(compiler):
+    evaluator = ExpressionEvaluator({'Q1.SQ001': 'Y'})
+    assert not evaluator.is_true(compiler.compile('Q3 > 3'))
+    assert evaluator.is_true(compiler.compile('is_empty(Q3)'))
+    assert evaluator.evaluate(compiler.compile('Q9.NAOK')) is False
+    assert evaluator.is_true(compiler.compile('Q1_SQ001 == "Y"'))
+
+
+def test_answer_changes_clear_the_memo(compiler):
+    node = compiler.compile('Q1 == "A1"')
+    evaluator = ExpressionEvaluator({'Q1': 'A2'})
+    assert not evaluator.is_true(node)
+    evaluator.set_answer('Q1', 'A1')
+    assert evaluator.is_true(node)
+    evaluator.update({'Q1': 'A3'})
+    assert not evaluator.is_true(node)
+
+
+def test_serialized_nodes_load_back_shared(compiler):
+    node = compiler.compile('Q1 == "A1" or Q2 >= 10')
+    evaluator = ExpressionEvaluator({'Q2': '12'}, compiler.nodes)
+    loaded = evaluator.load(json.loads(json.dumps(node)))
+    assert loaded is node
+    assert evaluator.is_true(loaded)
+
+
+def test_compiled_fixture_relevance_matches_source(compiler, resonant_survey):
+    evaluator = ExpressionEvaluator({'Q12': 'A1'})
+    group = resonant_survey['question_groups'][4]
+    assert group['settings']['relevance'] == 'Q12 == "A1"'
+    loaded = evaluator.load(group['settings']['relevance_compiled'])
+    assert loaded == compiler.compile(group['settings']['relevance'])
+    assert evaluator.is_true(loaded)
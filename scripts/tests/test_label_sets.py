@@ -0,0 +1,44 @@
+"""Label sets: shared scales are interned once, expand back losslessly and carry the text's language"""
+
+import copy
+import re
+
+from conftest import fixture_path
+from label_sets import LABEL_SETS_KEY, expand_label_sets, extract_label_sets, label_set_name
+from lss_to_resonant_json import parse_lss_to_json, read_lss_survey
+
+
+def german_base_copy(tmp_path) -> str:
+    """survey.lss with German as the base language"""
+    with open(fixture_path('survey.lss'), 'r', encoding='utf-8') as f:
+        text = f.read()
+    surveys = re.search(r'<surveys>.*?</surveys>', text, re.S)
+    german = surveys.group(0).replace('<language><![CDATA[en]]></language>', '<language><![CDATA[de]]></language>')
+    path = tmp_path / 'survey_de.lss'
+    path.write_text(text[:surveys.start()] + german + text[surveys.end():], encoding='utf-8')
+    return str(path)
+
+
+def test_extract_then_expand_round_trips(resonant_survey):
+    interned = extract_label_sets(copy.deepcopy(resonant_survey), ('answer_options', 'subquestions'))
+    assert interned[LABEL_SETS_KEY]
+    assert all(entry['uses'] >= 2 for entry in interned[LABEL_SETS_KEY].values())
+    assert expand_label_sets(interned) == resonant_survey
+
+
+def test_label_sets_are_tagged_with_the_base_language(lss_path, tmp_path):
+    english = parse_lss_to_json(lss_path, label_sets=True)[LABEL_SETS_KEY]
+    assert english and {entry['language'] for entry in english.values()} == {'en'}
+
+    path = german_base_copy(tmp_path)
+    assert read_lss_survey(path).language == 'de'
+    german = parse_lss_to_json(path, label_sets=True)[LABEL_SETS_KEY]
+    assert german and {entry['language'] for entry in german.values()} == {'de'}
+    # The labels are the German text, not the English ids re-tagged
+    assert not set(german) & set(english)
+
+
+def test_long_names_are_truncated():
+    items = [{'code': 'A1', 'label': 'x' * 60}, {'code': 'A2', 'label': 'y' * 60}]
+    name = label_set_name(items)
+    assert len(name) == 80 and name.endswith('…')
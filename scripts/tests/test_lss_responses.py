@@ -0,0 +1,57 @@
+"""Responses store: SGQA columns map to converted codes, chunking is invisible to readers"""
+
+import numpy as np
+import pytest
+
+from conftest import fixture_path
+from label_sets import question_items
+from lss_responses import ColumnResolver, ColumnStoreWriter, decode_column, import_responses, read_column, read_columns
+from lss_to_resonant_json import read_lss_survey
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    out_dir = str(tmp_path_factory.mktemp('responses'))
+    return out_dir, import_responses(fixture_path('survey.lss'), out_dir, chunk_rows=5)
+
+
+def test_columns_map_to_converted_codes(store, resonant_survey):
+    _, codebook = store
+    questions = {question['code']: question for group in resonant_survey['question_groups']
+                 for question in group['questions']}
+    assert codebook['n_rows'] == 12
+    for variable, entry in codebook['columns'].items():
+        if entry['question'] is None:
+            assert entry['source'] == variable
+            continue
+        question = questions[entry['question']]
+        suffix = entry['subquestion']
+        sub_codes = {item['code'] for item in question_items(question, 'subquestions')}
+        assert suffix is None or suffix in sub_codes or suffix.isdigit()
+        if entry['kind'] == 'categorical' and question['answer_options']:
+            assert entry['levels'] == [option['code'] for option in question['answer_options']]
+    assert codebook['columns']['Q1']['source'] == '735545X1X1'
+    assert codebook['columns']['Q16_1']['kind'] == 'categorical'
+
+
+def test_chunking_does_not_change_the_columns(store, tmp_path):
+    out_dir, codebook = store
+    assert [chunk['rows'] for chunk in codebook['chunks']] == [5, 5, 2]
+    whole = import_responses(fixture_path('survey.lss'), str(tmp_path))
+    assert len(whole['chunks']) == 1
+    chunked, single = read_columns(out_dir), read_columns(str(tmp_path))
+    assert chunked.keys() == single.keys()
+    for name in chunked:
+        assert np.array_equal(chunked[name], single[name], equal_nan=chunked[name].dtype.kind == 'f')
+
+
+def test_late_columns_and_unknown_codes(tmp_path):
+    writer = ColumnStoreWriter(str(tmp_path), ColumnResolver(read_lss_survey(fixture_path('survey.lss'))), 1)
+    writer.add_row({'id': '1'})
+    writer.add_row({'id': '2', '_735545X1X1': 'A2'})
+    writer.add_row({'id': '3', '_735545X1X1': 'ZZ'})
+    codebook = writer.close()
+    assert codebook['columns']['Q1']['unexpected_levels'] == ['ZZ']
+    assert read_column(str(tmp_path), 'Q1').tolist() == [-1, 1, 3]
+    assert decode_column(str(tmp_path), 'Q1').tolist() == ['', 'A2', 'ZZ']
+    assert read_column(str(tmp_path), 'id').tolist() == [1.0, 2.0, 3.0]
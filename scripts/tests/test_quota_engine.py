@@ -0,0 +1,94 @@
+"""Quota compilation, incremental counting, and recount vs replay agreement"""
+
+import numpy as np
+import pytest
+
+from conftest import fixture_path
+from lss_responses import decode_column, import_responses, load_codebook
+from quota_engine import QuotaEngine, compile_quotas, recount, replay, store_matrix
+
+QUOTA_ROWS = [
+    {'id': 'q1-a1', 'name': 'Q1 is A1', 'limit': 1000, 'action': 'screenout',
+     'conditions': [{'question_code': 'Q1', 'operator': 'equals', 'value': 'A1'}]},
+    {'id': 'q1-not-a1', 'name': 'Q1 is not A1', 'limit': 1000, 'action': 'screenout',
+     'conditions': [{'question_code': 'Q1', 'operator': 'not_equals', 'value': 'A1'}]},
+    {'id': 'q7-in', 'name': 'Q7 in A1/A2 and Q3 ticked', 'limit': 1000, 'action': 'screenout',
+     'conditions': [{'question_code': 'Q7', 'operator': 'in', 'value': ['A1', 'A2']},
+                    {'question_code': 'Q3_SQ001', 'operator': 'equals', 'value': 'Y'}]},
+    {'id': 'q9-not-in', 'name': 'Q9 not A3', 'limit': 1000, 'action': 'redirect',
+     'conditions': [{'question_code': 'Q9', 'operator': 'not_in', 'value': ['A3']}]},
+    {'id': 'inactive', 'name': 'Inactive', 'limit': 1, 'is_active': False,
+     'conditions': [{'question_code': 'Q1', 'operator': 'equals', 'value': 'A1'}]},
+]
+
+
+def condition(variable, operator, value):
+    return {'question_code': variable, 'operator': operator, 'value': value}
+
+
+@pytest.fixture(scope='module')
+def store_dir(tmp_path_factory) -> str:
+    out_dir = str(tmp_path_factory.mktemp('responses'))
+    import_responses(fixture_path('survey.lss'), out_dir)
+    return out_dir
+
+
+def response_log(store_dir: str, submitted: np.ndarray) -> list:
+    """The store's submitted rows as a completion log, unanswered variables left out"""
+    codebook = load_codebook(store_dir)
+    columns = {variable: decode_column(store_dir, variable, codebook) for variable in codebook['columns']}
+    rows = np.flatnonzero(submitted) if submitted is not None else range(codebook['n_rows'])
+    return [{'response_id': str(row),
+             'answers': {variable: str(values[row]) for variable, values in columns.items() if values[row] != ''}}
+            for row in rows]
+
+
+def test_compile_reports_unknown_codes(resonant_survey):
+    rows = [{'id': 'bad', 'name': 'Bad', 'limit': 5, 'conditions': [
+        condition('Q1', 'equals', 'A9'),
+        condition('Q99', 'equals', 'A1'),
+        condition('Q2', 'between', 1),
+    ]}]
+    quotas, problems = compile_quotas(rows, resonant_survey)
+    assert [len(quota.conditions) for quota in quotas] == [3]
+    assert [problem['problem'] for problem in problems] == [
+        'Q1 has no answer code(s) A9',
+        "unknown question code 'Q99'",
+        "unknown operator 'between'",
+    ]
+
+
+def test_compile_skips_inactive_quotas(resonant_survey):
+    quotas, problems = compile_quotas(QUOTA_ROWS, resonant_survey)
+    assert [quota.id for quota in quotas] == ['q1-a1', 'q1-not-a1', 'q7-in', 'q9-not-in']
+    assert problems == []
+
+
+def test_engine_screens_out_once_full():
+    quotas, _ = compile_quotas([{'id': 'q', 'name': 'Q', 'limit': 2, 'action': 'screenout',
+                                 'conditions': [condition('Q1', 'equals', 'A1')]}])
+    engine = QuotaEngine(quotas)
+    outcomes = [engine.complete({'Q1': answer})['outcome'] for answer in ('A1', 'A2', 'A1', 'A1')]
+    assert outcomes == ['complete', 'complete', 'complete', 'screenout']
+    assert engine.counts()['q'] == {'name': 'Q', 'count': 2, 'limit': 2, 'full': True}
+    assert engine.check({'Q1': 'A1'}) == quotas
+    # A missing answer never matches, not even not_equals
+    assert engine.matching({}) == []
+
+
+def test_recount_matches_replay(store_dir, resonant_survey):
+    quotas, _ = compile_quotas(QUOTA_ROWS, resonant_survey)
+    matrix, submitted = store_matrix(store_dir, quotas)
+    counts = recount(quotas, matrix, submitted)
+
+    engine = QuotaEngine(compile_quotas(QUOTA_ROWS, resonant_survey)[0])
+    report = replay(engine, response_log(store_dir, submitted))
+
+    assert report['responses'] == matrix.n_rows == 12
+    assert report['outcomes'] == {'complete': 12}
+    assert {quota_id: entry['count'] for quota_id, entry in counts.items()} == \
+           {quota_id: entry['count'] for quota_id, entry in engine.counts().items()}
+    # Every quota counts something, and Q1 = A1 / Q1 != A1 split the answered rows
+    assert all(entry['count'] > 0 for entry in counts.values())
+    answered = int((decode_column(store_dir, 'Q1') != '').sum())
+    assert counts['q1-a1']['count'] + counts['q1-not-a1']['count'] == answered
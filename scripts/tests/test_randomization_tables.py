@@ -0,0 +1,51 @@
+"""Randomization tables: balanced designs, whole blocks, manifests and O(1) slot lookup"""
+
+import copy
+
+import numpy as np
+import pytest
+
+from randomization_tables import balance, latin_square, lookup, order_table, williams_square, write_tables
+
+
+@pytest.mark.parametrize('k', range(2, 9))
+def test_williams_square_balances_positions_and_carryover(k):
+    square = williams_square(k)
+    assert len(square) == (k if k % 2 == 0 else 2 * k)
+    assert all(sorted(row) == list(range(k)) for row in square.tolist())
+    assert balance(square) == ({'position_spread': 0, 'carryover_spread': 0} if k > 2 else {'position_spread': 0})
+
+
+@pytest.mark.parametrize('design, k', [('williams', 5), ('williams', 6), ('latin', 5)])
+def test_tables_are_whole_balanced_blocks(design, k):
+    block = len(williams_square(k)) if design == 'williams' else len(latin_square(k))
+    table = order_table(k, 1001, design, np.random.default_rng(1))
+    assert len(table) % block == 0 and len(table) >= 1001
+    assert table.dtype == np.uint8
+    assert (np.sort(table, axis=1) == np.arange(k)).all()
+    assert balance(table)['position_spread'] == 0
+    if design == 'williams':
+        assert balance(table)['carryover_spread'] == 0
+    # Consecutive slots do not walk the square in order
+    assert not np.array_equal(table[:block], table[block:2 * block])
+
+
+def test_tables_for_a_survey(tmp_path, resonant_survey):
+    survey = copy.deepcopy(resonant_survey)
+    for group in survey['question_groups'][:3]:
+        group['settings']['randomization_group'] = 'messages'
+    manifest = write_tables(str(tmp_path / 'a'), survey, participants=100, seed=7)
+    # rg1 has a single member, so it needs no table
+    assert sorted(manifest['tables']) == ['answer_options:Q9', 'groups:messages']
+    messages = manifest['tables']['groups:messages']
+    assert messages['members'] == [0, 1, 2] and messages['slots'] == 102
+    assert messages['balance'] == {'position_spread': 0, 'carryover_spread': 0}
+
+    manifest_path = str(tmp_path / 'a' / 'manifest.json')
+    members, row = lookup(manifest_path, 'groups:messages', 5)
+    assert sorted(members) == [0, 1, 2]
+    assert lookup(manifest_path, 'groups:messages', 5 + messages['slots'])[0] == members
+    # Same seed, same tables
+    again = write_tables(str(tmp_path / 'b'), survey, participants=100, seed=7)
+    assert {name: entry['sha256'] for name, entry in again['tables'].items()} == \
+        {name: entry['sha256'] for name, entry in manifest['tables'].items()}
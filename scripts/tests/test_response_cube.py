@@ -0,0 +1,35 @@
+"""Codebook levels, codes vs labels, and frequencies over the fixture's responses"""
+
+import pytest
+
+from conftest import fixture_path, load_fixture
+from lss_responses import decode_column, import_responses
+from response_cube import build_codebook, cube_from_store
+
+
+@pytest.fixture(scope='module')
+def store_dir(tmp_path_factory) -> str:
+    out_dir = str(tmp_path_factory.mktemp('responses'))
+    import_responses(fixture_path('survey.lss'), out_dir)
+    return out_dir
+
+
+@pytest.fixture(scope='module')
+def cube(store_dir):
+    cube, unknown = cube_from_store(build_codebook(load_fixture('survey.resonant.json')), store_dir)
+    assert unknown == {}
+    return cube
+
+
+def test_codes_and_labels_line_up(cube):
+    assert cube.codes('Q7') == [None, 'A1', 'A2', 'A3']
+    assert cube.labels('Q7') == ['(no answer)', 'Answer 1 (en)', 'Answer 2 (en)', 'Answer 3 (en)']
+    assert cube.labels('Q3_SQ001') == ['(no answer)', 'Selected']
+
+
+def test_frequencies_match_the_store(cube, store_dir):
+    answers = decode_column(store_dir, 'Q7')
+    expected = [int((answers == '').sum())] + [int((answers == code).sum()) for code in cube.codes('Q7')[1:]]
+    assert cube.frequencies('Q7').tolist() == expected
+    assert cube.where('Q7', ['A1', 'A3']).sum() == expected[1] + expected[3]
+    assert cube.crosstab('Q5_SQ001', 'Q7').sum(axis=0).tolist() == expected
@@ -0,0 +1,98 @@
+"""Slider pyramids: the step-function grid against a plain reference, pyramid levels and windows"""
+
+import warnings
+
+import numpy as np
+import pytest
+
+from slider_pyramid import StepGrid, build_pyramid, iter_event_chunks, read_window, split_masks
+
+
+def random_events(seed: int = 0, participants: int = 6, events: int = 400, end_ms: int = 10000):
+    rng = np.random.default_rng(seed)
+    ids = [f"p{i}" for i in rng.integers(0, participants, events)]
+    times = rng.integers(0, end_ms, events).astype(np.int64)
+    # Some exact ties, where the later row must win
+    times[1::7] = times[0::7][:len(times[1::7])]
+    values = rng.uniform(0, 100, events).astype(np.float32)
+    return ids, times, values
+
+
+def reference_matrix(ids, times, values, step_ms: int, cells: int) -> dict:
+    """participant -> samples: the latest event at or before each grid time (row order breaks ties)"""
+    result = {}
+    for participant in dict.fromkeys(ids):
+        events = sorted((times[i], i) for i in range(len(ids)) if ids[i] == participant)
+        row = np.full(cells, np.nan, dtype=np.float32)
+        for cell in range(cells):
+            before = [i for ms, i in events if ms <= cell * step_ms]
+            if before:
+                row[cell] = values[before[-1]]
+        result[participant] = row
+    return result
+
+
+def grid_from(ids, times, values, step_ms: int, chunk: int, end_ms=None) -> StepGrid:
+    grid = StepGrid(step_ms, end_ms)
+    for start in range(0, len(ids), chunk):
+        grid.add_chunk(ids[start:start + chunk], times[start:start + chunk], values[start:start + chunk])
+    return grid
+
+
+@pytest.mark.parametrize('chunk', [1, 37, 10000])
+def test_grid_matches_the_reference_whatever_the_chunking(chunk):
+    ids, times, values = random_events()
+    grid = grid_from(ids, times, values, 250, chunk)
+    matrix = grid.matrix()
+    expected = reference_matrix(ids, times, values, 250, matrix.shape[1])
+    for participant, row in grid.participants.items():
+        np.testing.assert_array_equal(matrix[row], expected[participant])
+
+
+def test_events_past_the_grid_end_are_dropped():
+    grid = StepGrid(100, end_ms=1000)
+    grid.add_chunk(['a', 'a', 'a'], np.array([0, 1000, 1001]), np.array([1, 2, 3], dtype=np.float32))
+    assert grid.dropped == 1
+    assert grid.matrix().shape == (1, 11)
+    assert grid.matrix()[0, -1] == 2
+
+
+def test_levels_halve_until_few_points(tmp_path):
+    ids, times, values = random_events(1)
+    grid = grid_from(ids, times, values, 10, 100)
+    splits = split_masks(grid.participants, {'p0': {'gender': 'f'}, 'p1': {'gender': 'm'}}, ['gender'])
+    manifest = build_pyramid(grid, str(tmp_path), splits, min_points=100)
+    assert [level['bucket_ms'] for level in manifest['levels']] == [10 * 2 ** i for i in range(len(manifest['levels']))]
+    assert manifest['levels'][-1]['points'] <= 100 < manifest['levels'][-2]['points']
+    assert 'mean[gender=(unknown)]' in manifest['columns']
+
+    samples = grid.matrix()
+    level0 = np.load(tmp_path / manifest['levels'][0]['path'])
+    columns = {name: level0[:, i] for i, name in enumerate(manifest['columns'])}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        np.testing.assert_allclose(columns['mean'], np.nanmean(samples, axis=0), rtol=1e-5)
+    np.testing.assert_array_equal(columns['n'], np.sum(~np.isnan(samples), axis=0))
+    female = samples[splits['gender=f']]
+    np.testing.assert_array_equal(columns['n[gender=f]'], np.sum(~np.isnan(female), axis=0))
+
+
+def test_window_reads_the_finest_level_within_budget(tmp_path):
+    ids, times, values = random_events(2)
+    manifest = build_pyramid(grid_from(ids, times, values, 10, 1000), str(tmp_path), min_points=50)
+    manifest_path = str(tmp_path / 'manifest.json')
+    window = read_window(manifest_path, 2000, 4000, max_points=60)
+    step = window['time_ms'][1] - window['time_ms'][0]
+    assert step == next(level['bucket_ms'] for level in manifest['levels'] if 2000 / level['bucket_ms'] <= 60)
+    assert window['time_ms'][0] <= 2000 and window['time_ms'][-1] >= 4000 - step
+    assert len(window['time_ms']) <= 62
+
+
+def test_csv_chunks_filter_by_session(tmp_path):
+    path = tmp_path / 'events.csv'
+    path.write_text('session_id,participant_id,value,session_ms,extra\n'
+                    's1,a,10,0,x\ns2,b,20,5,x\ns1,a,30,250.0,x\ns1,c,40,500,x\n', encoding='utf-8')
+    chunks = list(iter_event_chunks(str(path), chunk_rows=2, session_id='s1'))
+    assert [chunk[0] for chunk in chunks] == [['a', 'a'], ['c']]
+    assert [chunk[1].tolist() for chunk in chunks] == [[0, 250], [500]]
+    assert [chunk[2].tolist() for chunk in chunks] == [[10, 30], [40]]
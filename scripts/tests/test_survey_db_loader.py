@@ -0,0 +1,85 @@
+"""Row building, COPY text format and the SQLite stand-in"""
+
+import io
+import json
+import sqlite3
+
+import pytest
+
+from conftest import load_fixture
+from lss_to_resonant_json import parse_lss_to_json
+from survey_db_loader import (TABLE_COLUMNS, _LineReader, build_rows, iter_copy_lines, load_sqlite,
+                              write_copy_script)
+
+SURVEY_ID = '00000000-0000-4000-8000-000000000001'
+GOLDEN = {'resonant': 'survey.resonant.json', 'lss': 'survey.lss.json', 'tsv': 'survey.tsv.json'}
+
+
+def column(rows: list, table: str, name: str) -> list:
+    index = TABLE_COLUMNS[table].index(name)
+    return [row[index] for row in rows]
+
+
+@pytest.mark.parametrize('dialect', GOLDEN)
+def test_relevance_is_kept_in_every_dialect(dialect):
+    survey = load_fixture(GOLDEN[dialect])
+    rows = build_rows(survey, SURVEY_ID)
+    expected = 'Q11 == "A2"' if dialect == 'tsv' else 'Q12 == "A1"'
+    assert column(rows['question_groups'], 'question_groups', 'relevance_logic') == ['1'] * 4 + [expected, '1']
+    assert column(rows['questions'], 'questions', 'relevance_logic')[1] == 'Q1 == "A3"'
+
+
+def test_randomization_group_and_ids(resonant_survey):
+    rows = build_rows(resonant_survey, SURVEY_ID)
+    assert column(rows['question_groups'], 'question_groups', 'random_group') == [None, None, None, 'rg1', None, None]
+    # Ids are derived from the survey id, and every foreign key points at a row
+    assert build_rows(resonant_survey, SURVEY_ID) == rows
+    group_ids = set(column(rows['question_groups'], 'question_groups', 'id'))
+    question_ids = set(column(rows['questions'], 'questions', 'id'))
+    assert set(column(rows['questions'], 'questions', 'group_id')) <= group_ids
+    assert set(column(rows['subquestions'], 'subquestions', 'question_id')) <= question_ids
+    assert set(column(rows['answer_options'], 'answer_options', 'question_id')) <= question_ids
+
+
+def test_label_sets_expand_to_the_same_rows(resonant_survey, lss_path):
+    interned = json.loads(json.dumps(parse_lss_to_json(lss_path, label_sets=True)))
+    assert build_rows(interned, SURVEY_ID) == build_rows(resonant_survey, SURVEY_ID)
+
+
+def test_copy_lines_escape_text_format():
+    rows = [('id-1', 'q-1', 'Q1', 'Tab\there\nnew line \\ slash', None, 'text', {'a': 'ü'}, '1', 0)]
+    assert list(iter_copy_lines('questions', rows)) == [
+        'id-1\tq-1\tQ1\tTab\\there\\nnew line \\\\ slash\t\\N\ttext\t{"a":"ü"}\t1\t0\n']
+
+
+def test_copy_script_holds_every_row(resonant_survey):
+    rows = build_rows(resonant_survey, SURVEY_ID)
+    f = io.StringIO()
+    counts = write_copy_script(f, rows)
+    lines = f.getvalue().splitlines()
+    assert counts == {table: len(table_rows) for table, table_rows in rows.items()}
+    assert lines[0] == 'BEGIN;' and lines[-1] == 'COMMIT;'
+    assert lines.count('\\.') == len(TABLE_COLUMNS)
+    assert len(lines) == 2 + 2 * len(TABLE_COLUMNS) + sum(counts.values())
+
+
+def test_line_reader_serves_reads_and_readlines():
+    reader = _LineReader(iter(['ab\n', 'cde\n', 'f\n']))
+    assert reader.read(3) == 'ab\n'
+    assert reader.read(2) == 'cd'
+    assert reader.readline() == 'e\n'
+    assert reader.readline() == 'f\n'
+    assert reader.read() == ''
+
+
+def test_load_sqlite(resonant_survey):
+    rows = build_rows(resonant_survey, SURVEY_ID)
+    conn = sqlite3.connect(':memory:')
+    counts = load_sqlite(conn, rows)
+    assert counts == {'surveys': 1, 'question_groups': 6, 'questions': 18, 'subquestions': 14, 'answer_options': 24}
+    settings, = conn.execute("SELECT settings FROM questions WHERE code = 'Q1'").fetchone()
+    assert json.loads(settings) == resonant_survey['question_groups'][0]['questions'][0]['settings']
+    # Loading the same ids again is rejected as a whole
+    with pytest.raises(sqlite3.IntegrityError):
+        load_sqlite(conn, rows)
+    assert conn.execute('SELECT COUNT(*) FROM questions').fetchone() == (18,)
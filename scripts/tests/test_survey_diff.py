@@ -0,0 +1,190 @@
+"""Survey diff / patch round trips, in JSON and against the SQLite stand-in"""
+
+import copy
+import json
+import random
+import sqlite3
+
+import pytest
+
+from lss_to_resonant_json import parse_lss_to_json
+from survey_db_loader import TABLE_COLUMNS, build_rows, load_sqlite
+from survey_diff import apply_patch, apply_patch_to_db, diff_surveys, patch_summary
+
+SURVEY_ID = '00000000-0000-4000-8000-000000000001'
+
+
+def edited(survey: dict) -> dict:
+    """A copy with one edit of every kind the patch format covers"""
+    new = copy.deepcopy(survey)
+    groups = new['question_groups']
+    new['title'] = 'Renamed survey'
+    groups[0]['questions'][1]['question_text'] = 'Changed text'
+    groups[0]['questions'][0]['answer_options'].reverse()
+    del groups[1]['questions'][2]
+    groups[2]['questions'].append(groups[3]['questions'].pop(0))
+    added = dict(copy.deepcopy(groups[0]['questions'][1]), code='QN1')
+    groups.insert(2, {'title': 'New group', 'description': '', 'order_index': 2, 'settings': {}, 'questions': [added]})
+    return new
+
+
+def rename_group(survey: dict):
+    survey['question_groups'][1]['title'] = 'Renamed group'
+
+
+def reverse_questions(survey: dict):
+    survey['question_groups'][0]['questions'].reverse()
+
+
+def reorder_groups(survey: dict):
+    survey['question_groups'].reverse()
+
+
+def rename_and_reorder(survey: dict):
+    rename_group(survey)
+    reverse_questions(survey)
+    survey['question_groups'][1]['questions'].reverse()
+    reorder_groups(survey)
+
+
+def drop_order_indexes(survey: dict):
+    """Positions fall back to list order, so a reorder must rewrite every shifted row"""
+    for group in survey['question_groups']:
+        for question in group['questions']:
+            question.pop('order_index', None)
+
+
+def random_edits(survey: dict, rng: random.Random):
+    groups = survey['question_groups']
+    for _ in range(rng.randint(1, 4)):
+        group = rng.choice(groups)
+        kind = rng.choice(['rename', 'reverse', 'delete', 'insert', 'move', 'shuffle_groups', 'text', 'options'])
+        if kind == 'rename':
+            group['title'] += ' (renamed)'
+        elif kind == 'reverse':
+            group['questions'].reverse()
+        elif kind == 'delete' and group['questions']:
+            group['questions'].pop(rng.randrange(len(group['questions'])))
+        elif kind == 'insert':
+            group['questions'].insert(rng.randint(0, len(group['questions'])),
+                                      {'code': f"QN{rng.randrange(10 ** 6)}", 'question_text': 'New',
+                                       'question_type': 'text', 'settings': {}})
+        elif kind == 'move' and group['questions']:
+            target = rng.choice(groups)['questions']
+            target.insert(rng.randint(0, len(target)), group['questions'].pop(rng.randrange(len(group['questions']))))
+        elif kind == 'shuffle_groups':
+            rng.shuffle(groups)
+        elif kind == 'text' and group['questions']:
+            rng.choice(group['questions'])['question_text'] += '!'
+        elif kind == 'options':
+            for question in group['questions']:
+                if question.get('answer_options'):
+                    question['answer_options'].reverse()
+                    break
+
+
+def test_identical_surveys_give_an_empty_patch(resonant_survey):
+    assert diff_surveys(resonant_survey, copy.deepcopy(resonant_survey))['operations'] == []
+
+
+def test_label_sets_are_compared_expanded(resonant_survey, lss_path):
+    interned = json.loads(json.dumps(parse_lss_to_json(lss_path, label_sets=True)))
+    assert diff_surveys(resonant_survey, interned)['operations'] == []
+
+
+def test_apply_patch_round_trip(resonant_survey):
+    new = edited(resonant_survey)
+    patch = diff_surveys(resonant_survey, new)
+    assert patch_summary(patch) == {
+        'survey': {'update': 1},
+        'group': {'insert': 1},
+        'question': {'update': 1, 'delete': 1, 'insert': 1, 'move': 1},
+        'answer_option': {'reorder': 1},
+    }
+    assert apply_patch(resonant_survey, patch) == new
+    # The patch survives serialization and leaves its input untouched
+    before = copy.deepcopy(resonant_survey)
+    assert apply_patch(resonant_survey, json.loads(json.dumps(patch))) == new
+    assert resonant_survey == before
+
+
+@pytest.fixture
+def conn(resonant_survey):
+    conn = sqlite3.connect(':memory:')
+    load_sqlite(conn, build_rows(resonant_survey, SURVEY_ID))
+    yield conn
+    conn.close()
+
+
+def question_rows(conn) -> dict:
+    return {code: (row_id, text) for row_id, code, text in
+            conn.execute('SELECT id, code, question_text FROM questions')}
+
+
+def test_apply_patch_to_db_writes_only_changed_rows(conn, resonant_survey):
+    new = copy.deepcopy(resonant_survey)
+    new['question_groups'][0]['questions'][1]['question_text'] = 'Changed text'
+    before = question_rows(conn)
+
+    written = apply_patch_to_db(conn, SURVEY_ID, resonant_survey, diff_surveys(resonant_survey, new))
+
+    assert written == {'surveys': 0, 'question_groups': 0, 'questions': 1, 'subquestions': 0, 'answer_options': 0}
+    after = question_rows(conn)
+    assert after['Q2'] == (before['Q2'][0], 'Changed text')
+    assert {code: row for code, row in after.items() if code != 'Q2'} == \
+           {code: row for code, row in before.items() if code != 'Q2'}
+
+
+def test_apply_patch_to_db_matches_a_fresh_load(conn, resonant_survey):
+    new = edited(resonant_survey)
+    before = question_rows(conn)
+    apply_patch_to_db(conn, SURVEY_ID, resonant_survey, diff_surveys(resonant_survey, new))
+
+    fresh = sqlite3.connect(':memory:')
+    load_sqlite(fresh, build_rows(new, SURVEY_ID))
+    after, expected = question_rows(conn), question_rows(fresh)
+    assert {code: text for code, (_, text) in after.items()} == {code: text for code, (_, text) in expected.items()}
+    # Questions that survived keep their ids, even the moved one
+    assert all(after[code][0] == before[code][0] for code in after if code in before)
+
+
+def table_contents(conn) -> dict:
+    """Every table's rows without their generated ids, for comparing databases"""
+    contents = {}
+    for table, columns in TABLE_COLUMNS.items():
+        kept = [column for column in columns if column != 'id' and not column.endswith('_id')]
+        contents[table] = sorted(map(repr, conn.execute(f"SELECT {', '.join(kept)} FROM {table}")))
+    return contents
+
+
+def assert_round_trip(old: dict, new: dict):
+    patch = diff_surveys(old, new)
+    assert apply_patch(old, patch) == new
+
+    conn = sqlite3.connect(':memory:')
+    load_sqlite(conn, build_rows(old, SURVEY_ID))
+    before = question_rows(conn)
+    apply_patch_to_db(conn, SURVEY_ID, old, patch)
+    fresh = sqlite3.connect(':memory:')
+    load_sqlite(fresh, build_rows(new, SURVEY_ID))
+    assert table_contents(conn) == table_contents(fresh)
+    after = question_rows(conn)
+    assert all(after[code][0] == before[code][0] for code in after if code in before)
+
+
+@pytest.mark.parametrize('edit', [rename_group, reverse_questions, reorder_groups, rename_and_reorder])
+@pytest.mark.parametrize('explicit_order', [True, False], ids=['order_index', 'list_order'])
+def test_rename_and_reorder_round_trip(resonant_survey, edit, explicit_order):
+    old = copy.deepcopy(resonant_survey)
+    if not explicit_order:
+        drop_order_indexes(old)
+    new = copy.deepcopy(old)
+    edit(new)
+    assert_round_trip(old, new)
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_random_edits_round_trip(resonant_survey, seed):
+    new = copy.deepcopy(resonant_survey)
+    random_edits(new, random.Random(seed))
+    assert_round_trip(resonant_survey, new)
@@ -0,0 +1,69 @@
+"""Survey-flow simulation: plan in every dialect, relevance, determinism and launch load"""
+
+import random
+
+import numpy as np
+import pytest
+
+from conftest import load_fixture
+from expression_compiler import ExpressionCompiler, ExpressionEvaluator
+from survey_flow_sim import Behaviour, plan_flow, shuffle_slots, simulate, simulate_respondent
+from survey_model import DIALECTS, AnswerOption, Group, Question, Survey, survey_to_json
+
+GOLDEN = {'resonant': 'survey.resonant.json', 'lss': 'survey.lss.json', 'tsv': 'survey.tsv.json'}
+
+
+def branching_survey(condition: str) -> Survey:
+    """Page 1 asks a mandatory single choice with one answer (A1); page 2 is shown when condition holds"""
+    first = Question('Q1', 'Pick', 'L', 0, mandatory=True, answer_options=[AnswerOption('A1', 'One', 0)])
+    second = Question('Q2', 'Free text', 'S', 0, mandatory=True)
+    return Survey('Branching', groups=[Group('G1', 0, questions=[first]),
+                                       Group('G2', 1, relevance=condition, questions=[second])])
+
+
+@pytest.mark.parametrize('dialect', GOLDEN)
+def test_plan_reads_every_dialect(dialect):
+    flow = plan_flow(load_fixture(GOLDEN[dialect]))
+    compiler = ExpressionCompiler()
+    expected = 'Q11 == "A2"' if dialect == 'tsv' else 'Q12 == "A1"'
+    assert flow[4].relevance == compiler.compile(expected)
+    assert [question.code for group in flow for question in group.questions] == [f"Q{i}" for i in range(1, 19)]
+    # Only questions with an actual condition keep a non-trivial node
+    assert flow[0].questions[1].relevance == compiler.compile('Q1 == "A3"')
+
+
+@pytest.mark.parametrize('compiled', [True, False], ids=['compiled', 'source'])
+@pytest.mark.parametrize('dialect', DIALECTS)
+def test_group_relevance_decides_the_pages(dialect, compiled):
+    compiler = ExpressionCompiler() if compiled else None
+    for condition, pages in (('Q1 == "A1"', 2), ('Q1 == "A2"', 1)):
+        survey = survey_to_json(branching_survey(condition), dialect, compiler)
+        respondent = simulate_respondent(plan_flow(survey), Behaviour(), random.Random(0), ExpressionEvaluator())
+        assert respondent.counts['pages'] == pages
+        assert set(respondent.stored) == ({'Q1', 'Q2'} if pages == 2 else {'Q1'})
+
+
+def test_randomization_groups_swap_only_among_members():
+    survey = load_fixture('survey.resonant.json')
+    for group in survey['question_groups'][:3]:
+        group['settings']['randomization_group'] = 'intro'
+    flow = plan_flow(survey)
+    assert [group.randomization_group for group in flow] == ['intro'] * 3 + ['rg1', '', '']
+    orders = {tuple(id(group) for group in shuffle_slots(flow, random.Random(seed))) for seed in range(30)}
+    assert len(orders) > 1
+    for order in orders:
+        assert set(order[:3]) == {id(group) for group in flow[:3]}
+        assert order[3:] == tuple(id(group) for group in flow[3:])
+
+
+def test_results_do_not_depend_on_chunking():
+    survey = load_fixture('survey.tsv.json')
+    first = simulate(survey, 40, Behaviour(), seed=3, workers=1, chunk_size=7)
+    second = simulate(survey, 40, Behaviour(), seed=3, workers=1, chunk_size=500)
+    for name, values in first['metrics'].items():
+        assert np.array_equal(values, second['metrics'][name])
+    for endpoint, parts in first['histograms'].items():
+        for kind, histogram in parts.items():
+            assert np.array_equal(histogram, second['histograms'][endpoint][kind])
+    # Every respondent posts exactly one completion
+    assert first['histograms']['complete']['requests'].sum() == 40
@@ -0,0 +1,64 @@
+"""Language shards: every language survives the single pass and localizes the base survey"""
+
+import json
+
+import pytest
+
+from conftest import fixture_path
+from lss_to_resonant_json import LssSurveyReader, convert_to_resonant_format, read_lss_survey
+from survey_l10n import load_shard, localize, translation_shard, write_shards
+from survey_model import iter_group_json
+
+
+def shards_for(reader: LssSurveyReader) -> list:
+    shards = []
+    for language in reader.languages():
+        reader.select_language(language)
+        shards.append(translation_shard(iter_group_json(reader.survey, 'resonant'), language))
+    reader.select_language()
+    return shards
+
+
+def test_every_language_is_kept():
+    reader = read_lss_survey(fixture_path('survey.lss'))
+    assert reader.languages() == ['en', 'de']
+    texts = {}
+    for language in reader.languages():
+        reader.select_language(language)
+        texts[language] = reader.survey.groups[0].questions[0].text
+    assert texts == {'en': 'Question 1 (en)', 'de': 'Question 1 (de)'}
+    with pytest.raises(ValueError):
+        reader.select_language('fr')
+
+
+def test_missing_text_falls_back_to_the_base_language():
+    reader = LssSurveyReader()
+    for table, fields in [
+        ('groups', {'gid': '1', 'group_order': '0'}),
+        ('group_l10ns', {'gid': '1', 'group_name': 'Intro', 'language': 'en'}),
+        ('questions', {'qid': '1', 'gid': '1', 'type': 'S', 'title': 'Q1'}),
+        ('questions', {'qid': '2', 'gid': '1', 'type': 'S', 'title': 'Q2', 'question_order': '1'}),
+        ('question_l10ns', {'qid': '1', 'question': 'Name?', 'language': 'en'}),
+        ('question_l10ns', {'qid': '2', 'question': 'Age?', 'language': 'en'}),
+        ('question_l10ns', {'qid': '1', 'question': 'Wie heißen Sie?', 'language': 'de'}),
+        ('surveys', {'language': 'en'}),
+    ]:
+        reader.add_row(table, fields)
+    reader.build()
+    reader.select_language('de')
+    group = reader.survey.groups[0]
+    assert (group.title, [question.text for question in group.questions]) == ('Intro', ['Wie heißen Sie?', 'Age?'])
+
+
+def test_shard_localizes_the_base_survey(tmp_path, resonant_survey):
+    reader = read_lss_survey(fixture_path('survey.lss'))
+    manifest = write_shards(str(tmp_path), shards_for(reader), 'en', '../survey.json')
+    assert sorted(manifest['languages']) == ['de', 'en']
+    manifest_path = str(tmp_path / 'manifest.json')
+
+    reader.select_language('de')
+    expected = json.loads(json.dumps(convert_to_resonant_format(reader.survey)))
+    assert localize(resonant_survey, load_shard(manifest_path, 'de')) == expected
+    assert localize(resonant_survey, load_shard(manifest_path, 'en')) == resonant_survey
+    # A language without a shard gets the base language
+    assert load_shard(manifest_path, 'fr')['language'] == 'en'
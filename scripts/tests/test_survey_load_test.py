@@ -0,0 +1,62 @@
+"""Load generator and stub server: sessions replay completely and the stub keeps the upsert semantics"""
+
+import asyncio
+
+from survey_flow_sim import Behaviour
+from survey_load_test import build_sessions, run_load
+from survey_stub_server import StubState, start_stub
+
+
+def replay(sessions, connections: int = 4) -> tuple:
+    async def run():
+        server, state = await start_stub()
+        async with server:
+            base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            response_ids = [f"r{index}" for index in range(len(sessions))]
+            report, opened = await run_load(base_url, sessions, 'survey', response_ids, ramp=0.0, time_scale=0.0,
+                                            connections=connections, timeout=10.0)
+        return report, opened, state
+    return asyncio.run(run())
+
+
+def test_sessions_are_seeded_and_end_with_completion(resonant_survey):
+    sessions = build_sessions(resonant_survey, 5, Behaviour(), seed=3)
+    assert sessions == build_sessions(resonant_survey, 5, Behaviour(), seed=3)
+    assert sessions != build_sessions(resonant_survey, 5, Behaviour(), seed=4)
+    for session in sessions:
+        assert session[-1][1] == 'complete'
+        assert [at for at, _, _ in session] == sorted(at for at, _, _ in session)
+
+
+def test_every_request_reaches_the_stub(resonant_survey):
+    sessions = build_sessions(resonant_survey, 20, Behaviour())
+    report, opened, state = replay(sessions)
+    assert report['errors'] == 0
+    assert report['requests'] == sum(len(session) for session in sessions)
+    assert opened <= 4
+    stats = state.stats()
+    assert (stats['responses'], stats['complete']) == (20, 20)
+    for endpoint, entry in report['endpoints'].items():
+        assert stats['requests'].get(endpoint, 0) == entry['requests']
+    # Answer saves upsert: one row per answered variable, however often it was saved
+    for index, session in enumerate(sessions):
+        keys = {payload['question_code'] + (f"_{payload['subquestion_code']}" if payload['subquestion_code'] else '')
+                for _, endpoint, payload in session if endpoint == 'response'}
+        assert keys <= set(state.responses[f"r{index}"]['data'])
+
+
+def test_stub_rejects_what_the_app_rejects():
+    state = StubState()
+
+    def call(method, path, body=b'{}'):
+        return asyncio.run(state.handle(method, path, body))[0]
+
+    assert call('GET', '/api/survey/response') == 405
+    assert call('POST', '/api/elsewhere') == 404
+    assert call('POST', '/api/survey/response', b'{not json') == 400
+    assert call('POST', '/api/survey/response', b'{"response_id": "r1"}') == 400
+    assert call('POST', '/api/survey/s/autosave', b'{"response_id": "r1", "answers": {"Q1": "A1"}}') == 200
+    assert call('POST', '/api/survey/response/r1/complete') == 200
+    assert call('POST', '/api/survey/s/autosave', b'{"response_id": "r1", "answers": {}}') == 400
+    assert state.responses['r1'] == {'status': 'complete', 'metadata': {'current_group_index': None},
+                                     'data': {'Q1': 'A1'}}
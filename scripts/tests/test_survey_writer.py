@@ -0,0 +1,80 @@
+"""Output formats and random access into sharded surveys"""
+
+import io
+import json
+import os
+
+import pytest
+
+import convert_limesurvey_to_json
+import lss_to_resonant_json
+import parse_lss_xml_to_json
+from conftest import fixture_path, load_fixture
+from survey_writer import SHARD_MANIFEST_NAME, SHARD_PACK_NAME, dump_survey, dump_survey_output, read_group
+from test_converters import run_converter
+
+
+def test_dump_survey_counts_and_formats(resonant_survey):
+    for fmt in ('pretty', 'compact'):
+        f = io.StringIO()
+        counts = dump_survey(resonant_survey, f, fmt)
+        assert counts == {'groups': 6, 'questions': 18}
+        assert json.loads(f.getvalue()) == resonant_survey
+
+
+def test_read_group_returns_each_group(tmp_path, resonant_survey):
+    out_dir = str(tmp_path / 'survey')
+    counts = dump_survey_output(resonant_survey, out_dir, 'sharded')
+    manifest_path = os.path.join(out_dir, SHARD_MANIFEST_NAME)
+
+    assert counts == {'groups': 6, 'questions': 18}
+    assert read_group(manifest_path) == {key: value for key, value in resonant_survey.items()
+                                         if key != 'question_groups'}
+    groups = resonant_survey['question_groups']
+    for index, group in enumerate(groups):
+        assert read_group(manifest_path, index) == group
+    # Negative indexes count from the end, like the manifest list
+    assert read_group(manifest_path, -1) == groups[-1]
+
+
+def test_manifest_offsets_cover_the_pack(tmp_path, resonant_survey):
+    out_dir = str(tmp_path / 'survey')
+    dump_survey_output(resonant_survey, out_dir, 'sharded')
+    with open(os.path.join(out_dir, SHARD_MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    size = os.path.getsize(os.path.join(out_dir, SHARD_PACK_NAME))
+
+    ranges = [manifest['header']] + manifest['groups']
+    assert ranges[0]['offset'] == 0
+    for previous, entry in zip(ranges, ranges[1:]):
+        assert entry['offset'] == previous['offset'] + previous['length']
+    assert manifest['bytes'] == size == ranges[-1]['offset'] + ranges[-1]['length']
+
+    groups = resonant_survey['question_groups']
+    assert [entry['questions'] for entry in manifest['groups']] == \
+           [[question['code'] for question in group['questions']] for group in groups]
+    assert [entry['title'] for entry in manifest['groups']] == [group['title'] for group in groups]
+
+
+# Where each converter dialect keeps a group's relevance in the monolithic output
+@pytest.mark.parametrize('module, source, golden, in_settings, field', [
+    (lss_to_resonant_json, 'survey.lss', 'survey.resonant.json', True, 'relevance'),
+    (parse_lss_xml_to_json, 'survey.lss', 'survey.lss.json', False, 'relevance'),
+    (convert_limesurvey_to_json, 'survey.tsv', 'survey.tsv.json', False, 'relevance_logic'),
+], ids=['resonant', 'lss', 'tsv'])
+def test_sharded_relevance_matches_monolithic_output(tmp_path, module, source, golden, in_settings, field):
+    out_dir = str(tmp_path / 'survey')
+    run_converter(module, fixture_path(source), out_dir, '--format', 'sharded')
+    manifest_path = os.path.join(out_dir, SHARD_MANIFEST_NAME)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    groups = load_fixture(golden)['question_groups']
+    sources = [group['settings'] if in_settings else group for group in groups]
+    assert [entry['relevance'] for entry in manifest['groups']] == [source[field] for source in sources]
+    assert [entry.get('relevance_compiled') for entry in manifest['groups']] == \
+           [source.get(field + '_compiled') for source in sources]
+    # Each fixture has one conditional group, so this is not all "1"
+    assert manifest['groups'][4]['relevance'] not in (None, '1')
+    for index, group in enumerate(groups):
+        assert read_group(manifest_path, index) == group
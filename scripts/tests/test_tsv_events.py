@@ -0,0 +1,48 @@
+"""TSV event stream: groups complete one at a time, the header sees every S row"""
+
+from convert_limesurvey_to_json import (
+    GroupEndEvent, GroupEvent, QuestionEvent, iter_tsv_events, read_tsv_model, stream_tsv,
+)
+
+COLUMNS = ['class', 'type', 'name', 'relevance', 'text', 'help', 'language', 'mandatory', 'other',
+           'id', 'related_id', 'scale_id']
+
+
+def write_tsv(path, rows) -> str:
+    lines = ['\t'.join(COLUMNS)]
+    for row in rows:
+        lines.append('\t'.join(row.get(column, '') for column in COLUMNS))
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def test_groups_stream_in_order_and_match_the_model(tsv_path):
+    survey, groups = stream_tsv(tsv_path)
+    streamed = [group.title for group in groups]
+    assert streamed == [group.title for group in read_tsv_model(tsv_path).groups]
+    assert survey.title == 'Synthetic survey'
+
+
+def test_each_group_ends_before_the_next_starts(tsv_path):
+    kinds = [(type(event).__name__, event.group_id) for event in iter_tsv_events(tsv_path)
+             if isinstance(event, (GroupEvent, GroupEndEvent))]
+    assert kinds[:3] == [('GroupEvent', 'G1'), ('GroupEndEvent', 'G1'), ('GroupEvent', 'G2')]
+    assert kinds[-1][0] == 'GroupEndEvent'
+
+
+def test_rows_pointing_back_into_a_completed_group_are_dropped(tmp_path):
+    path = write_tsv(tmp_path / 'late.tsv', [
+        {'class': 'G', 'name': 'G1', 'text': 'One', 'id': 'G1'},
+        {'class': 'Q', 'type': 'S', 'name': 'Q1', 'text': 'First', 'id': 'Q1', 'related_id': 'G1'},
+        {'class': 'G', 'name': 'G2', 'text': 'Two', 'id': 'G2'},
+        {'class': 'Q', 'type': 'S', 'name': 'Q2', 'text': 'Late', 'id': 'Q2', 'related_id': 'G1'},
+        {'class': 'A', 'name': 'A1', 'text': 'Late answer', 'related_id': 'Q1', 'scale_id': '0'},
+        {'class': 'S', 'name': 'surveyls_title', 'text': 'Titled last'},
+    ])
+    questions = [event.question.code for event in iter_tsv_events(path) if isinstance(event, QuestionEvent)]
+    assert questions == ['Q1']
+    survey, groups = stream_tsv(path)
+    groups = list(groups)
+    assert [[question.code for question in group.questions] for group in groups] == [['Q1'], []]
+    assert groups[0].questions[0].answer_options == []
+    assert survey.title == 'Titled last'